@@ -0,0 +1,18 @@
+from django.contrib import admin
+
+from .models import Token
+
+
+@admin.register(Token)
+class TokenAdmin(admin.ModelAdmin):
+    '''
+    Ключи выдаются командой manage.py api_token; здесь их можно
+    только посмотреть и отозвать (удалить).
+    '''
+    list_display = ('user', 'issued_at')
+    search_fields = ('user__username',)
+    fields = ('user', 'issued_at')
+    readonly_fields = ('user', 'issued_at')
+
+    def has_add_permission(self, request):
+        return False
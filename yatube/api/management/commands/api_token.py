@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Token, User
+
+
+class Command(BaseCommand):
+    help = ('Выдаёт пользователю новый ключ API (прежний перестаёт '
+            'действовать) и печатает его.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден.')
+        self.stdout.write(Token.objects.issue(user))
@@ -0,0 +1,54 @@
+import hashlib
+import secrets
+
+from django.contrib.auth import get_user_model
+from django.db import models
+
+User = get_user_model()
+
+
+def _digest(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class TokenManager(models.Manager):
+    def issue(self, user):
+        '''
+        Выдаёт пользователю новый ключ API вместо прежнего.
+        Хранится только хеш ключа, сам ключ возвращается один раз.
+        '''
+        key = secrets.token_hex(20)
+        self.update_or_create(user=user, defaults={'digest': _digest(key)})
+        return key
+
+    def user_for(self, key):
+        '''
+        Активный пользователь с ключом key или None.
+        '''
+        token = (self.select_related('user')
+                 .filter(digest=_digest(key), user__is_active=True).first())
+        return token.user if token else None
+
+
+class Token(models.Model):
+    '''
+    Ключ доступа к API для ручек, меняющих данные: клиент передаёт его
+    в заголовке Authorization: Token <ключ>.
+    '''
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='api_token',
+        verbose_name='Пользователь',
+    )
+    digest = models.CharField('Хеш ключа', max_length=64, unique=True)
+    issued_at = models.DateTimeField('Выдан', auto_now=True)
+
+    objects = TokenManager()
+
+    class Meta:
+        verbose_name = 'Ключ API'
+        verbose_name_plural = 'Ключи API'
+
+    def __str__(self):
+        return f'Ключ API {self.user}'
@@ -0,0 +1,217 @@
+import json
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, PostCounter, TimelineEntry
+from posts.views import NUMBER_OF_POSTS
+
+from ..models import Token
+
+User = get_user_model()
+
+
+class ApiViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='auth', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(NUMBER_OF_POSTS + 3):
+            Post.objects.create(author=cls.user, text=f'Пост № {i}')
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_endpoints_return_compact_json(self):
+        """Все ручки отвечают компактным JSON."""
+        urls = [
+            reverse('api:post_list'),
+            reverse('api:post_detail', args=[ApiViewsTests.post.pk]),
+            reverse('api:group_detail', args=['test-slug']),
+            reverse('api:group_posts', args=['test-slug']),
+            reverse('api:profile', args=['auth']),
+            reverse('api:profile_posts', args=['auth']),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertNotIn(b', ', response.content)
+                self.assertNotIn(b'\\u', response.content)
+
+    def test_post_detail(self):
+        """Пост отдаётся с автором, группой и счётчиком постов автора."""
+        data = self.client.get(
+            reverse('api:post_detail', args=[ApiViewsTests.post.pk])).json()
+        self.assertEqual(data['text'], 'Тестовый пост')
+        self.assertEqual(data['author'], 'auth')
+        self.assertEqual(data['group'], 'test-slug')
+        self.assertEqual(data['author_posts_count'], NUMBER_OF_POSTS + 4)
+
+    def test_details(self):
+        """Группа и профиль отдаются со счётчиками постов."""
+        group = self.client.get(
+            reverse('api:group_detail', args=['test-slug'])).json()
+        self.assertEqual(group, {
+            'slug': 'test-slug',
+            'title': 'Тестовая группа',
+            'description': 'Тестовое описание',
+            'posts_count': 1,
+        })
+        profile = self.client.get(reverse('api:profile', args=['auth'])).json()
+        self.assertEqual(profile['first_name'], 'Лев')
+        self.assertEqual(profile['posts_count'], NUMBER_OF_POSTS + 4)
+
+    def test_feed_cursor_pagination(self):
+        """Курсоры ведут по ленте без пропусков и повторов."""
+        url = reverse('api:post_list')
+        first = self.client.get(url).json()
+        self.assertEqual(len(first['results']), NUMBER_OF_POSTS)
+        self.assertIsNone(first['previous'])
+        second = self.client.get(url, {'after': first['next']}).json()
+        self.assertEqual(len(second['results']), 4)
+        self.assertIsNone(second['next'])
+        ids = [post['id'] for post in first['results'] + second['results']]
+        self.assertEqual(ids, list(
+            Post.objects.order_by('-pub_date', '-pk')
+            .values_list('id', flat=True)))
+        back = self.client.get(url, {'before': second['previous']}).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_limit(self):
+        """Размер страницы задаётся ?limit= в разумных пределах."""
+        url = reverse('api:post_list')
+        self.assertEqual(
+            len(self.client.get(url, {'limit': 2}).json()['results']), 2)
+        self.assertEqual(
+            len(self.client.get(url, {'limit': 'x'}).json()['results']),
+            NUMBER_OF_POSTS)
+
+    def test_missing_objects_404(self):
+        """Несуществующие объекты дают 404, запись запрещена."""
+        urls = [
+            reverse('api:post_detail', args=[10 ** 6]),
+            reverse('api:group_detail', args=['nope']),
+            reverse('api:group_posts', args=['nope']),
+            reverse('api:profile', args=['nobody']),
+            reverse('api:profile_posts', args=['nobody']),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code,
+                                 HTTPStatus.NOT_FOUND)
+        response = self.client.post(reverse('api:post_list'))
+        self.assertEqual(response.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
+
+
+class PostBulkTests(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=cls.follower, author=cls.user)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        # как у настоящего клиента API: CSRF проверяется
+        self.client = Client(enforce_csrf_checks=True)
+        self.key = Token.objects.issue(PostBulkTests.user)
+
+    def send(self, posts, key=None):
+        return self.client.post(reverse('api:post_bulk'),
+                                json.dumps({'posts': posts}),
+                                content_type='application/json',
+                                HTTP_AUTHORIZATION=f'Token {key or self.key}')
+
+    def test_bulk_create_updates_derived_data(self):
+        """Пачка сохраняется, счётчики и ленты обновляются."""
+        group = PostBulkTests.group
+        response = self.send([
+            {'text': 'Первый', 'group': group.pk},
+            {'text': 'Второй', 'group': str(group.pk)},
+            {'text': 'Третий'},
+        ])
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        created = response.json()['created']
+        self.assertEqual(len(created), 3)
+        self.assertEqual(
+            list(Post.objects.filter(pk__in=created)
+                 .order_by('pk').values_list('text', 'group')),
+            [('Первый', group.pk), ('Второй', group.pk), ('Третий', None)])
+        counters = PostCounter.objects
+        self.assertEqual(counters.get_value(PostCounter.SITE), 3)
+        self.assertEqual(
+            counters.get_value(PostCounter.AUTHOR, PostBulkTests.user.pk), 3)
+        self.assertEqual(counters.get_value(PostCounter.GROUP, group.pk), 2)
+        self.assertEqual(counters.verify(), [])
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=PostBulkTests.follower).count(), 3)
+
+    def test_invalid_items_reject_whole_batch(self):
+        """Ошибки возвращаются по номерам постов, ничего не сохраняется."""
+        response = self.send([
+            {'text': 'Нормальный'},
+            {'text': ''},
+            {'text': 'С чужой группой', 'group': 10 ** 6},
+            'не объект',
+        ])
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        errors = response.json()['errors']
+        self.assertEqual([error['index'] for error in errors], [1, 2, 3])
+        self.assertIn('text', errors[0]['errors'])
+        self.assertIn('group', errors[1]['errors'])
+        self.assertFalse(Post.objects.exists())
+
+    def test_query_count_does_not_grow_with_batch(self):
+        """Число запросов не зависит от размера пачки."""
+        counts = []
+        for size in (1, 2, 40):
+            posts = [{'text': f'Пост {i}', 'group': PostBulkTests.group.pk}
+                     for i in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.send(posts).status_code,
+                                 HTTPStatus.CREATED)
+            counts.append(len(queries))
+        # Первая пачка ещё заводит счётчики; дальше число запросов постоянно.
+        self.assertEqual(counts[1], counts[2])
+
+    def test_requires_token_and_valid_body(self):
+        """Без ключа API - 401 даже с сессией, кривому телу - 400."""
+        url = reverse('api:post_bulk')
+        self.client.force_login(PostBulkTests.user)
+        response = self.client.post(url, '{"posts": [{"text": "Пост"}]}',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+        old_key, self.key = self.key, Token.objects.issue(PostBulkTests.user)
+        for key in ('чужой', old_key):
+            with self.subTest(key=key):
+                response = self.send([{'text': 'Пост'}], key)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.UNAUTHORIZED)
+        response = self.client.post(url, 'не json',
+                                    content_type='application/json',
+                                    HTTP_AUTHORIZATION=f'Token {self.key}')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(self.send([]).status_code, HTTPStatus.BAD_REQUEST)
+        self.assertFalse(Post.objects.exists())
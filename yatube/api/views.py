@@ -0,0 +1,181 @@
+import json
+from functools import wraps
+
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, require_safe
+
+from posts.bulk import BULK_POSTS_MAX, create_posts, validate_posts
+
+from posts.conditional import (conditional_page, group_state, index_state,
+                               post_state, profile_state)
+from posts.models import Group, Post, PostCounter, User
+from posts.utils import cursor_paginator
+from posts.views import NUMBER_OF_POSTS
+
+from .models import Token
+
+MAX_LIMIT = 100
+# Столбцы поста и их имена в ответе: выбираются только они,
+# без создания экземпляров моделей.
+POST_COLUMNS = ('id', 'text', 'pub_date', 'author__username', 'group__slug')
+POST_KEYS = {'author__username': 'author', 'group__slug': 'group'}
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+def _json(data, status=200):
+    '''
+    Компактный JSON: без пробелов и без \\u-экранирования кириллицы.
+    '''
+    return JsonResponse(data, status=status, json_dumps_params=JSON_PARAMS)
+
+
+def token_required(view):
+    '''
+    Ручка, меняющая данные, для API-клиентов: пользователь берётся
+    только из заголовка Authorization: Token <ключ> (api.models.Token).
+    Сессия не используется, поэтому и проверка CSRF не нужна. Без ключа
+    или с неверным ключом - 401.
+    '''
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        scheme, _, key = request.META.get(
+            'HTTP_AUTHORIZATION', '').partition(' ')
+        user = (Token.objects.user_for(key.strip())
+                if scheme.lower() == 'token' and key.strip() else None)
+        if user is None:
+            response = _json({'detail': 'Требуется ключ API: заголовок '
+                                        'Authorization: Token <ключ>.'},
+                             status=401)
+            response['WWW-Authenticate'] = 'Token'
+            return response
+        request.user = user
+        return view(request, *args, **kwargs)
+    return csrf_exempt(wrapper)
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', NUMBER_OF_POSTS))
+    except ValueError:
+        return NUMBER_OF_POSTS
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def _post_json(row):
+    return {POST_KEYS.get(key, key): value for key, value in row.items()}
+
+
+def _feed(request, queryset):
+    '''
+    Страница ленты с курсорной пагинацией по (pub_date, id):
+    ?after=<next> - дальше в прошлое, ?before=<previous> - обратно.
+    '''
+    page = cursor_paginator(request, queryset.values(*POST_COLUMNS),
+                            _limit(request))
+    return _json({
+        'results': [_post_json(row) for row in page.object_list],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+@require_safe
+@conditional_page(index_state)
+def post_list(request):
+    '''
+    Общая лента постов, от новых к старым.
+    '''
+    return _feed(request, Post.objects.all())
+
+
+@require_safe
+@conditional_page(post_state)
+def post_detail(request, post_id):
+    '''
+    Один пост и число постов его автора.
+    '''
+    row = (Post.objects.filter(pk=post_id)
+           .values(*POST_COLUMNS, 'author_id').first())
+    if row is None:
+        raise Http404('Пост не найден.')
+    post = _post_json(row)
+    post['author_posts_count'] = PostCounter.objects.get_value(
+        PostCounter.AUTHOR, post.pop('author_id'))
+    return _json(post)
+
+
+@require_safe
+@conditional_page(group_state)
+def group_detail(request, slug):
+    '''
+    Описание группы и число постов в ней.
+    '''
+    group = get_object_or_404(
+        Group.objects.values('id', 'slug', 'title', 'description'),
+        slug=slug)
+    group['posts_count'] = PostCounter.objects.get_value(
+        PostCounter.GROUP, group.pop('id'))
+    return _json(group)
+
+
+@require_safe
+@conditional_page(group_state)
+def group_posts(request, slug):
+    '''
+    Лента постов группы.
+    '''
+    group = get_object_or_404(Group.objects.values('pk'), slug=slug)
+    return _feed(request, Post.objects.filter(group_id=group['pk']))
+
+
+@require_safe
+@conditional_page(profile_state)
+def profile(request, username):
+    '''
+    Автор и число его постов.
+    '''
+    user = get_object_or_404(
+        User.objects.values('id', 'username', 'first_name', 'last_name'),
+        username=username)
+    user['posts_count'] = PostCounter.objects.get_value(
+        PostCounter.AUTHOR, user.pop('id'))
+    return _json(user)
+
+
+@require_safe
+@conditional_page(profile_state)
+def profile_posts(request, username):
+    '''
+    Лента постов автора.
+    '''
+    user = get_object_or_404(User.objects.values('pk'), username=username)
+    return _feed(request, Post.objects.filter(author_id=user['pk']))
+
+
+@require_POST
+@token_required
+def post_bulk(request):
+    '''
+    Создаёт пачку постов владельца ключа API.
+    Тело запроса: {"posts": [{"text": ..., "group": id}, ...]}.
+    Посты проверяются по правилам PostForm; если хоть один с ошибкой,
+    не сохраняется ни один, а в ответе - ошибки по номерам постов.
+    Иначе все посты сохраняются одной транзакцией.
+    '''
+    try:
+        items = json.loads(request.body)['posts']
+    except (ValueError, KeyError, TypeError):
+        return _json({'detail': 'Ожидался JSON вида {"posts": [...]}.'},
+                     status=400)
+    if not isinstance(items, list) or not items:
+        return _json({'detail': 'Список постов пуст.'}, status=400)
+    if len(items) > BULK_POSTS_MAX:
+        return _json({'detail': f'Не больше {BULK_POSTS_MAX} постов '
+                                f'за раз.'}, status=400)
+    posts, errors = validate_posts(request.user, items)
+    if errors:
+        return _json({'errors': errors}, status=400)
+    posts = create_posts(request.user, posts)
+    return _json({'created': [post.pk for post in posts]}, status=201)
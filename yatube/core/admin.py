@@ -0,0 +1,26 @@
+from django.contrib import admin
+
+from .models import Task
+from .tasks import REGISTRY
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'status', 'attempts', 'run_at',
+                    'locked_until', 'created_at')
+    list_filter = ('status', 'name')
+    search_fields = ('key',)
+    exclude = ('payload',)
+    readonly_fields = ('data', 'locked_by', 'locked_until', 'last_error',
+                       'created_at')
+
+    def data(self, task):
+        '''
+        Данные задачи; у задач с секретами (task(sensitive=True)) и
+        задач без обработчика - только пометка, что данные скрыты.
+        '''
+        handler = REGISTRY.get(task.name)
+        if handler is None or handler.sensitive:
+            return 'скрыто'
+        return task.payload
+    data.short_description = 'Данные (JSON)'
@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import auth, sqlite
+        sqlite.install()
+        auth.install()
+        # обработчики фоновых задач (core.tasks) из модулей <app>.tasks
+        autodiscover_modules('tasks')
+        # задача отправки писем (core.mail.QueuedEmailBackend)
+        from . import mail  # noqa: F401
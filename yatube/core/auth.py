@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+USER_KEY = 'auth:user:{pk}'
+
+
+def forget_user(pk):
+    cache.delete(USER_KEY.format(pk=pk))
+
+
+class CachedModelBackend(ModelBackend):
+    '''
+    ModelBackend, который достаёт пользователя сессии из кеша по id.
+    AuthenticationMiddleware вызывает get_user на каждом запросе;
+    с кешем это не стоит ни одного SQL-запроса. Запись сбрасывается
+    при любом сохранении и удалении пользователя (смена пароля, имени,
+    is_active, last_login), так что проверка хеша сессии и
+    user_can_authenticate видят актуальные данные. Правки мимо save()
+    (QuerySet.update) кеш не сбрасывают: после них нужен forget_user.
+    '''
+    def get_user(self, user_id):
+        key = USER_KEY.format(pk=user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user
+
+
+def _forget_saved_user(sender, instance, raw=False, **kwargs):
+    forget_user(instance.pk)
+
+
+def install():
+    '''
+    Подключает сброс кеша пользователей; вызывается из CoreConfig.ready.
+    '''
+    user_model = get_user_model()
+    post_save.connect(_forget_saved_user, sender=user_model,
+                      dispatch_uid='core.auth.forget_saved_user')
+    post_delete.connect(_forget_saved_user, sender=user_model,
+                        dispatch_uid='core.auth.forget_deleted_user')
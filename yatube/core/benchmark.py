@@ -0,0 +1,109 @@
+import json
+import math
+import platform
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(values, share):
+    '''
+    Перцентиль по методу ближайшего ранга: percentile(values, 0.95).
+    '''
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(share * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def summarize(latencies):
+    '''
+    Сводка по задержкам в миллисекундах: p50/p95/p99, среднее и максимум,
+    а также пропускная способность одного потока (запросов в секунду).
+    '''
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(statistics.mean(latencies), 3) if latencies else 0,
+        'max_ms': round(max(latencies), 3) if latencies else 0,
+        'throughput_rps': (round(1000 * len(latencies) / sum(latencies), 1)
+                           if sum(latencies) else 0),
+    }
+
+
+def measure(call, repeat):
+    '''
+    Вызывает call() repeat раз и возвращает сводку по задержкам.
+    Отдельным прогоном снимает число SQL-запросов, пиковую память
+    и размер ответа, чтобы tracemalloc не искажал задержки.
+    '''
+    call()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    result = summarize(latencies)
+
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries:
+        response = call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result['queries'] = len(queries)
+    result['peak_memory_kb'] = round(peak / 1024, 1)
+    content = getattr(response, 'content', None)
+    if content is not None:
+        result['response_bytes'] = len(content)
+    return result
+
+
+def environment():
+    '''
+    Описание окружения, в котором снимались замеры.
+    '''
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def save_report(path, results, **meta):
+    '''
+    Сохраняет результаты замеров в JSON, пригодный для сравнения прогонов.
+    '''
+    report = {'meta': {**environment(), **meta}, 'results': results}
+    with open(path, 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, ensure_ascii=False, indent=2)
+    return report
+
+
+def compare_reports(old_path, results, key_fields=('size', 'scenario'),
+                    metric='p95_ms'):
+    '''
+    Сравнивает новые результаты с сохранённым отчётом.
+    Возвращает строки (ключ, было, стало, изменение в процентах).
+    '''
+    with open(old_path, encoding='utf-8') as report_file:
+        old = json.load(report_file)['results']
+    old_by_key = {tuple(row.get(f) for f in key_fields): row for row in old}
+    rows = []
+    for row in results:
+        key = tuple(row.get(f) for f in key_fields)
+        before = old_by_key.get(key, {}).get(metric)
+        after = row.get(metric)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before * 100 if before else 0.0
+        rows.append((key, before, after, round(change, 1)))
+    return rows
@@ -0,0 +1,66 @@
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_local = threading.local()
+# Эти таблицы всегда читаются из основной БД: отставшая реплика
+# разлогинила бы только что вошедшего пользователя или отдала бы
+# воркеру уже взятые задачи очереди.
+PRIMARY_APP_LABELS = {'sessions', 'core'}
+
+
+def start_request(pinned):
+    '''
+    Начинает учёт для запроса: pinned=True отправляет все чтения
+    запроса в основную БД.
+    '''
+    _local.pinned = pinned
+    _local.wrote = False
+
+
+def finish_request():
+    '''
+    Заканчивает учёт запроса. Возвращает True, если запрос что-то писал.
+    '''
+    wrote = getattr(_local, 'wrote', False)
+    _local.pinned = False
+    _local.wrote = False
+    return wrote
+
+
+def is_pinned():
+    return getattr(_local, 'pinned', False) or getattr(_local, 'wrote', False)
+
+
+class ReplicaRouter:
+    '''
+    Запись - в основную БД, чтение - в случайную реплику из
+    REPLICA_DATABASES. Чтения идут в основную БД, если:
+    - в этом запросе (или команде) уже была запись - видим свои изменения;
+    - запрос закреплён за основной БД (не GET или недавняя запись этой
+      сессии, см. core.middleware.replicas);
+    - открыта транзакция в основной БД;
+    - читаются сессии или очередь задач.
+    Без реплик маршрутизатор ни на что не влияет.
+    '''
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if (not replicas or is_pinned()
+                or model._meta.app_label in PRIMARY_APP_LABELS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии основной БД, объекты из них взаимозаменяемы.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема реплик приезжает вместе с копией (manage.py sync_replicas).
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,146 @@
+import base64
+import logging
+import smtplib
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .tasks import enqueue_many, task
+
+logger = logging.getLogger('yatube.mail')
+
+
+def serialize(message):
+    '''
+    Письмо в виде данных задачи (JSON). Вложения - только кортежи
+    (имя, содержимое, тип), байтовое содержимое кодируется в base64.
+    '''
+    attachments = []
+    for attachment in message.attachments:
+        if not isinstance(attachment, tuple):
+            raise ValueError('Очередь писем не поддерживает MIME-вложения')
+        filename, content, mimetype = attachment
+        if isinstance(content, bytes):
+            attachments.append(
+                [filename, base64.b64encode(content).decode(), mimetype, True])
+        else:
+            attachments.append([filename, content, mimetype, False])
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': list(message.to),
+        'cc': list(message.cc),
+        'bcc': list(message.bcc),
+        'reply_to': list(message.reply_to),
+        'headers': dict(message.extra_headers),
+        'alternatives': [list(alternative) for alternative
+                         in getattr(message, 'alternatives', [])],
+        'attachments': attachments,
+        'content_subtype': message.content_subtype,
+    }
+
+
+def deserialize(data):
+    '''
+    Собирает письмо обратно из данных задачи.
+    '''
+    message = EmailMultiAlternatives(
+        subject=data['subject'], body=data['body'],
+        from_email=data['from_email'], to=data['to'], cc=data['cc'],
+        bcc=data['bcc'], reply_to=data['reply_to'], headers=data['headers'],
+        alternatives=[tuple(item) for item in data['alternatives']])
+    message.content_subtype = data['content_subtype']
+    for filename, content, mimetype, encoded in data['attachments']:
+        if encoded:
+            content = base64.b64decode(content)
+        message.attach(filename, content, mimetype)
+    return message
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    '''
+    Почтовый бэкенд, который не ждёт SMTP-сервер: письма записываются
+    в фоновую очередь (core.tasks) одним INSERT в текущей транзакции, и
+    запрос сразу идёт дальше. Отправляет их воркер (manage.py
+    run_tasks) через MAIL_DELIVERY_BACKEND.
+    '''
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+        try:
+            enqueue_many('core.send_mail',
+                         [serialize(message) for message in email_messages])
+        except Exception:
+            if not self.fail_silently:
+                raise
+            return 0
+        return len(email_messages)
+
+
+class Throttle:
+    '''
+    Не больше rate вызовов wait() в секунду; 0 - без ограничения.
+    '''
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_at = 0
+
+    def wait(self):
+        now = time.monotonic()
+        if now < self.next_at:
+            time.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = now + self.interval
+
+
+def _send(connection, message):
+    '''
+    Отправляет письмо по открытому соединению, повторяя временные
+    ошибки до MAIL_SEND_RETRIES раз. Оборванное соединение открывается
+    заново. Возвращает текст ошибки или None, если письмо ушло.
+    '''
+    error = None
+    for attempt in range(settings.MAIL_SEND_RETRIES + 1):
+        if attempt:
+            time.sleep(settings.MAIL_RETRY_DELAY * 2 ** (attempt - 1))
+        try:
+            connection.open()
+            connection.send_messages([message])
+            return None
+        except smtplib.SMTPResponseException as exc:
+            error = f'{exc.smtp_code} {exc.smtp_error!r}'
+            if exc.smtp_code >= 500:
+                # постоянная ошибка (адреса нет и т.п.): повтор не поможет
+                logger.error('Письмо %r не принято: %s', message.to, error)
+                return None
+        except (smtplib.SMTPException, OSError) as exc:
+            error = repr(exc)
+            connection.close()
+    return error
+
+
+@task('core.send_mail', batch=True, sensitive=True)
+def deliver(payloads):
+    '''
+    Отправляет пачку писем из очереди через одно соединение
+    MAIL_DELIVERY_BACKEND, не быстрее MAIL_RATE_LIMIT писем в секунду.
+    Неотправленные письма возвращаются очереди на повтор с задержкой.
+    В письмах бывают ссылки сброса пароля, поэтому задача sensitive:
+    текст письма не виден в админке и стирается, если письмо так и не
+    ушло.
+    '''
+    failed = {}
+    throttle = Throttle(settings.MAIL_RATE_LIMIT)
+    connection = get_connection(settings.MAIL_DELIVERY_BACKEND)
+    try:
+        for index, payload in enumerate(payloads):
+            throttle.wait()
+            error = _send(connection, deserialize(payload))
+            if error is not None:
+                failed[index] = error
+    finally:
+        connection.close()
+    return failed
@@ -0,0 +1,118 @@
+import time
+
+from django.core.mail import get_connection, send_mail
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.test.utils import (setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+
+from ...benchmark import save_report, summarize
+from ...models import Task
+from ...smtp_stub import SMTPStub
+from ...tasks import run_pending
+
+SMTP_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+
+def _send(number, connection=None):
+    send_mail(f'Письмо {number}', 'Текст письма', 'yatube@example.com',
+              [f'user{number}@example.com'], connection=connection)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает отправку писем прямо в запросе (SMTP) и через '
+            'очередь (core.mail.QueuedEmailBackend) на локальном '
+            'SMTP-сервере с задержкой: сколько ждёт запрос и сколько '
+            'писем в секунду отправляет воркер.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200)
+        parser.add_argument('--delay', type=float, default=0.005,
+                            help='Задержка ответа сервера на письмо, с.')
+        parser.add_argument('--fail-every', type=int, default=0,
+                            help='Каждое N-е письмо - ошибка 451.')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--output', default='bench_mail.json')
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with SMTPStub(delay=options['delay'],
+                          fail_every=options['fail_every']) as stub, \
+                    override_settings(EMAIL_HOST='127.0.0.1',
+                                      EMAIL_PORT=stub.port,
+                                      MAIL_DELIVERY_BACKEND=SMTP_BACKEND,
+                                      MAIL_RATE_LIMIT=0, MAIL_RETRY_DELAY=0,
+                                      TASKS_EAGER=False,
+                                      QUERY_INSPECTOR_ENABLED=False):
+                results = [self.direct(stub, count),
+                           self.queued(stub, count, options['batch_size'])]
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+        for row in results:
+            self.stdout.write(
+                f'{row["scenario"]:<7} запрос p50 {row["p50_ms"]:>8} мс, '
+                f'p95 {row["p95_ms"]:>8} мс; отправка {row["sent"]} писем '
+                f'за {row["delivery_s"]} с ({row["messages_per_s"]}/с), '
+                f'соединений {row["connections"]}')
+        save_report(options['output'], results, messages=count,
+                    delay=options['delay'],
+                    fail_every=options['fail_every'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Отчёт сохранён в {options["output"]}'))
+
+    def _snapshot(self, stub):
+        with stub.lock:
+            return len(stub.messages), stub.connections
+
+    def direct(self, stub, count):
+        '''
+        Как раньше: каждое письмо отправляется в запросе по своему
+        SMTP-соединению, запрос ждёт сервер.
+        '''
+        sent, connections = self._snapshot(stub)
+        latencies = []
+        start = time.perf_counter()
+        for number in range(count):
+            began = time.perf_counter()
+            try:
+                _send(number, get_connection(SMTP_BACKEND))
+            except Exception:
+                pass  # в запросе повторять некогда: письмо потеряно
+            latencies.append((time.perf_counter() - began) * 1000)
+        return self._row('direct', stub, latencies,
+                         time.perf_counter() - start, sent, connections)
+
+    def queued(self, stub, count, batch_size):
+        '''
+        Запрос только ставит письмо в очередь, отправляет воркер пачками.
+        '''
+        sent, connections = self._snapshot(stub)
+        latencies = []
+        with override_settings(EMAIL_BACKEND='core.mail.QueuedEmailBackend'):
+            for number in range(count):
+                began = time.perf_counter()
+                _send(number)
+                latencies.append((time.perf_counter() - began) * 1000)
+        start = time.perf_counter()
+        while run_pending(batch_size):
+            pass
+        row = self._row('queued', stub, latencies,
+                        time.perf_counter() - start, sent, connections)
+        row['left_in_queue'] = Task.objects.count()
+        return row
+
+    def _row(self, scenario, stub, latencies, elapsed, sent, connections):
+        sent_now, connections_now = self._snapshot(stub)
+        delivered = sent_now - sent
+        return {
+            'scenario': scenario,
+            **summarize(latencies),
+            'sent': delivered,
+            'delivery_s': round(elapsed, 3),
+            'messages_per_s': round(delivered / elapsed, 1) if elapsed else 0,
+            'connections': connections_now - connections,
+        }
@@ -0,0 +1,46 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ... import db_router
+from ...tasks import run_pending
+
+
+class Command(BaseCommand):
+    help = ('Воркер фоновой очереди (core.tasks): берёт задачи из БД '
+            'пачками и выполняет их в пуле потоков. Брокер не нужен.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=settings.TASK_WORKERS,
+                            help='Число потоков пула.')
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.TASK_BATCH_SIZE,
+                            help='Сколько задач брать за один проход.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Пауза в секундах, когда очередь пуста.')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи и выйти.')
+
+    def handle(self, *args, **options):
+        total = 0
+        # очередь читается из основной БД, а не из реплик
+        db_router.start_request(pinned=True)
+        with ThreadPoolExecutor(max_workers=options['workers'],
+                                thread_name_prefix='tasks') as executor:
+            try:
+                while True:
+                    taken = run_pending(options['batch_size'], executor)
+                    total += taken
+                    if taken:
+                        continue
+                    if options['once']:
+                        break
+                    connections.close_all()
+                    time.sleep(options['poll_interval'])
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(f'Выполнено задач: {total}')
@@ -0,0 +1,58 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def copy_database(source_alias, path):
+    '''
+    Копирует SQLite-базу source_alias в файл path через backup API:
+    копия согласована, даже если в исходную базу в это время пишут.
+    Файл подменяется атомарно, так что читатели реплики видят либо
+    старую, либо новую копию целиком.
+    '''
+    source = connections[source_alias]
+    if source.vendor != 'sqlite':
+        raise CommandError('Синхронизация реплик поддерживается '
+                           'только для SQLite.')
+    source.ensure_connection()
+    temporary = f'{path}.sync'
+    target = sqlite3.connect(temporary)
+    try:
+        source.connection.backup(target)
+        # WAL основной БД копии не нужен: файл подменяется целиком.
+        target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        target.close()
+    os.replace(temporary, path)
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную SQLite-базу во все реплики из '
+            'REPLICA_DATABASES (для локальной проверки маршрутизатора).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watch', type=float, metavar='SECONDS',
+                            help='Повторять синхронизацию с этим '
+                                 'интервалом, пока команду не остановят.')
+
+    def handle(self, *args, **options):
+        if not settings.REPLICA_DATABASES:
+            raise CommandError('Реплики не настроены: задайте '
+                               'YATUBE_DB_REPLICAS.')
+        while True:
+            start = time.perf_counter()
+            for alias in settings.REPLICA_DATABASES:
+                connections[alias].close()
+                copy_database(DEFAULT_DB_ALIAS,
+                              connections[alias].settings_dict['NAME'])
+            self.stdout.write(
+                f'Реплики {", ".join(settings.REPLICA_DATABASES)} '
+                f'синхронизированы за '
+                f'{(time.perf_counter() - start) * 1000:.0f} мс')
+            if not options['watch']:
+                return
+            time.sleep(options['watch'])
@@ -0,0 +1,231 @@
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Registry:
+    '''
+    Реестр метрик одного процесса: счётчики и гистограммы с метками.
+    Запись - это пара операций со словарём под блокировкой. В файл
+    процесса (для сборки нескольких воркеров) реестр сбрасывает
+    фоновый поток, а не обработчик запроса.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.buckets = {}
+        self.help = {}
+        self._flusher_pid = None
+
+    def describe(self, name, text, buckets=None):
+        self.help[name] = text
+        if buckets is not None:
+            self.buckets[name] = tuple(buckets)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        self._ensure_flusher()
+
+    def observe(self, name, value, **labels):
+        buckets = self.buckets[name]
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(buckets, value)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [
+                    [0] * (len(buckets) + 1), 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+        self._ensure_flusher()
+
+    def snapshot(self):
+        '''
+        Копия данных реестра в виде, пригодном для JSON.
+        '''
+        with self.lock:
+            return {
+                'counters': [[name, dict(labels), value] for
+                             (name, labels), value in self.counters.items()],
+                'histograms': [[name, dict(labels), list(counts), total]
+                               for (name, labels), (counts, total)
+                               in self.histograms.items()],
+            }
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def flush(self, directory=None):
+        '''
+        Записывает снимок реестра в файл процесса <pid>.json атомарно.
+        '''
+        directory = directory or settings.METRICS_DIR
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file)
+        os.replace(temporary, path)
+
+    def _ensure_flusher(self):
+        # После fork у дочернего процесса своего потока нет: проверяем pid.
+        if self._flusher_pid == os.getpid() or not settings.METRICS_DIR:
+            return
+        with self.lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        thread = threading.Thread(target=self._flush_forever, daemon=True,
+                                  name='metrics-flusher')
+        thread.start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+
+REGISTRY = Registry()
+REGISTRY.describe('http_requests_total', 'Число обработанных запросов.')
+REGISTRY.describe('http_request_duration_seconds',
+                  'Время обработки запроса.', LATENCY_BUCKETS)
+REGISTRY.describe('http_db_queries_per_request',
+                  'Число SQL-запросов на один HTTP-запрос.', QUERY_BUCKETS)
+REGISTRY.describe('http_db_duration_seconds',
+                  'Время в БД на один HTTP-запрос.', LATENCY_BUCKETS)
+REGISTRY.describe('http_response_size_bytes',
+                  'Размер тела ответа.', SIZE_BUCKETS)
+REGISTRY.describe('cache_requests_total',
+                  'Обращения к кешам по результату: hit или miss.')
+
+
+def inc(name, value=1, **labels):
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    REGISTRY.observe(name, value, **labels)
+
+
+def record_request(view, method, status, duration, queries, db_time, size):
+    '''
+    Записывает метрики одного HTTP-запроса.
+    '''
+    REGISTRY.inc('http_requests_total', view=view, method=method,
+                 status=str(status))
+    REGISTRY.observe('http_request_duration_seconds', duration, view=view)
+    REGISTRY.observe('http_db_queries_per_request', queries, view=view)
+    REGISTRY.observe('http_db_duration_seconds', db_time, view=view)
+    if size is not None:
+        REGISTRY.observe('http_response_size_bytes', size, view=view)
+
+
+def record_cache(cache_name, hits, misses):
+    '''
+    Записывает попадания и промахи кеша.
+    '''
+    if hits:
+        REGISTRY.inc('cache_requests_total', hits, cache=cache_name,
+                     result='hit')
+    if misses:
+        REGISTRY.inc('cache_requests_total', misses, cache=cache_name,
+                     result='miss')
+
+
+def collect(directory=None):
+    '''
+    Сводит метрики всех процессов: из файлов воркеров в directory,
+    а без него - из памяти текущего процесса.
+    '''
+    directory = directory or settings.METRICS_DIR
+    if not directory:
+        snapshots = [REGISTRY.snapshot()]
+    else:
+        REGISTRY.flush(directory)
+        snapshots = []
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            try:
+                with open(path) as snapshot_file:
+                    snapshots.append(json.load(snapshot_file))
+            except (OSError, ValueError):
+                continue
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(sorted(labels.items())))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, counts, total in snapshot['histograms']:
+            key = (name, tuple(sorted(labels.items())))
+            merged = histograms.setdefault(key, [[0] * len(counts), 0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+    return counters, histograms
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"')
+         .replace('\n', '\\n'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def _format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(counters, histograms):
+    '''
+    Текстовый формат экспозиции Prometheus.
+    '''
+    lines = []
+    by_name = {}
+    for (name, labels), value in sorted(counters.items()):
+        by_name.setdefault(name, ('counter', []))[1].append((labels, value))
+    for (name, labels), value in sorted(histograms.items()):
+        by_name.setdefault(name, ('histogram', []))[1].append((labels, value))
+    for name, (kind, series) in by_name.items():
+        if name in REGISTRY.help:
+            lines.append(f'# HELP {name} {REGISTRY.help[name]}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in series:
+            if kind == 'counter':
+                lines.append(f'{name}{_format_labels(labels)} '
+                             f'{_format_number(value)}')
+                continue
+            counts, total = value
+            bounds = [str(bound) for bound in REGISTRY.buckets[name]]
+            cumulative = 0
+            for bound, count in zip(bounds + ['+Inf'], counts):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{_format_labels(labels, [("le", bound)])} '
+                    f'{cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} '
+                         f'{_format_number(total)}')
+            lines.append(f'{name}_count{_format_labels(labels)} '
+                         f'{cumulative}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,15 @@
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+
+@contextmanager
+def execute_wrapper_all(wrapper):
+    '''
+    connection.execute_wrapper сразу для всех баз из DATABASES: запросы
+    к репликам (core.db_router) тоже проходят через wrapper.
+    '''
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
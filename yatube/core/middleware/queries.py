@@ -0,0 +1,135 @@
+import logging
+import re
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.db.models.fields import related_descriptors
+from django.template.base import Node
+
+from . import execute_wrapper_all
+
+logger = logging.getLogger('yatube.queries')
+
+IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+SPACES_RE = re.compile(r'\s+')
+RELATION_DESCRIPTORS = (
+    related_descriptors.ForwardManyToOneDescriptor,
+    related_descriptors.ReverseOneToOneDescriptor,
+)
+
+
+class QueryProblem(AssertionError):
+    '''
+    Строгий режим: представление превысило бюджет запросов
+    или выполняет однотипные запросы в цикле (N+1).
+    '''
+
+
+def fingerprint(sql):
+    '''
+    Форма запроса без значений: параметры уже вынесены в %s,
+    остаётся схлопнуть списки IN (...) и пробелы.
+    '''
+    return IN_LIST_RE.sub('IN (...)', SPACES_RE.sub(' ', sql.strip()))
+
+
+def _describe_relation(descriptor):
+    if isinstance(descriptor, related_descriptors.ReverseOneToOneDescriptor):
+        related = descriptor.related
+        return f'{related.model.__name__}.{related.get_accessor_name()}'
+    field = descriptor.field
+    return f'{field.model.__name__}.{field.name}'
+
+
+def query_origin():
+    '''
+    Ищет в стеке вызовов, откуда пришёл запрос: обращение к связи модели
+    (Post.author) и строку шаблона, в которой это обращение произошло.
+    '''
+    relation = template = None
+    frame = sys._getframe(2)
+    while frame is not None and (relation is None or template is None):
+        # type() вместо isinstance(): isinstance() у ленивых объектов
+        # (request.user) вычисляет их и сам порождает запросы.
+        owner_type = type(frame.f_locals.get('self'))
+        owner = frame.f_locals.get('self')
+        if (relation is None and frame.f_code.co_name == '__get__'
+                and issubclass(owner_type, RELATION_DESCRIPTORS)):
+            relation = _describe_relation(owner)
+        elif (template is None and issubclass(owner_type, Node)
+                and getattr(owner, 'token', None) is not None):
+            template = f'{owner.origin.template_name}:{owner.token.lineno}'
+        frame = frame.f_back
+    return relation, template
+
+
+class QueryLog:
+    '''
+    Запросы одного HTTP-запроса: форма, связь модели и строка шаблона.
+    '''
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        relation, template = query_origin()
+        self.queries.append((fingerprint(sql), relation, template))
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold):
+        '''
+        Однотипные запросы, выполненные threshold и более раз из-за
+        обращения к связи модели. Возвращает список словарей.
+        '''
+        counts = Counter(self.queries)
+        return [
+            {'count': count, 'relation': relation, 'template': template,
+             'sql': shape}
+            for (shape, relation, template), count in counts.most_common()
+            if count >= threshold and relation is not None
+        ]
+
+
+def budget_for(view_name):
+    return settings.QUERY_BUDGETS.get(view_name,
+                                      settings.QUERY_BUDGET_DEFAULT)
+
+
+class QueryInspectorMiddleware:
+    '''
+    Ищет N+1: повторяющиеся запросы одной формы, вызванные обращением
+    к связи модели (например, post.author в шаблоне), и сообщает связь
+    и строку шаблона. Проверяет бюджет запросов представления из
+    QUERY_BUDGETS. В строгом режиме (QUERY_INSPECTOR_STRICT) проблема
+    превращается в исключение, и тест падает.
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_INSPECTOR_ENABLED:
+            return self.get_response(request)
+        log = QueryLog()
+        with execute_wrapper_all(log):
+            response = self.get_response(request)
+        self.check(request, log)
+        return response
+
+    def check(self, request, log):
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else request.path
+        problems = [
+            f'N+1: {item["count"]} запросов через {item["relation"]} '
+            f'в {item["template"] or "коде представления"}: {item["sql"]}'
+            for item in log.repeated(settings.QUERY_INSPECTOR_THRESHOLD)
+        ]
+        budget = budget_for(view_name)
+        if budget is not None and len(log.queries) > budget:
+            problems.append(f'{len(log.queries)} запросов при бюджете '
+                            f'{budget}')
+        if not problems:
+            return
+        message = f'{request.method} {view_name}: ' + '; '.join(problems)
+        if settings.QUERY_INSPECTOR_STRICT:
+            raise QueryProblem(message)
+        logger.warning(message)
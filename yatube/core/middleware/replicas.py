@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+
+from .. import db_router
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _pinned_until(request):
+    try:
+        return float(request.COOKIES.get(settings.REPLICA_PIN_COOKIE, 0))
+    except ValueError:
+        return 0
+
+
+class ReplicaPinMiddleware:
+    '''
+    Read-your-writes для реплик: после запроса, который что-то записал,
+    ставит cookie, и следующие REPLICA_PIN_SECONDS секунд все чтения
+    этого клиента идут в основную БД - автор сразу видит свой пост,
+    даже если реплики ещё не синхронизированы. Небезопасные методы
+    (POST и т.п.) читают из основной БД всегда.
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+        db_router.start_request(
+            request.method not in SAFE_METHODS
+            or _pinned_until(request) > time.time())
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = db_router.finish_request()
+        if wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                str(int(time.time() + settings.REPLICA_PIN_SECONDS)),
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,167 @@
+import mimetypes
+import os
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+
+# имя, которое дала файлу ManifestStaticFilesStorage: 12 символов md5
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# предпочтительные кодировки: сначала лучшая
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+Asset = namedtuple('Asset', 'path content_type size mtime variants immutable')
+
+
+def _content_type(name):
+    content_type, _ = mimetypes.guess_type(name)
+    if content_type is None:
+        return 'application/octet-stream'
+    if content_type.startswith('text/') or content_type.endswith(
+            ('javascript', 'json', 'xml')):
+        return f'{content_type}; charset=utf-8'
+    return content_type
+
+
+def stat_asset(root, name):
+    '''
+    Ищет файл name в STATIC_ROOT и его сжатые варианты.
+    Возвращает Asset или None, если файла нет или путь выходит за root.
+    '''
+    try:
+        path = safe_join(root, name)
+    except SuspiciousFileOperation:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if not os.path.isfile(path):
+        return None
+    variants = {}
+    for encoding, suffix in ENCODINGS:
+        if os.path.isfile(path + suffix):
+            variants[encoding] = (path + suffix,
+                                  os.path.getsize(path + suffix))
+    return Asset(path, _content_type(name), stat.st_size, int(stat.st_mtime),
+                 variants, bool(HASHED_NAME.search(name)))
+
+
+@lru_cache(maxsize=4096)
+def find_hashed_asset(root, name):
+    '''
+    stat_asset для имени с хешем: содержимое такого файла не меняется,
+    поэтому найденный файл запоминается. Промах не запоминается
+    (исключение lru_cache не кеширует) - файл может появиться после
+    следующего collectstatic.
+    '''
+    asset = stat_asset(root, name)
+    if asset is None:
+        raise LookupError(name)
+    return asset
+
+
+def find_asset(root, name):
+    '''
+    Asset для name или None. Файлы без хеша в имени collectstatic
+    перезаписывает на месте, их размер и время изменения читаются
+    заново на каждый запрос.
+    '''
+    if not HASHED_NAME.search(name):
+        return stat_asset(root, name)
+    try:
+        return find_hashed_asset(root, name)
+    except LookupError:
+        return None
+
+
+def accepted_encodings(header):
+    '''
+    Кодировки из Accept-Encoding, кроме явно запрещённых (q=0).
+    '''
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q=') and not params[2:].strip('0.'):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_variant(asset, header):
+    '''
+    Лучший вариант файла для клиента: (кодировка, путь, размер).
+    Для несжатого файла кодировка - None.
+    '''
+    accepted = accepted_encodings(header)
+    for encoding, _ in ENCODINGS:
+        if encoding in asset.variants and encoding in accepted:
+            path, size = asset.variants[encoding]
+            return encoding, path, size
+    return None, asset.path, asset.size
+
+
+def _cache_headers(response, asset, etag):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(asset.mtime)
+    if asset.immutable:
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response['Cache-Control'] = (
+            f'public, max-age={settings.STATIC_MAX_AGE}')
+    if asset.variants:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        return etag in (tag.strip() for tag in if_none_match.split(','))
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE'))
+    return since is not None and mtime <= since
+
+
+class StaticFilesMiddleware:
+    '''
+    Отдаёт собранную статику из STATIC_ROOT до остальной цепочки
+    middleware: без сессий, БД и маршрутизации.
+    Выбирает по Accept-Encoding готовый вариант .br или .gz, файлам
+    с хешем в имени ставит Cache-Control immutable на год. Тело
+    отдаёт FileResponse: WSGI-сервер передаёт открытый файл в
+    wsgi.file_wrapper (у gunicorn и uwsgi это sendfile), то есть файл
+    не читается в память приложения. Включается STATIC_SERVE; в DEBUG
+    статику отдаёт runserver.
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        prefix = settings.STATIC_URL
+        if (not settings.STATIC_SERVE
+                or request.method not in ('GET', 'HEAD')
+                or not request.path_info.startswith(prefix)):
+            return self.get_response(request)
+        asset = find_asset(settings.STATIC_ROOT,
+                           request.path_info[len(prefix):])
+        if asset is None:
+            return self.get_response(request)
+        encoding, path, size = choose_variant(
+            asset, request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        etag = f'"{asset.mtime:x}-{size:x}-{encoding or "identity"}"'
+        if _not_modified(request, etag, asset.mtime):
+            return _cache_headers(HttpResponseNotModified(), asset, etag)
+        response = FileResponse(open(path, 'rb'),
+                                content_type=asset.content_type)
+        response['Content-Length'] = size
+        if encoding:
+            response['Content-Encoding'] = encoding
+        return _cache_headers(response, asset, etag)
@@ -0,0 +1,207 @@
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.template import context as template_context
+from django.template.backends import django as django_backend
+
+from .. import metrics
+from . import execute_wrapper_all
+
+logger = logging.getLogger('yatube.slow_requests')
+
+_local = threading.local()
+_instrumented = False
+SLOWEST_QUERIES_IN_LOG = 10
+
+
+class RequestTimings:
+    '''
+    Замеры одного запроса: время в БД, шаблонах, контекст-процессорах
+    и представлении, а также выполненные SQL-запросы.
+    '''
+    def __init__(self):
+        self.db = 0.0
+        self.queries = []
+        self.template = 0.0
+        self.context_processors = 0.0
+        self.view = 0.0
+        self.render_depth = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.db += duration
+            self.queries.append((duration, sql))
+
+    def server_timing(self, total):
+        '''
+        Значение заголовка Server-Timing, длительности в миллисекундах.
+        '''
+        metrics = (
+            ('db', self.db, f'{len(self.queries)} queries'),
+            ('tpl', self.template, 'templates'),
+            ('ctx', self.context_processors, 'context processors'),
+            ('view', self.view, 'view'),
+            ('total', total, 'total'),
+        )
+        return ', '.join(f'{name};dur={value * 1000:.2f};desc="{desc}"'
+                         for name, value, desc in metrics)
+
+
+def current_timings():
+    '''
+    Замеры текущего запроса или None вне запроса.
+    '''
+    return getattr(_local, 'timings', None)
+
+
+def _timed_render(render):
+    def wrapper(self, *args, **kwargs):
+        timings = current_timings()
+        if timings is None:
+            return render(self, *args, **kwargs)
+        # Вложенные render_to_string уже входят во время внешнего шаблона.
+        timings.render_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            timings.render_depth -= 1
+            if not timings.render_depth:
+                timings.template += time.perf_counter() - start
+    return wrapper
+
+
+class _TimedBind:
+    '''
+    Обёртка над RequestContext.bind_template: при входе в контекст
+    выполняются контекст-процессоры, их время и засекается.
+    '''
+    def __init__(self, manager, timings):
+        self.manager = manager
+        self.timings = timings
+
+    def __enter__(self):
+        start = time.perf_counter()
+        try:
+            return self.manager.__enter__()
+        finally:
+            self.timings.context_processors += time.perf_counter() - start
+
+    def __exit__(self, *exc_info):
+        return self.manager.__exit__(*exc_info)
+
+
+def _timed_bind_template(bind_template):
+    def wrapper(self, template):
+        manager = bind_template(self, template)
+        timings = current_timings()
+        if timings is None:
+            return manager
+        return _TimedBind(manager, timings)
+    return wrapper
+
+
+def instrument():
+    '''
+    Один раз оборачивает рендер шаблонов и вызов контекст-процессоров.
+    '''
+    global _instrumented
+    if _instrumented:
+        return
+    backend_template = django_backend.Template
+    backend_template.render = _timed_render(backend_template.render)
+    request_context = template_context.RequestContext
+    request_context.bind_template = _timed_bind_template(
+        request_context.bind_template)
+    _instrumented = True
+
+
+class TimingMiddleware:
+    '''
+    Замеряет время запроса целиком, время в БД и число запросов, время
+    шаблонов и контекст-процессоров. Отдаёт их в заголовке Server-Timing,
+    копит в реестре метрик, а медленные запросы пишет в журнал
+    yatube.slow_requests. Запросы считаются по всем базам, включая
+    реплики.
+    Стоит в MIDDLEWARE сразу за StaticFilesMiddleware: статика
+    отдаётся раньше и в замеры не попадает, всё остальное - внутри.
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument()
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        _local.timings = timings
+        start = time.perf_counter()
+        try:
+            with execute_wrapper_all(timings.record_query):
+                response = self.get_response(request)
+        finally:
+            _local.timings = None
+        total = time.perf_counter() - start
+        response['Server-Timing'] = timings.server_timing(total)
+        self.record_metrics(request, response, timings, total)
+        if total * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS:
+            self.log_slow_request(request, response, timings, total)
+        return response
+
+    def record_metrics(self, request, response, timings, total):
+        match = getattr(request, 'resolver_match', None)
+        size = None if response.streaming else len(response.content)
+        metrics.record_request(
+            view=match.view_name if match else 'unresolved',
+            method=request.method,
+            status=response.status_code,
+            duration=total,
+            queries=len(timings.queries),
+            db_time=timings.db,
+            size=size,
+        )
+
+    def log_slow_request(self, request, response, timings, total):
+        match = getattr(request, 'resolver_match', None)
+        slowest = sorted(timings.queries, key=lambda query: query[0],
+                         reverse=True)[:SLOWEST_QUERIES_IN_LOG]
+        record = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'view_ms': round(timings.view * 1000, 2),
+            'db_ms': round(timings.db * 1000, 2),
+            'queries': len(timings.queries),
+            'template_ms': round(timings.template * 1000, 2),
+            'context_processors_ms': round(
+                timings.context_processors * 1000, 2),
+            'slowest_sql': [{'ms': round(duration * 1000, 2), 'sql': sql}
+                            for duration, sql in slowest],
+        }
+        logger.warning(json.dumps(record, ensure_ascii=False))
+
+
+class ViewTimingMiddleware:
+    '''
+    Замеряет время работы представления.
+    Должен стоять последним в MIDDLEWARE, тогда внутри него остаётся
+    только вызов представления.
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            timings = current_timings()
+            if timings is not None:
+                timings.view += time.perf_counter() - start
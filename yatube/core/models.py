@@ -0,0 +1,52 @@
+import json
+
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    '''
+    Задача фоновой очереди (core.tasks).
+    Строка создаётся в той же транзакции, что и данные, ради которых
+    задача заведена, и удаляется только после успешного выполнения -
+    отсюда доставка "хотя бы один раз". Воркер берёт задачу в аренду до
+    locked_until; если он упал, задачу после этого срока заберёт другой.
+    '''
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField('Задача', max_length=100)
+    payload = models.TextField('Данные (JSON)', default='{}')
+    # задачи с одинаковым ключом, ещё не выполненные, не дублируются
+    key = models.CharField('Ключ', max_length=200, null=True, blank=True,
+                           unique=True)
+    status = models.CharField('Состояние', max_length=10, choices=STATUSES,
+                              default=QUEUED)
+    attempts = models.PositiveIntegerField('Попыток', default=0)
+    run_at = models.DateTimeField('Выполнить не раньше', default=timezone.now)
+    locked_by = models.CharField('Воркер', max_length=32, blank=True)
+    locked_until = models.DateTimeField('Аренда до', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=['status', 'run_at'],
+                         name='task_status_run_at_idx'),
+            models.Index(fields=['locked_by'], name='task_locked_by_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+    @property
+    def data(self):
+        return json.loads(self.payload)
@@ -0,0 +1,125 @@
+import atexit
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import \
+    SessionStore as CachedDBStore
+from django.core.signals import request_finished
+from django.db import router, transaction
+
+
+class WriteBehindQueue:
+    '''
+    Отложенные записи сессий одного процесса: session_key -> (модель,
+    данные, срок жизни). Повторные сохранения одной сессии схлопываются
+    в одну запись. Очередь сбрасывается в БД после ответа (request_finished),
+    если с прошлого сброса прошло SESSION_WRITE_BEHIND_SECONDS, и при
+    выходе процесса.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.flushed_at = time.monotonic()
+
+    def put(self, model, session_key, session_data, expire_date):
+        with self.lock:
+            self.pending[session_key] = (model, session_data, expire_date)
+
+    def get(self, session_key):
+        with self.lock:
+            return self.pending.get(session_key)
+
+    def discard(self, session_key):
+        with self.lock:
+            self.pending.pop(session_key, None)
+
+    def is_due(self):
+        return (bool(self.pending)
+                and time.monotonic() - self.flushed_at
+                >= settings.SESSION_WRITE_BEHIND_SECONDS)
+
+    def flush(self):
+        '''
+        Записывает накопленные сессии в БД: UPDATE, а для удалённой
+        за это время строки - INSERT.
+        Возвращает число записанных сессий.
+        '''
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flushed_at = time.monotonic()
+        for session_key, (model, data, expire_date) in pending.items():
+            using = router.db_for_write(model)
+            with transaction.atomic(using=using):
+                updated = model.objects.using(using).filter(
+                    session_key=session_key).update(
+                        session_data=data, expire_date=expire_date)
+                if not updated:
+                    model.objects.using(using).create(
+                        session_key=session_key, session_data=data,
+                        expire_date=expire_date)
+        return len(pending)
+
+
+QUEUE = WriteBehindQueue()
+
+
+def flush_pending(**kwargs):
+    return QUEUE.flush()
+
+
+def _flush_if_due(sender, **kwargs):
+    if QUEUE.is_due():
+        QUEUE.flush()
+
+
+request_finished.connect(_flush_if_due,
+                         dispatch_uid='core.sessions.flush_if_due')
+atexit.register(flush_pending)
+
+
+class SessionStore(CachedDBStore):
+    '''
+    Сессии в кеше с отложенной записью в БД (write-behind).
+    Чтение идёт из кеша и только при промахе - из очереди или из
+    django_session. Новая сессия пишется в БД сразу: уникальность ключа
+    проверяет INSERT. Изменения существующей сессии попадают в кеш
+    немедленно, а в БД - пачкой при сбросе очереди, поэтому при падении
+    процесса теряются правки последних SESSION_WRITE_BEHIND_SECONDS.
+    При SESSION_WRITE_BEHIND_SECONDS = None сессии пишутся в БД сразу,
+    как в cached_db (это значение по умолчанию). Движок подключается
+    только при общем для процессов кеше (CACHE_SHARED): с LocMemCache
+    выход из аккаунта в одном воркере не дошёл бы до остальных.
+    '''
+    cache_key_prefix = 'yatube.sessions'
+
+    def load(self):
+        try:
+            data = self._cache.get(self.cache_key)
+        except Exception:
+            data = None
+        if data is not None:
+            return data
+        queued = QUEUE.get(self.session_key)
+        if queued is None:
+            return super().load()
+        _, session_data, expire_date = queued
+        data = self.decode(session_data)
+        self._cache.set(self.cache_key, data,
+                        self.get_expiry_age(expiry=expire_date))
+        return data
+
+    def save(self, must_create=False):
+        if (must_create or self.session_key is None
+                or settings.SESSION_WRITE_BEHIND_SECONDS is None):
+            return super().save(must_create)
+        data = self._get_session()
+        QUEUE.put(self.model, self.session_key, self.encode(data),
+                  self.get_expiry_date())
+        self._cache.set(self.cache_key, data, self.get_expiry_age())
+
+    def delete(self, session_key=None):
+        key = self.session_key if session_key is None else session_key
+        if key is not None:
+            QUEUE.discard(key)
+        super().delete(session_key)
@@ -0,0 +1,93 @@
+import socketserver
+import threading
+import time
+
+
+class SMTPStubHandler(socketserver.StreamRequestHandler):
+    '''
+    Одна SMTP-сессия: понимает ровно столько протокола, сколько нужно
+    smtplib и django.core.mail.backends.smtp.EmailBackend.
+    '''
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        envelope = {'from': None, 'to': []}
+        self.reply('220 yatube smtp stub')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                self.reply('250 yatube')
+            elif verb == 'MAIL':
+                envelope = {'from': command[10:].strip('<> '), 'to': []}
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                envelope['to'].append(command[8:].strip('<> '))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                self.receive(envelope)
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+    def receive(self, envelope):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b'.\r\n', b'.\n'):
+                break
+            lines.append(line[1:] if line.startswith(b'..') else line)
+        server = self.server
+        if server.delay:
+            time.sleep(server.delay)
+        with server.lock:
+            server.attempts += 1
+            if server.fail_every and server.attempts % server.fail_every == 0:
+                self.reply('451 Temporary failure')
+                return
+            server.messages.append({**envelope, 'data': b''.join(lines)})
+        self.reply('250 OK: queued')
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    '''
+    Локальный SMTP-сервер для тестов и замеров: письма складываются в
+    messages. delay - задержка ответа на каждое письмо (медленный
+    сервер), fail_every - каждое N-е письмо отклоняется временной
+    ошибкой 451. Запуск: with SMTPStub() as stub: ... stub.port.
+    '''
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0, fail_every=0):
+        super().__init__((host, port), SMTPStubHandler)
+        self.delay = delay
+        self.fail_every = fail_every
+        self.lock = threading.Lock()
+        self.messages = []
+        self.attempts = 0
+        self.connections = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True,
+                         name='smtp-stub').start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
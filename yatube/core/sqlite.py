@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def pragmas_for(alias):
+    '''
+    PRAGMA для нового соединения с SQLite-базой alias.
+    Режим журнала меняется только у основной БД: реплики подменяются
+    файлом целиком (sync_replicas), им WAL-файлы рядом не нужны.
+    '''
+    pragmas = dict(settings.SQLITE_PRAGMAS)
+    if alias in settings.REPLICA_DATABASES:
+        pragmas.pop('journal_mode', None)
+    return pragmas
+
+
+def tune_connection(sender, connection, **kwargs):
+    '''
+    Настраивает каждое новое соединение с SQLite в боевом режиме
+    (SQLITE_PRODUCTION): WAL, synchronous=NORMAL, mmap, кеш страниц
+    и ожидание блокировки вместо мгновенного "database is locked".
+    PRAGMA выполняются напрямую в sqlite3, мимо обёрток Django, чтобы
+    не попадать в счётчики запросов представлений.
+    '''
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRODUCTION:
+        return
+    for name, value in pragmas_for(connection.alias).items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def install():
+    connection_created.connect(tune_connection,
+                               dispatch_uid='core.sqlite.tune_connection')
@@ -0,0 +1,69 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него будут только .gz
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.map', '.svg', '.ico', '.txt', '.json', '.xml', '.html',
+)
+# файлы меньше этого размера сжатие почти не уменьшает
+COMPRESS_MIN_SIZE = 256
+
+
+def _write_if_smaller(path, original, compressed):
+    if len(compressed) >= len(original):
+        return False
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as compressed_file:
+        compressed_file.write(compressed)
+    os.replace(temporary, path)
+    return True
+
+
+def compress_file(path):
+    '''
+    Кладёт рядом с файлом сжатые варианты path.gz и path.br
+    (если установлен brotli и сжатие действительно уменьшает файл).
+    Возвращает список созданных вариантов.
+    '''
+    if not path.endswith(COMPRESSIBLE_EXTENSIONS):
+        return []
+    with open(path, 'rb') as source:
+        data = source.read()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return []
+    created = []
+    # mtime=0: одинаковый файл даёт одинаковый архив при каждой сборке
+    if _write_if_smaller(f'{path}.gz', data,
+                         gzip.compress(data, compresslevel=9, mtime=0)):
+        created.append(f'{path}.gz')
+    if brotli is not None and _write_if_smaller(
+            f'{path}.br', data, brotli.compress(data, quality=11)):
+        created.append(f'{path}.br')
+    return created
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    '''
+    collectstatic сохраняет файлы с хешем содержимого в имени
+    (css/bootstrap.min.3c2e7a1b9f0d.css) и кладёт рядом их сжатые
+    варианты .gz и .br. Такие файлы можно кешировать навсегда, а
+    core.middleware.static.StaticFilesMiddleware отдаёт готовый
+    сжатый вариант, не сжимая ничего на лету.
+    '''
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = set()
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for hashed_name in sorted(hashed_names):
+            compress_file(self.path(hashed_name))
@@ -0,0 +1,201 @@
+import json
+import logging
+import traceback
+import uuid
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import db_router
+from .models import Task
+
+logger = logging.getLogger('yatube.tasks')
+
+Handler = namedtuple('Handler', 'func batch sensitive')
+REGISTRY = {}
+
+
+def task(name, batch=False, sensitive=False):
+    '''
+    Регистрирует обработчик задачи name.
+    Обычный обработчик получает данные задачи именованными аргументами:
+    enqueue('posts.thumbnails', {'post_id': 1}) -> func(post_id=1).
+    Обработчик с batch=True получает список данных всех взятых воркером
+    задач этого вида разом - например, чтобы разложить несколько постов
+    по лентам одним проходом. batch-обработчик может вернуть словарь
+    {номер в списке: ошибка} - тогда на повтор уйдут только эти задачи,
+    а остальные считаются выполненными. Доставка "хотя бы один раз": обработчик
+    должен спокойно переносить повторный вызов с теми же данными.
+    sensitive=True - в данных секреты (например, текст письма со ссылкой
+    сброса пароля): админка их не показывает, а у задачи, исчерпавшей
+    попытки, данные стираются.
+    Модули <app>.tasks импортируются при старте (CoreConfig.ready).
+    '''
+    def decorator(func):
+        REGISTRY[name] = Handler(func, batch, sensitive)
+        return func
+    return decorator
+
+
+def _call(handler, payloads):
+    '''
+    Вызывает обработчик. Возвращает {номер: ошибка} для задач пачки,
+    которые не удались (без исключения).
+    '''
+    if handler.batch:
+        return handler.func(payloads) or {}
+    for payload in payloads:
+        handler.func(**payload)
+    return {}
+
+
+def enqueue(name, payload=None, key=None):
+    '''
+    Ставит задачу в очередь. key - ключ против дублей: пока задача с
+    таким ключом не выполнена, вторая такая же не добавится.
+    '''
+    enqueue_many(name, [payload or {}], keys=[key])
+
+
+def enqueue_many(name, payloads, keys=None):
+    '''
+    Ставит в очередь несколько задач одного вида одним INSERT.
+    Строки пишутся в текущей транзакции. Чтобы задача не потерялась,
+    данные, ради которых она заведена, и постановку в очередь нужно
+    обернуть в один transaction.atomic() (так делают Post.save и
+    posts.bulk.create_posts): в режиме autocommit данные успеют
+    закоммититься раньше задачи.
+    При TASKS_EAGER (в DEBUG и в тестах) задачи выполняются сразу.
+    '''
+    if not payloads:
+        return
+    if name not in REGISTRY:
+        raise LookupError(f'Неизвестная задача {name}')
+    if settings.TASKS_EAGER:
+        failed = _call(REGISTRY[name], list(payloads))
+        if failed:
+            raise RuntimeError(f'Задача {name} не выполнена: {failed}')
+        return
+    keys = keys or [None] * len(payloads)
+    Task.objects.bulk_create(
+        [Task(name=name, key=key,
+              payload=json.dumps(payload, separators=(',', ':')))
+         for payload, key in zip(payloads, keys)],
+        ignore_conflicts=any(keys))
+
+
+def _due(now):
+    # в очереди и пора выполнять, либо воркер взял и не вернул (упал)
+    return (Q(status=Task.QUEUED, run_at__lte=now)
+            | Q(status=Task.RUNNING, locked_until__lt=now))
+
+
+def claim(limit):
+    '''
+    Берёт в аренду до limit задач, которым пора выполняться.
+    Аренду ставит один условный UPDATE: если ту же задачу успел взять
+    другой воркер, условие для неё уже не выполнится.
+    '''
+    now = timezone.now()
+    ids = list(Task.objects.filter(_due(now)).order_by('run_at', 'pk')
+               .values_list('pk', flat=True)[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    Task.objects.filter(_due(now), pk__in=ids).update(
+        status=Task.RUNNING, locked_by=token,
+        locked_until=now + timedelta(seconds=settings.TASK_LEASE_SECONDS),
+        attempts=F('attempts') + 1)
+    return list(Task.objects.filter(locked_by=token).order_by('pk'))
+
+
+def _complete(tasks):
+    Task.objects.filter(pk__in=[item.pk for item in tasks]).delete()
+
+
+def _retry(tasks, error, sensitive=False):
+    '''
+    Возвращает задачи в очередь с экспоненциальной задержкой;
+    исчерпавшие TASK_MAX_ATTEMPTS попыток помечаются как FAILED.
+    У FAILED-задач с sensitive=True данные стираются.
+    '''
+    now = timezone.now()
+    for item in tasks:
+        changes = {'locked_by': '', 'locked_until': None, 'last_error': error}
+        if item.attempts >= settings.TASK_MAX_ATTEMPTS:
+            # ключ освобождаем: такую задачу можно будет поставить снова
+            changes.update(status=Task.FAILED, key=None)
+            if sensitive:
+                changes['payload'] = '{}'
+        else:
+            delay = settings.TASK_RETRY_DELAY * 2 ** (item.attempts - 1)
+            changes.update(status=Task.QUEUED,
+                           run_at=now + timedelta(seconds=delay))
+        Task.objects.filter(pk=item.pk, locked_by=item.locked_by).update(
+            **changes)
+
+
+def run_group(name, tasks):
+    '''
+    Выполняет взятые задачи одного вида: пачкой для batch-обработчика,
+    по одной - для обычного. Успешные задачи удаляются, упавшие уходят
+    на повтор. Возвращает число успешно выполненных задач.
+    '''
+    handler = REGISTRY.get(name)
+    if handler is None:
+        _retry(tasks, f'Неизвестная задача {name}')
+        return 0
+    groups = [tasks] if handler.batch else [[item] for item in tasks]
+    done = 0
+    for group in groups:
+        try:
+            failed = _call(handler, [item.data for item in group])
+        except Exception:
+            logger.exception('Задача %s упала', name)
+            _retry(group, traceback.format_exc(), handler.sensitive)
+            continue
+        for index, error in failed.items():
+            logger.warning('Задача %s #%s не выполнена: %s',
+                           name, group[index].pk, error)
+            _retry([group[index]], str(error), handler.sensitive)
+        succeeded = [item for index, item in enumerate(group)
+                     if index not in failed]
+        _complete(succeeded)
+        done += len(succeeded)
+    return done
+
+
+def _run_in_thread(name, tasks):
+    # Все чтения воркера - из основной БД: реплика может ещё не знать
+    # о строках, ради которых задача поставлена.
+    db_router.start_request(pinned=True)
+    try:
+        return run_group(name, tasks)
+    finally:
+        db_router.finish_request()
+        connections.close_all()
+
+
+def run_pending(limit=None, executor=None):
+    '''
+    Один проход воркера: берёт до limit задач (TASK_BATCH_SIZE) и
+    выполняет их, группируя по виду. С executor (пул потоков) группы
+    выполняются параллельно. Возвращает число взятых задач.
+    '''
+    tasks = claim(limit or settings.TASK_BATCH_SIZE)
+    groups = OrderedDict()
+    for item in tasks:
+        groups.setdefault(item.name, []).append(item)
+    if executor is None:
+        for name, group in groups.items():
+            run_group(name, group)
+    else:
+        futures = [executor.submit(_run_in_thread, name, group)
+                   for name, group in groups.items()]
+        for future in futures:
+            future.result()
+    return len(tasks)
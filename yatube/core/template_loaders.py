@@ -0,0 +1,66 @@
+import re
+
+from django.template.loaders import app_directories, filesystem
+
+# Куски шаблона, внутри которых пробелы не трогаем (или которые удаляем
+# целиком): комментарии шаблона, verbatim, теги с сохраняемыми
+# пробелами и сами теги и переменные шаблона.
+PROTECTED = re.compile(
+    r'(?P<comment>\{%\s*comment\b.*?%\}.*?\{%\s*endcomment\s*%\})'
+    r'|(?P<note>\{#[^\n]*?#\})'
+    r'|\{%\s*verbatim\b.*?%\}.*?\{%\s*endverbatim\s*%\}'
+    r'|<(?P<raw>pre|textarea|script|style)\b.*?</(?P=raw)\s*>'
+    r'|\{%.*?%\}|\{\{.*?\}\}',
+    re.DOTALL | re.IGNORECASE,
+)
+# пробельные символы HTML; неразрывный пробел сюда не входит
+WHITESPACE = re.compile(r'[ \t\r\n\f]+')
+
+
+def _collapse(text):
+    return WHITESPACE.sub(
+        lambda match: '\n' if '\n' in match.group() else ' ', text)
+
+
+def minify(source):
+    '''
+    Убирает из исходника шаблона незначащие пробелы: каждая цепочка
+    пробельных символов становится одним пробелом или одним переводом
+    строки. Комментарии {# #} и {% comment %} удаляются целиком.
+    Не трогает <pre>, <textarea>, <script>, <style>, {% verbatim %},
+    а также содержимое тегов и переменных шаблона. Данные (например,
+    текст поста) подставляются уже при рендеринге и не меняются.
+    '''
+    parts = []
+    text = []
+    position = 0
+    for match in PROTECTED.finditer(source):
+        text.append(source[position:match.start()])
+        position = match.end()
+        if match.group('comment') or match.group('note'):
+            continue
+        parts.append(_collapse(''.join(text)))
+        parts.append(match.group())
+        text = []
+    text.append(source[position:])
+    parts.append(_collapse(''.join(text)))
+    return ''.join(parts)
+
+
+class MinifyingMixin:
+    '''
+    Примесь к загрузчику шаблонов: отдаёт движку исходник шаблона,
+    пропущенный через minify. Сжатие происходит один раз при компиляции;
+    под django.template.loaders.cached.Loader (см. TEMPLATE_MINIFY
+    в настройках) запросы за него не платят.
+    '''
+    def get_contents(self, origin):
+        return minify(super().get_contents(origin))
+
+
+class FilesystemLoader(MinifyingMixin, filesystem.Loader):
+    pass
+
+
+class AppDirectoriesLoader(MinifyingMixin, app_directories.Loader):
+    pass
@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class StrictQueriesTestRunner(DiscoverRunner):
+    '''
+    Запускает тесты со строгой проверкой запросов: N+1 и превышение
+    бюджета запросов представления роняют тест.
+    '''
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_INSPECTOR_ENABLED = True
+        settings.QUERY_INSPECTOR_STRICT = True
@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import sessions
+from ..sessions import SessionStore
+
+User = get_user_model()
+
+
+# в тестах кеш локальный (CACHE_SHARED=False), кешированные сессии и
+# пользователь включаются явно
+@override_settings(
+    SESSION_ENGINE='core.sessions',
+    AUTHENTICATION_BACKENDS=['core.auth.CachedModelBackend'])
+class CachedAuthTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth',
+                                            password='old-password')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(CachedAuthTest.user)
+        self.url = reverse('about:author')
+
+    def test_logged_in_page_view_without_auth_queries(self):
+        """Вошедший пользователь не стоит запросов к сессии и auth_user."""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['user'], CachedAuthTest.user)
+
+    def test_user_save_refreshes_cache(self):
+        """После сохранения пользователя запрос видит новые данные."""
+        self.client.get(self.url)
+        user = User.objects.get(pk=CachedAuthTest.user.pk)
+        user.first_name = 'Новое имя'
+        user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['user'].first_name, 'Новое имя')
+
+    def test_password_change_ends_session(self):
+        """После смены пароля старая сессия больше не действует."""
+        self.client.get(self.url)
+        user = User.objects.get(pk=CachedAuthTest.user.pk)
+        user.set_password('new-password')
+        user.save()
+        response = self.client.get(self.url)
+        self.assertFalse(response.context['user'].is_authenticated)
+
+
+@override_settings(SESSION_WRITE_BEHIND_SECONDS=60)
+class WriteBehindSessionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(sessions.QUEUE.pending.clear)
+        self.session = SessionStore()
+        self.session['value'] = 1
+        self.session.create()
+
+    def stored(self):
+        row = Session.objects.get(session_key=self.session.session_key)
+        return row.get_decoded()['value']
+
+    def test_changes_reach_db_on_flush(self):
+        """Правка сразу видна из кеша, а в БД попадает при сбросе."""
+        self.session['value'] = 2
+        with self.assertNumQueries(0):
+            self.session.save()
+        self.assertEqual(self.stored(), 1)
+        self.assertEqual(SessionStore(self.session.session_key)['value'], 2)
+        cache.clear()
+        self.assertEqual(SessionStore(self.session.session_key)['value'], 2)
+        self.assertEqual(sessions.flush_pending(), 1)
+        self.assertEqual(self.stored(), 2)
+
+    def test_delete_drops_pending_write(self):
+        """Удалённая сессия не воскресает при сбросе очереди."""
+        self.session['value'] = 2
+        self.session.save()
+        self.session.delete()
+        self.assertEqual(sessions.flush_pending(), 0)
+        self.assertFalse(Session.objects.filter(
+            session_key=self.session.session_key).exists())
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+
+from posts.models import Post
+
+from .. import db_router
+from ..db_router import ReplicaRouter
+from ..management.commands.sync_replicas import copy_database
+from ..middleware.replicas import ReplicaPinMiddleware
+
+User = get_user_model()
+
+
+@override_settings(REPLICA_DATABASES=['replica1'], REPLICA_PIN_SECONDS=10)
+class ReplicaRouterTest(TransactionTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        db_router.start_request(pinned=False)
+
+    def tearDown(self):
+        db_router.finish_request()
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        """Чтение - из реплики, запись - в основную БД."""
+        self.assertEqual(self.router.db_for_read(Post), 'replica1')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_reads_after_write_stay_on_primary(self):
+        """После записи чтения того же запроса идут в основную БД."""
+        self.router.db_for_write(Post)
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_primary_only_cases(self):
+        """Сессии и чтения внутри транзакции - из основной БД."""
+        self.assertEqual(self.router.db_for_read(Session), 'default')
+        with transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_without_replicas(self):
+        """Без реплик всё идёт в основную БД."""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_migrations_only_on_primary(self):
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+    def run_middleware(self, request, writes=False):
+        seen = {}
+
+        def view(request):
+            if writes:
+                self.router.db_for_write(Post)
+            seen['db'] = self.router.db_for_read(Post)
+            return HttpResponse()
+
+        response = ReplicaPinMiddleware(view)(request)
+        return response, seen['db']
+
+    def test_write_pins_client_to_primary(self):
+        """Запрос с записью ставит cookie, и клиент читает из основной БД."""
+        response, _ = self.run_middleware(self.factory.post('/create/'),
+                                          writes=True)
+        cookie = response.cookies['yatube_primary']
+        self.assertEqual(cookie['max-age'], 10)
+
+        request = self.factory.get('/')
+        request.COOKIES['yatube_primary'] = cookie.value
+        response, db = self.run_middleware(request)
+        self.assertEqual(db, 'default')
+        self.assertNotIn('yatube_primary', response.cookies)
+
+        request = self.factory.get('/')
+        request.COOKIES['yatube_primary'] = str(int(time.time()) - 1)
+        _, db = self.run_middleware(request)
+        self.assertEqual(db, 'replica1')
+
+    def test_unsafe_methods_read_primary(self):
+        """POST читает из основной БД, даже если ничего не пишет."""
+        _, db = self.run_middleware(self.factory.post('/'))
+        self.assertEqual(db, 'default')
+
+
+class SyncReplicasTest(TransactionTestCase):
+    def test_copy_database(self):
+        """Копия основной БД содержит её таблицы и строки."""
+        user = User.objects.create_user(username='auth')
+        Post.objects.create(author=user, text='Тестовый пост')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'replica.sqlite3')
+            copy_database('default', path)
+            copy = sqlite3.connect(path)
+            try:
+                texts = copy.execute('SELECT text FROM posts_post').fetchall()
+            finally:
+                copy.close()
+        self.assertEqual(texts, [('Тестовый пост',)])
@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives, send_mail
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..mail import deserialize, serialize
+from ..models import Task
+from ..smtp_stub import SMTPStub
+from ..tasks import run_pending
+
+SMTP_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+
+def send(count):
+    for number in range(count):
+        send_mail(f'Письмо {number}', 'Текст', 'yatube@example.com',
+                  [f'user{number}@example.com'])
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.QueuedEmailBackend', TASKS_EAGER=False,
+    MAIL_DELIVERY_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    MAIL_RATE_LIMIT=0, MAIL_RETRY_DELAY=0)
+class QueuedEmailBackendTest(TestCase):
+    def test_send_only_queues(self):
+        """Бэкенд кладёт письмо в очередь, отправляет его воркер."""
+        send(1)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(Task.objects.get().name, 'core.send_mail')
+        run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Письмо 0')
+        self.assertFalse(Task.objects.exists())
+
+    def test_message_survives_serialization(self):
+        """Письмо с HTML-версией и вложением доходит без потерь."""
+        message = EmailMultiAlternatives(
+            'Тема', 'Текст', 'yatube@example.com', ['a@example.com'],
+            cc=['b@example.com'], headers={'X-Tag': 'test'})
+        message.attach_alternative('<p>Текст</p>', 'text/html')
+        message.attach('data.bin', b'\x00\xff', 'application/octet-stream')
+        restored = deserialize(serialize(message))
+        for field in ('subject', 'body', 'from_email', 'to', 'cc',
+                      'extra_headers', 'alternatives', 'attachments'):
+            self.assertEqual(getattr(restored, field),
+                             getattr(message, field), field)
+
+    def test_batch_uses_one_smtp_connection(self):
+        """Пачка писем уходит через одно SMTP-соединение."""
+        send(5)
+        with SMTPStub() as stub, self.settings(
+                MAIL_DELIVERY_BACKEND=SMTP_BACKEND, EMAIL_PORT=stub.port,
+                EMAIL_HOST='127.0.0.1'):
+            run_pending()
+        self.assertEqual(len(stub.messages), 5)
+        self.assertEqual(stub.connections, 1)
+        self.assertFalse(Task.objects.exists())
+
+    def test_temporary_failure_is_retried(self):
+        """Временная ошибка сервера (451) повторяется в той же пачке."""
+        send(4)
+        with SMTPStub(fail_every=2) as stub, self.settings(
+                MAIL_DELIVERY_BACKEND=SMTP_BACKEND, EMAIL_PORT=stub.port,
+                EMAIL_HOST='127.0.0.1'):
+            run_pending()
+        self.assertEqual(len(stub.messages), 4)
+        self.assertEqual(stub.attempts, 7)
+        self.assertFalse(Task.objects.exists())
+
+    def test_undelivered_mail_stays_queued(self):
+        """Письмо, которое не удалось отправить, остаётся в очереди."""
+        send(1)
+        with SMTPStub(fail_every=1) as stub, self.settings(
+                MAIL_DELIVERY_BACKEND=SMTP_BACKEND, EMAIL_PORT=stub.port,
+                EMAIL_HOST='127.0.0.1', MAIL_SEND_RETRIES=1):
+            with self.assertLogs('yatube.tasks', 'WARNING'):
+                run_pending()
+        self.assertEqual(stub.attempts, 2)
+        self.assertEqual(Task.objects.get().status, Task.QUEUED)
+
+    def test_failed_mail_payload_is_erased(self):
+        """Текст так и не ушедшего письма стирается из очереди."""
+        send(1)
+        with SMTPStub(fail_every=1) as stub, self.settings(
+                MAIL_DELIVERY_BACKEND=SMTP_BACKEND, EMAIL_PORT=stub.port,
+                EMAIL_HOST='127.0.0.1', MAIL_SEND_RETRIES=0,
+                TASK_MAX_ATTEMPTS=1):
+            with self.assertLogs('yatube.tasks', 'WARNING'):
+                run_pending()
+        failed = Task.objects.get()
+        self.assertEqual(failed.status, Task.FAILED)
+        self.assertEqual(failed.data, {})
+
+    def test_admin_hides_mail_payload(self):
+        """В админке текст письма из очереди не виден."""
+        send_mail('Сброс пароля', 'Ссылка: /reset/secret-token/',
+                  'yatube@example.com', ['user@example.com'])
+        queued = Task.objects.get()
+        self.client.force_login(get_user_model().objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'))
+        response = self.client.get(
+            reverse('admin:core_task_change', args=[queued.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'secret-token')
+        self.assertContains(response, 'скрыто')
@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..metrics import REGISTRY, collect, record_request, render_prometheus
+
+User = get_user_model()
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        REGISTRY.reset()
+        self.guest_client = Client()
+
+    def test_requests_feed_metrics_endpoint(self):
+        """Запросы к сайту попадают в метрики /metrics по имени URL."""
+        user = User.objects.create_user(username='auth')
+        Post.objects.create(author=user, text='Тестовый пост')
+        self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('users:login'))
+        response = self.guest_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertIn(
+            'http_requests_total{method="GET",status="200",'
+            'view="posts:index"} 2', text)
+        self.assertIn(
+            'http_request_duration_seconds_count{view="users:login"} 1',
+            text)
+        self.assertIn('http_response_size_bytes_bucket{view="posts:index",'
+                      'le="+Inf"} 2', text)
+        self.assertIn('cache_requests_total{cache="post_card"', text)
+
+    def test_metrics_endpoint_restricted(self):
+        """Метрики недоступны с посторонних адресов."""
+        response = self.guest_client.get(reverse('metrics'),
+                                         REMOTE_ADDR='10.1.2.3')
+        self.assertEqual(response.status_code, 403)
+
+    def test_worker_files_merged_at_scrape(self):
+        """Метрики разных процессов складываются при сборе."""
+        record_request('posts:index', 'GET', 200, 0.02, 3, 0.001, 100)
+        with tempfile.TemporaryDirectory() as directory:
+            other_worker = {
+                'counters': [['http_requests_total',
+                              {'method': 'GET', 'status': '200',
+                               'view': 'posts:index'}, 4]],
+                'histograms': [],
+            }
+            with open(os.path.join(directory, '1.json'), 'w') as worker:
+                json.dump(other_worker, worker)
+            with override_settings(METRICS_DIR=directory):
+                counters, histograms = collect()
+        text = render_prometheus(counters, histograms)
+        self.assertIn('http_requests_total{method="GET",status="200",'
+                      'view="posts:index"} 5', text)
+
+    def test_recording_is_cheap(self):
+        """Запись метрик одного запроса занимает микросекунды."""
+        calls = 10000
+        start = time.perf_counter()
+        for _ in range(calls):
+            record_request('posts:index', 'GET', 200, 0.02, 3, 0.001, 100)
+        per_call = (time.perf_counter() - start) / calls
+        self.assertLess(per_call, 0.0001)
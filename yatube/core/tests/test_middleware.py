@@ -0,0 +1,106 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.template import engines
+from django.test import TestCase, Client, override_settings
+
+from posts.models import Post
+
+from ..middleware import execute_wrapper_all
+from ..middleware.queries import QueryLog, QueryProblem
+
+User = get_user_model()
+
+
+class TimingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_server_timing_header(self):
+        """Ответ содержит заголовок Server-Timing со всеми метриками."""
+        response = self.guest_client.get('/')
+        header = response['Server-Timing']
+        for metric in ('db;', 'tpl;', 'ctx;', 'view;', 'total;'):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, header)
+        self.assertRegex(header, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_slow_request_logged_with_sql_and_view(self):
+        """Медленный запрос пишется в журнал с SQL и именем представления."""
+        url = f'/posts/{TimingMiddlewareTest.post.pk}/'
+        with self.assertLogs('yatube.slow_requests', 'WARNING') as logs:
+            self.guest_client.get(url)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:post_detail')
+        self.assertEqual(record['path'], url)
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertTrue(record['slowest_sql'])
+        self.assertGreaterEqual(record['total_ms'], record['view_ms'])
+
+    def test_wrapper_installed_on_every_database(self):
+        """Обёртка запросов ставится на все соединения, не только default."""
+        def wrapper(execute, sql, params, many, context):
+            return execute(sql, params, many, context)
+
+        with execute_wrapper_all(wrapper):
+            for database in connections.all():
+                with self.subTest(alias=database.alias):
+                    self.assertIn(wrapper, database.execute_wrappers)
+        for database in connections.all():
+            self.assertNotIn(wrapper, database.execute_wrappers)
+
+    def test_fast_request_not_logged(self):
+        """Быстрые запросы в журнал не попадают."""
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('yatube.slow_requests', 'WARNING'):
+                self.guest_client.get('/about/author/')
+
+
+class QueryInspectorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for i in range(4):
+            user = User.objects.create_user(username=f'user{i}')
+            Post.objects.create(author=user, text=f'Пост № {i}')
+
+    def test_repeated_relation_queries_reported_with_template_line(self):
+        """N+1 в шаблоне находится вместе со связью и строкой шаблона."""
+        template = engines['django'].from_string(
+            '{% for post in posts %}\n{{ post.author.username }}'
+            '{% endfor %}')
+        log = QueryLog()
+        with connection.execute_wrapper(log):
+            template.render({'posts': list(Post.objects.all())})
+        repeated = log.repeated(threshold=3)
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0]['count'], 4)
+        self.assertEqual(repeated[0]['relation'], 'Post.author')
+        self.assertTrue(repeated[0]['template'].endswith(':2'))
+
+    def test_select_related_is_not_reported(self):
+        """Запросы с select_related не считаются N+1."""
+        log = QueryLog()
+        with connection.execute_wrapper(log):
+            for post in Post.objects.select_related('author'):
+                post.author.username
+        self.assertEqual(log.repeated(threshold=2), [])
+
+    @override_settings(QUERY_BUDGETS={'posts:index': 1})
+    def test_strict_mode_fails_over_budget(self):
+        """В строгом режиме превышение бюджета запросов - ошибка."""
+        with override_settings(QUERY_INSPECTOR_STRICT=True):
+            with self.assertRaisesMessage(QueryProblem, 'posts:index'):
+                self.client.get('/')
+        with override_settings(QUERY_INSPECTOR_STRICT=False):
+            with self.assertLogs('yatube.queries', 'WARNING'):
+                self.client.get('/')
@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+
+
+class SqlitePragmasTest(SimpleTestCase):
+    def open(self, alias='default'):
+        settings_dict = dict(connections.databases[DEFAULT_DB_ALIAS])
+        settings_dict['NAME'] = os.path.join(self.directory.name, 'db.sqlite3')
+        wrapper = DatabaseWrapper(settings_dict, alias=alias)
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        return wrapper.connection.execute(f'PRAGMA {name}').fetchone()[0]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    @override_settings(SQLITE_PRODUCTION=True)
+    def test_production_pragmas(self):
+        """В боевом режиме новое соединение получает все PRAGMA."""
+        wrapper = self.open()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -64 * 1024)
+
+    @override_settings(SQLITE_PRODUCTION=True, REPLICA_DATABASES=['replica1'])
+    def test_replicas_keep_journal_mode(self):
+        """У реплик режим журнала не меняется."""
+        wrapper = self.open('replica1')
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+
+    @override_settings(SQLITE_PRODUCTION=False)
+    def test_default_mode_untouched(self):
+        """Вне боевого режима соединение остаётся как есть."""
+        wrapper = self.open()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
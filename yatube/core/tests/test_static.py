@@ -0,0 +1,98 @@
+import gzip
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..middleware.static import find_hashed_asset
+
+STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
+CSS = 'css/bootstrap.min.css'
+
+
+class StaticPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.settings_override = override_settings(
+            STATIC_ROOT=cls.directory.name, STATICFILES_STORAGE=STORAGE,
+            STATIC_SERVE=True)
+        cls.settings_override.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(cls.directory.name, 'staticfiles.json')) as f:
+            cls.manifest = json.load(f)['paths']
+        cls.css_url = f'/static/{cls.manifest[CSS]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        find_hashed_asset.cache_clear()
+
+    def read(self, name):
+        with open(os.path.join(self.directory.name, name), 'rb') as f:
+            return f.read()
+
+    def test_collectstatic_hashes_and_compresses(self):
+        """collectstatic даёт файлы с хешем в имени и их .gz-варианты."""
+        hashed = StaticPipelineTest.manifest[CSS]
+        self.assertRegex(hashed, r'^css/bootstrap\.min\.[0-9a-f]{12}\.css$')
+        self.assertEqual(gzip.decompress(self.read(f'{hashed}.gz')),
+                         self.read(hashed))
+        self.assertFalse(os.path.exists(os.path.join(
+            StaticPipelineTest.directory.name,
+            StaticPipelineTest.manifest['img/logo_1.png'] + '.gz')))
+
+    def test_serves_gzip_variant_with_immutable_cache(self):
+        """Клиенту с gzip уходит сжатый файл с вечным кешем."""
+        response = self.client.get(StaticPipelineTest.css_url,
+                                   HTTP_ACCEPT_ENCODING='gzip, deflate')
+        body = b''.join(response.streaming_content)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css; charset=utf-8')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertEqual(gzip.decompress(body),
+                         self.read(StaticPipelineTest.manifest[CSS]))
+
+    def test_identity_and_not_modified(self):
+        """Без gzip отдаётся исходный файл; повторный запрос - 304."""
+        for header in ('', 'gzip;q=0'):
+            with self.subTest(header=header):
+                response = self.client.get(StaticPipelineTest.css_url,
+                                           HTTP_ACCEPT_ENCODING=header)
+                self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get(StaticPipelineTest.css_url,
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_unhashed_and_missing_files(self):
+        """Файл без хеша кешируется ненадолго; чужие пути - 404."""
+        response = self.client.get(f'/static/{CSS}')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        for url in ('/static/missing.css', '/static/../manage.py'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_changed_files_are_reread(self):
+        """Файл без хеша перечитывается, промах по хешу не запоминается."""
+        names = ('robots.txt', 'css/late.0123456789ab.css')
+        for name in names:
+            self.assertEqual(
+                self.client.get(f'/static/{name}').status_code, 404)
+        for content in (b'first', b'second version'):
+            for name in names:
+                with open(os.path.join(self.directory.name, name), 'wb') as f:
+                    f.write(content)
+            response = self.client.get('/static/robots.txt')
+            self.assertEqual(int(response['Content-Length']), len(content))
+        response = self.client.get(f'/static/{names[1]}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
@@ -0,0 +1,123 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from ..models import Task
+from ..tasks import claim, enqueue, enqueue_many, run_pending, task
+
+CALLS = []
+
+
+@task('tests.record')
+def record(value):
+    CALLS.append(('record', value))
+
+
+@task('tests.batch', batch=True)
+def record_batch(payloads):
+    CALLS.append(('batch', sorted(item['value'] for item in payloads)))
+
+
+@task('tests.partial', batch=True)
+def partial(payloads):
+    return {index: 'сбой' for index, item in enumerate(payloads)
+            if item['value'] < 0}
+
+
+@task('tests.fail')
+def fail(value):
+    raise RuntimeError('сбой')
+
+
+@override_settings(TASKS_EAGER=False, TASK_MAX_ATTEMPTS=2,
+                   TASK_RETRY_DELAY=10)
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue_and_run(self):
+        """Задача выполняется воркером и удаляется из очереди."""
+        enqueue('tests.record', {'value': 1})
+        self.assertEqual(CALLS, [])
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(CALLS, [('record', 1)])
+        self.assertFalse(Task.objects.exists())
+
+    def test_same_kind_tasks_run_as_batch(self):
+        """Задачи batch-обработчика приходят к нему одной пачкой."""
+        enqueue_many('tests.batch', [{'value': 2}, {'value': 1}])
+        enqueue('tests.record', {'value': 3})
+        run_pending()
+        self.assertCountEqual(CALLS, [('batch', [1, 2]), ('record', 3)])
+
+    def test_key_prevents_duplicates(self):
+        """Пока задача с ключом в очереди, вторая такая не ставится."""
+        for _ in range(2):
+            enqueue('tests.record', {'value': 1}, key='once')
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_failed_task_is_retried_then_given_up(self):
+        """Упавшая задача ждёт повтора, после всех попыток - FAILED."""
+        enqueue('tests.fail', {'value': 1}, key='fail')
+        with self.assertLogs('yatube.tasks', 'ERROR'):
+            run_pending()
+        item = Task.objects.get()
+        self.assertEqual((item.status, item.attempts), (Task.QUEUED, 1))
+        self.assertIn('RuntimeError', item.last_error)
+        self.assertGreater(item.run_at, timezone.now())
+        self.assertEqual(run_pending(), 0)
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('yatube.tasks', 'ERROR'):
+            run_pending()
+        item = Task.objects.get()
+        self.assertEqual((item.status, item.key), (Task.FAILED, None))
+
+    def test_batch_handler_reports_failed_items(self):
+        """На повтор уходят только задачи пачки, которые не удались."""
+        enqueue_many('tests.partial', [{'value': 1}, {'value': -1}])
+        with self.assertLogs('yatube.tasks', 'WARNING'):
+            self.assertEqual(run_pending(), 2)
+        item = Task.objects.get()
+        self.assertEqual((item.data, item.status, item.last_error),
+                         ({'value': -1}, Task.QUEUED, 'сбой'))
+
+    def test_expired_lease_is_taken_again(self):
+        """Задачу упавшего воркера после конца аренды берёт другой."""
+        enqueue('tests.record', {'value': 1})
+        self.assertEqual(len(claim(10)), 1)
+        self.assertEqual(claim(10), [])
+        Task.objects.update(locked_until=timezone.now() - timedelta(1))
+        run_pending()
+        self.assertEqual(CALLS, [('record', 1)])
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode_runs_at_once(self):
+        """В режиме TASKS_EAGER задача выполняется при постановке."""
+        enqueue('tests.record', {'value': 1})
+        self.assertEqual(CALLS, [('record', 1)])
+        self.assertFalse(Task.objects.exists())
+
+
+@override_settings(TASKS_EAGER=False)
+class TaskWorkerTest(TransactionTestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_worker_runs_groups_in_pool(self):
+        """Команда run_tasks --once выполняет очередь в пуле потоков."""
+        enqueue_many('tests.batch', [{'value': 1}, {'value': 2}])
+        enqueue('tests.record', {'value': 3})
+        call_command('run_tasks', once=True, workers=2, stdout=io.StringIO())
+        self.assertCountEqual(CALLS, [('batch', [1, 2]), ('record', 3)])
+        self.assertFalse(Task.objects.exists())
+
+    def test_executor_closes_connections(self):
+        """Пул потоков годится и для прямого вызова run_pending."""
+        enqueue('tests.record', {'value': 1})
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            self.assertEqual(run_pending(executor=executor), 1)
+        self.assertEqual(CALLS, [('record', 1)])
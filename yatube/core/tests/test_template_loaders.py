@@ -0,0 +1,72 @@
+import copy
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..template_loaders import minify
+
+User = get_user_model()
+
+
+def minified_templates():
+    templates = copy.deepcopy(settings.TEMPLATES)
+    templates[0]['APP_DIRS'] = False
+    templates[0]['OPTIONS']['loaders'] = settings.MINIFIED_TEMPLATE_LOADERS
+    return templates
+
+
+class MinifyTest(SimpleTestCase):
+    def test_collapses_whitespace_and_drops_comments(self):
+        """Отступы схлопываются, комментарии шаблона удаляются."""
+        source = ('{# заметка #}\n<ul>\n    <li>  a  </li>\n'
+                  '{% comment "x" %}\n  текст\n{% endcomment %}\n  </ul>')
+        self.assertEqual(minify(source), '\n<ul>\n<li> a </li>\n</ul>')
+
+    def test_keeps_protected_blocks(self):
+        """pre, textarea, script, verbatim и теги шаблона не меняются."""
+        blocks = (
+            '<pre class="x">  a\n    b</pre>',
+            '<textarea name="t">\n  {{ text }}  </textarea>',
+            '<script>\n  var a = 1\n  // b\n</script>',
+            '{% verbatim %}  {{ a }}  {% endverbatim %}',
+            '{% trans "два  пробела" %}',
+            '{{ value|default:"  " }}',
+            '&nbsp;\xa0',
+        )
+        for block in blocks:
+            with self.subTest(block=block):
+                self.assertEqual(minify(f'  {block}  '), f' {block} ')
+
+
+class MinifiedPagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Текст   с  пробелами\n    и отступом')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(MinifiedPagesTest.user)
+
+    def test_pages_are_smaller_and_keep_post_text(self):
+        """Страницы становятся меньше, а текст поста остаётся как был."""
+        urls = (
+            reverse('posts:post_detail', args=[MinifiedPagesTest.post.pk]),
+            reverse('posts:post_edit', args=[MinifiedPagesTest.post.pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                plain = self.client.get(url).content.decode()
+                cache.clear()
+                with override_settings(TEMPLATES=minified_templates()):
+                    minified = self.client.get(url).content.decode()
+                self.assertLess(len(minified), len(plain))
+                self.assertIn(MinifiedPagesTest.post.text, minified)
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from . import metrics as metrics_registry
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics(request):
+    '''
+    Отдаёт сводные метрики всех воркеров в текстовом формате Prometheus.
+    Доступно только с адресов из METRICS_ALLOWED_IPS.
+    '''
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    counters, histograms = metrics_registry.collect()
+    return HttpResponse(
+        metrics_registry.render_prometheus(counters, histograms),
+        content_type=PROMETHEUS_CONTENT_TYPE,
+    )
@@ -1,23 +1,144 @@
+from functools import partial
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.views.main import (ERROR_FLAG, IGNORED_PARAMS,
+                                             PAGE_VAR, SEARCH_VAR)
+from django.utils.safestring import mark_safe
+
+from . import search
+from .models import Follow, Group, Post, PostCounter
+
+# фильтры списка постов, для которых число постов есть в PostCounter
+COUNTED_FILTERS = {
+    'group__id__exact': PostCounter.GROUP,
+    'author__id__exact': PostCounter.AUTHOR,
+}
 
-from .models import Post, Group
+
+class SharedSelect(forms.Select):
+    '''
+    Выпадающий список для строк list_editable. Шаблоны виджета и
+    вариантов рендерятся один раз на каждое выбранное значение, а не в
+    каждой строке: готовый HTML с заглушкой вместо имени поля делят
+    все копии виджета в формах строк (как __prefix__ у formset).
+    '''
+    PLACEHOLDER = '__row_name__'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rendered = {}
+
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = dict(attrs or {})
+        if attrs.get('id', f'id_{name}') != f'id_{name}':
+            return super().render(name, value, attrs, renderer)
+        if 'id' in attrs:
+            attrs['id'] = f'id_{self.PLACEHOLDER}'
+        key = (str(value), tuple(sorted(
+            (attr, str(attr_value)) for attr, attr_value in attrs.items())))
+        if key not in self.rendered:
+            self.rendered[key] = super().render(
+                self.PLACEHOLDER, value, attrs, renderer)
+        return mark_safe(self.rendered[key].replace(self.PLACEHOLDER, name))
 
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     '''
     Класс для настройки отображения модели Post в интерфейсе админки.
+    Список рассчитан на миллионы постов: число записей берётся из
+    PostCounter вместо COUNT(*), группы для выпадающих списков в
+    строках выбираются один раз на страницу, даты для date_hierarchy
+    ищутся по индексу pub_date (шаблон admin/posts/post/change_list.html),
+    автор и группа в форме поста выбираются без полного списка.
     '''
     list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
+    # pub_date - только ссылки-диапазоны, без запросов к БД. Фильтра по
+    # группе в боковой панели нет: он выбирал бы все группы на каждой
+    # странице; ссылка ?group__id__exact=<id> по-прежнему работает.
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    raw_id_fields = ('author',)
+    autocomplete_fields = ('group',)
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
+    def known_count(self, request):
+        '''
+        Число постов из PostCounter для списка без фильтров или с одним
+        фильтром по группе или автору. Для остальных списков - None.
+        '''
+        if request.GET.get(SEARCH_VAR):
+            return None
+        filters = {name: value for name, value in request.GET.items()
+                   if name not in IGNORED_PARAMS
+                   and name not in (PAGE_VAR, ERROR_FLAG)}
+        if not filters:
+            return PostCounter.objects.get_value(PostCounter.SITE)
+        if len(filters) > 1:
+            return None
+        (name, value), = filters.items()
+        if name not in COUNTED_FILTERS or not value.isdigit():
+            return None
+        return PostCounter.objects.get_value(COUNTED_FILTERS[name],
+                                             int(value))
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        paginator = super().get_paginator(
+            request, queryset, per_page, orphans, allow_empty_first_page)
+        count = self.known_count(request)
+        if count is not None:
+            paginator.count = count
+        return paginator
+
+    def changelist_formfield(self, db_field, request, **kwargs):
+        '''
+        Поля строк списка (list_editable). Выпадающий список групп
+        заполняется одним запросом: у поля готовый список вариантов, и
+        копии поля в формах строк не перечитывают группы из БД; HTML
+        списка рендерится один раз (SharedSelect).
+        '''
+        if db_field.name != 'group':
+            return self.formfield_for_dbfield(db_field, request, **kwargs)
+        field = db_field.formfield(widget=SharedSelect, **kwargs)
+        # iter(): list() от ModelChoiceIterator сделал бы ещё и COUNT(*)
+        field.choices = list(iter(field.choices))
+        return field
+
+    def get_changelist_formset(self, request, **kwargs):
+        kwargs.setdefault('formfield_callback', partial(
+            self.changelist_formfield, request=request))
+        return super().get_changelist_formset(request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        '''
+        Ищет по тексту через индекс FTS5 вместо LIKE '%...%'.
+        '''
+        if not search_term or not search.is_available():
+            return super().get_search_results(request, queryset, search_term)
+        if not search.match_expression(search_term):
+            return queryset.none(), False
+        return search.filter_matching(queryset, search_term), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
     '''
     Класс для настройки отображения модели Group в интерфейсе админки.
     '''
-    pass
+    # поиск нужен для выбора группы в PostAdmin (autocomplete_fields)
+    search_fields = ('title',)
+
+
+@admin.register(Follow)
+class FollowAdmin(admin.ModelAdmin):
+    '''
+    Класс для настройки отображения модели Follow в интерфейсе админки.
+    '''
+    list_display = ('pk', 'user', 'author',)
+    raw_id_fields = ('user', 'author',)
@@ -0,0 +1,85 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Max
+
+from core.tasks import enqueue_many
+
+from .cache import purge_tags
+from .forms import BulkPostForm
+from .models import Group, Post, PostCounter
+
+BULK_POSTS_MAX = 500
+
+
+def _group_ids(items):
+    ids = set()
+    for item in items:
+        try:
+            ids.add(int(item.get('group')))
+        except (TypeError, ValueError):
+            pass
+    return ids
+
+
+def validate_posts(author, items):
+    '''
+    Проверяет пачку постов по правилам PostForm.
+    Все группы пачки загружаются одним запросом.
+    Возвращает (посты без сохранения, ошибки); ошибки - список словарей
+    {'index': номер поста в пачке, 'errors': {поле: [сообщения]}}.
+    '''
+    groups = Group.objects.in_bulk(_group_ids(
+        item for item in items if isinstance(item, dict)))
+    posts = []
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index,
+                           'errors': {'__all__': ['Ожидался объект.']}})
+            continue
+        form = BulkPostForm(data=item, groups=groups)
+        if not form.is_valid():
+            errors.append({'index': index, 'errors': {
+                field: [error['message'] for error in field_errors]
+                for field, field_errors in form.errors.get_json_data().items()
+            }})
+            continue
+        post = form.save(commit=False)
+        post.author = author
+        posts.append(post)
+    return posts, errors
+
+
+@transaction.atomic
+def create_posts(author, posts):
+    '''
+    Сохраняет проверенные посты одного автора одной транзакцией через
+    bulk_create. bulk_create не шлёт сигналов, поэтому всё производное
+    обновляется здесь один раз на пачку: счётчики и закешированные
+    страницы, а раскладка по лентам подписчиков ставится в очередь.
+    Возвращает сохранённые посты.
+    '''
+    if not posts:
+        return []
+    counters = PostCounter.objects
+    # Первая запись транзакции. В SQLite она берёт блокировку записи до
+    # конца транзакции: пока пачка не сохранена, никто другой посты не
+    # вставит, и все посты с id больше last_pk - из этой пачки.
+    counters.change(PostCounter.SITE, delta=len(posts))
+    last_pk = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+    Post.objects.bulk_create(posts)
+    if posts[0].pk is None:
+        # SQLite не возвращает id из bulk_create: перечитываем только
+        # что вставленные посты.
+        posts = list(Post.objects.filter(pk__gt=last_pk).order_by('pk'))
+
+    counters.change(PostCounter.AUTHOR, author.pk, len(posts))
+    by_group = Counter(post.group_id for post in posts if post.group_id)
+    for group_id, total in by_group.items():
+        counters.change(PostCounter.GROUP, group_id, total)
+
+    enqueue_many('posts.fan_out', [{'post_id': post.pk} for post in posts])
+    purge_tags('feed', f'author:{author.pk}',
+               *(f'group:{group_id}' for group_id in by_group))
+    return posts
@@ -0,0 +1,143 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.translation import get_language
+
+from core import metrics
+
+VERSION_KEY = 'version:{kind}:{pk}'
+PAGE_KEY = 'page:{language}:{path}'
+# общий счётчик сбросов: растёт при каждом purge_tags
+PURGES = ('purges', 'all')
+
+
+def _new_version():
+    '''
+    Начальное значение версии. Берётся из текущего времени, чтобы после
+    вытеснения ключа из кеша версия не совпала с прежней.
+    '''
+    return int(time.time() * 1000)
+
+
+def bump_version(kind, pk):
+    '''
+    Увеличивает версию объекта, делая все зависящие от него ключи кеша
+    недействительными.
+    '''
+    key = VERSION_KEY.format(kind=kind, pk=pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), None)
+
+
+def get_versions(objects):
+    '''
+    Возвращает версии для пар (kind, pk) одним обращением к кешу.
+    Отсутствующие версии заводит заново.
+    '''
+    keys = {obj: VERSION_KEY.format(kind=obj[0], pk=obj[1])
+            for obj in objects}
+    found = cache.get_many(keys.values())
+    versions = {}
+    missing = {}
+    for obj, key in keys.items():
+        if key in found:
+            versions[obj] = found[key]
+        else:
+            missing[key] = versions[obj] = _new_version()
+    if missing:
+        cache.set_many(missing, None)
+    return versions
+
+
+def _bump_tags(tags):
+    # сначала общий счётчик: кто увидел новую версию тега, увидит и его
+    bump_version(*PURGES)
+    for tag in tags:
+        bump_version('tag', tag)
+
+
+def purge_tags(*tags):
+    '''
+    Делает недействительными все закешированные страницы с данными тегами.
+    Внутри транзакции теги сбрасываются ещё раз после коммита: страница,
+    построенная между сбросом и коммитом, видела старые данные.
+    '''
+    if not tags:
+        return
+    _bump_tags(tags)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump_tags(tags))
+
+
+def tag_response(response, *tags):
+    '''
+    Помечает ответ тегами - тем, от чего зависит содержимое страницы.
+    По этим тегам страница будет сброшена из кеша.
+    '''
+    response.cache_tags = set(getattr(response, 'cache_tags', ())) | set(tags)
+    return response
+
+
+def _page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return PAGE_KEY.format(path=path, language=get_language())
+
+
+def _is_cacheable_request(request):
+    return (settings.PAGE_CACHE_ENABLED
+            and request.method in ('GET', 'HEAD')
+            and not request.user.is_authenticated)
+
+
+def _is_cacheable_response(response):
+    return (response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and getattr(response, 'cache_tags', None))
+
+
+def anonymous_page_cache(view):
+    '''
+    Декоратор: кеширует всю страницу для анонимных GET-запросов.
+    Вместе со страницей хранятся версии её тегов; если какой-то тег
+    с тех пор сброшен через purge_tags, страница строится заново.
+    Страница, во время рендера которой был сброс, не сохраняется.
+    '''
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _is_cacheable_request(request):
+            return view(request, *args, **kwargs)
+        key = _page_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            versions = entry['versions']
+            if get_versions(versions) == versions:
+                metrics.record_cache('page', hits=1, misses=0)
+                response = HttpResponse(entry['content'],
+                                        content_type=entry['content_type'])
+                response.cache_tags = {tag for _, tag in versions}
+                return response
+        metrics.record_cache('page', hits=0, misses=1)
+        # Версии тегов страницы известны только после рендера. Если за
+        # время рендера что-то сбросили, страница могла собраться из
+        # старых данных - такую не сохраняем.
+        purges = get_versions({PURGES})
+        response = view(request, *args, **kwargs)
+        if _is_cacheable_response(response):
+            versions = get_versions(
+                {PURGES} | {('tag', tag) for tag in response.cache_tags})
+            if versions.pop(PURGES) == purges[PURGES]:
+                cache.set(key, {
+                    'versions': versions,
+                    'content': response.content,
+                    'content_type': response['Content-Type'],
+                }, settings.PAGE_CACHE_TIMEOUT)
+        return response
+    return wrapper
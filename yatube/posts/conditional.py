@@ -0,0 +1,131 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import get_language
+
+from .models import AuthorUpdate, Group, Post, PostCounter, User
+
+
+def _latest(queryset):
+    '''
+    Подзапрос: самое позднее updated_at в кверисете (по индексу).
+    '''
+    return Subquery(queryset.order_by('-updated_at').values('updated_at')[:1])
+
+
+def _counter(kind, object_id):
+    '''
+    Подзапрос: значение счётчика постов из PostCounter.
+    '''
+    return Subquery(PostCounter.objects.filter(
+        kind=kind, object_id=object_id).values('value')[:1])
+
+
+def index_state(request):
+    return (PostCounter.objects
+            .filter(kind=PostCounter.SITE, object_id=0)
+            .annotate(last_post=_latest(Post.objects.all()),
+                      last_group=_latest(Group.objects.all()),
+                      last_author=_latest(AuthorUpdate.objects.all()))
+            .values_list('value', 'last_post', 'last_group', 'last_author')
+            .first())
+
+
+def group_state(request, slug):
+    return (Group.objects
+            .filter(slug=slug)
+            .annotate(last_post=_latest(
+                Post.objects.filter(group=OuterRef('pk'))),
+                posts_count=_counter(PostCounter.GROUP, OuterRef('pk')),
+                last_author=_latest(AuthorUpdate.objects.all()))
+            .values_list('updated_at', 'last_post', 'posts_count',
+                         'last_author')
+            .first())
+
+
+def profile_state(request, username):
+    return (User.objects
+            .filter(username=username)
+            .annotate(last_post=_latest(
+                Post.objects.filter(author=OuterRef('pk'))),
+                last_group=_latest(Group.objects.all()),
+                posts_count=_counter(PostCounter.AUTHOR, OuterRef('pk')),
+                followers=_counter(PostCounter.FOLLOWERS, OuterRef('pk')),
+                last_author=_latest(
+                    AuthorUpdate.objects.filter(author=OuterRef('pk'))))
+            .values_list('last_post', 'last_group', 'posts_count',
+                         'followers', 'last_author')
+            .first())
+
+
+def post_state(request, post_id):
+    return (Post.objects
+            .filter(pk=post_id)
+            .annotate(posts_count=_counter(PostCounter.AUTHOR,
+                                           OuterRef('author_id')))
+            .values_list('updated_at', 'group__updated_at', 'posts_count',
+                         'author__page_update__updated_at')
+            .first())
+
+
+def _validators(request, state):
+    '''
+    Превращает состояние страницы в пару (ETag, Last-Modified).
+    ETag зависит ещё и от пользователя и языка: страница для автора
+    выглядит иначе, чем для гостя, а в шапке выводится его имя.
+    '''
+    user = (f'{request.user.pk}:{request.user.get_username()}'
+            if request.user.is_authenticated else '')
+    raw = '|'.join(map(str, (*state, user, get_language())))
+    etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+    dates = [value for value in state if hasattr(value, 'timestamp')]
+    last_modified = int(max(dates).timestamp()) if dates else None
+    return etag, last_modified
+
+
+def _cache_policy(request, response):
+    if request.user.is_authenticated:
+        patch_cache_control(response, **settings.PRIVATE_CACHE_CONTROL)
+    else:
+        patch_cache_control(response, **settings.PUBLIC_CACHE_CONTROL)
+    patch_vary_headers(response, settings.PAGE_VARY_HEADERS)
+    return response
+
+
+def conditional_page(state_func):
+    '''
+    Декоратор для публичных страниц постов.
+    Одним запросом state_func получает отметки последних изменений и
+    число постов; по ним считаются ETag и Last-Modified. Если у клиента
+    уже актуальная версия, отвечает 304, не выполняя запрос ленты и не
+    рендеря шаблон. Всем ответам проставляются Cache-Control и Vary.
+    state_func возвращает None, если объекта нет - тогда страница
+    строится как обычно (и отдаёт свою 404).
+    '''
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            state = state_func(request, *args, **kwargs)
+            if state is None:
+                return view(request, *args, **kwargs)
+            etag, last_modified = _validators(request, state)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                return response
+            if not response.has_header('ETag'):
+                response['ETag'] = etag
+            if last_modified and not response.has_header('Last-Modified'):
+                response['Last-Modified'] = http_date(last_modified)
+            return _cache_policy(request, response)
+        return wrapper
+    return decorator
@@ -0,0 +1,153 @@
+import hashlib
+from xml.sax.saxutils import escape, quoteattr
+
+from django.utils.feedgenerator import rfc2822_date, rfc3339_date
+from django.utils.text import Truncator
+
+from .links import fast_reverse
+
+FEED_ITEMS = 20
+FEED_TITLE_WORDS = 8
+FEED_FIELDS = (
+    'id', 'text', 'pub_date', 'updated_at',
+    'author__username', 'author__first_name', 'author__last_name',
+    'group__title',
+)
+CONTENT_TYPES = {
+    'atom': 'application/atom+xml; charset=utf-8',
+    'rss': 'application/rss+xml; charset=utf-8',
+}
+
+
+class FeedFormatConverter:
+    '''
+    Конвертер пути для формата ленты: atom или rss.
+    '''
+    regex = 'atom|rss'
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
+
+
+class FeedSource:
+    '''
+    Что именно отдаёт лента: заголовок, ссылка на HTML-страницу,
+    кверисет постов и состояние в БД, от которого зависит содержимое
+    (state-функции из posts.conditional: последние изменения постов,
+    групп и авторов и число постов).
+    '''
+    def __init__(self, title, link, queryset, state):
+        self.title = title
+        self.link = link
+        self.queryset = queryset
+        # state-функция даёт None, если счётчика ещё нет (постов не было)
+        self.state = state or ()
+
+    def etag(self, feed_format):
+        '''
+        ETag по состоянию из БД: его видят все процессы, поэтому правка
+        поста, группы или автора в любом из них меняет ETag сразу.
+        '''
+        raw = '|'.join(map(str, (feed_format, *self.state)))
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(self):
+        '''
+        Дата последнего изменения ленты; None, если менять было нечему.
+        '''
+        dates = [value for value in self.state if hasattr(value, 'timestamp')]
+        return max(dates) if dates else None
+
+    def rows(self):
+        '''
+        Последние посты ленты: только нужные столбцы, без создания
+        объектов моделей и без загрузки всего результата в память.
+        '''
+        return (self.queryset.order_by('-pub_date', '-pk')
+                .values(*FEED_FIELDS)[:FEED_ITEMS].iterator())
+
+
+def _author_name(row):
+    full_name = f'{row["author__first_name"]} {row["author__last_name"]}'
+    return full_name.strip() or row['author__username']
+
+
+def _entry_title(row):
+    return Truncator(row['text']).words(FEED_TITLE_WORDS, truncate='…')
+
+
+def atom_feed(source, base_url, self_url, updated):
+    '''
+    Генератор ленты Atom: отдаёт документ по кусочку на каждый пост.
+    '''
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="ru">'
+        f'<title>{escape(source.title)}</title>'
+        f'<link href={quoteattr(base_url + source.link)} rel="alternate"/>'
+        f'<link href={quoteattr(self_url)} rel="self"/>'
+        f'<id>{escape(base_url + source.link)}</id>'
+        f'<updated>{rfc3339_date(updated)}</updated>'
+    )
+    for row in source.rows():
+        link = base_url + fast_reverse('posts:post_detail', [row['id']])
+        category = ''
+        if row['group__title']:
+            category = f'<category term={quoteattr(row["group__title"])}/>'
+        published = rfc3339_date(row['pub_date'])
+        yield (
+            '<entry>'
+            f'<title>{escape(_entry_title(row))}</title>'
+            f'<link href={quoteattr(link)} rel="alternate"/>'
+            f'<id>{escape(link)}</id>'
+            f'<published>{published}</published>'
+            f'<updated>{rfc3339_date(row["updated_at"])}</updated>'
+            f'<author><name>{escape(_author_name(row))}</name></author>'
+            f'{category}'
+            f'<summary type="text">{escape(row["text"])}</summary>'
+            '</entry>'
+        )
+    yield '</feed>\n'
+
+
+def rss_feed(source, base_url, self_url, updated):
+    '''
+    Генератор ленты RSS 2.0: отдаёт документ по кусочку на каждый пост.
+    '''
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"'
+        ' xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>'
+        f'<title>{escape(source.title)}</title>'
+        f'<link>{escape(base_url + source.link)}</link>'
+        f'<description>{escape(source.title)}</description>'
+        f'<atom:link href={quoteattr(self_url)} rel="self"/>'
+        '<language>ru</language>'
+        f'<lastBuildDate>{rfc2822_date(updated)}</lastBuildDate>'
+    )
+    for row in source.rows():
+        link = base_url + fast_reverse('posts:post_detail', [row['id']])
+        category = ''
+        if row['group__title']:
+            category = f'<category>{escape(row["group__title"])}</category>'
+        yield (
+            '<item>'
+            f'<title>{escape(_entry_title(row))}</title>'
+            f'<link>{escape(link)}</link>'
+            f'<guid isPermaLink="true">{escape(link)}</guid>'
+            f'<pubDate>{rfc2822_date(row["pub_date"])}</pubDate>'
+            f'<dc:creator>{escape(_author_name(row))}</dc:creator>'
+            f'{category}'
+            f'<description>{escape(row["text"])}</description>'
+            '</item>'
+        )
+    yield '</channel></rss>\n'
+
+
+WRITERS = {
+    'atom': atom_feed,
+    'rss': rss_feed,
+}
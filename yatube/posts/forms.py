@@ -1,4 +1,5 @@
 from django import forms
+from django.core.exceptions import ValidationError
 
 from .models import Post
 
@@ -15,3 +16,57 @@ class PostForm(forms.ModelForm):
             'text': ('Текст поста'),
             'group': ('Необязательная группа, к которой можно отнести пост'),
         }
+
+
+class PostImageForm(forms.ModelForm):
+    '''
+    Картинка к посту. Отдельная форма, чтобы PostForm оставалась
+    формой текста и группы; обе формы работают с одним объектом Post.
+    '''
+    class Meta:
+        model = Post
+        fields = ('image',)
+        help_texts = {
+            'image': ('Необязательная картинка к посту'),
+        }
+
+
+class PreloadedGroupField(forms.ModelChoiceField):
+    '''
+    Поле группы, которое ищет группу в заранее загруженном словаре
+    {pk: Group} вместо отдельного запроса к БД на каждое значение.
+    '''
+    def __init__(self, groups, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.groups = groups
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.groups[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(self.error_messages['invalid_choice'],
+                                  code='invalid_choice')
+
+
+class BulkPostForm(PostForm):
+    '''
+    Форма одного поста из пачки: те же правила, что у PostForm,
+    но существование группы проверяется по словарю groups, который
+    загружается один раз на всю пачку.
+    '''
+    def __init__(self, *args, groups, **kwargs):
+        super().__init__(*args, **kwargs)
+        field = self.fields['group']
+        self.fields['group'] = PreloadedGroupField(
+            groups,
+            queryset=field.queryset,
+            required=field.required,
+            label=field.label,
+            help_text=field.help_text,
+        )
+
+    def _get_validation_exclusions(self):
+        # Иначе модель ещё раз проверит ForeignKey запросом на каждый пост.
+        return super()._get_validation_exclusions() + ['group']
@@ -0,0 +1,76 @@
+import json
+
+from django.conf import settings
+from sorl.thumbnail import get_thumbnail
+
+from core.tasks import enqueue
+
+from .models import Post
+
+
+def _stored(post):
+    '''
+    Превью из поля thumbnails, если они сделаны для текущей картинки.
+    Если в поле не то, что записал generate_thumbnails, превью нет.
+    '''
+    if not (post.image and post.thumbnails):
+        return {}
+    try:
+        data = json.loads(post.thumbnails)
+        if data['image'] == post.image.name:
+            return dict(data['sizes'])
+    except (ValueError, TypeError, KeyError):
+        # испорченное поле: превью будто бы ещё нет
+        pass
+    return {}
+
+
+def generate_thumbnails(post_id):
+    '''
+    Готовит все превью из POST_THUMBNAIL_SIZES для картинки поста и
+    сохраняет их адреса и размеры в поле thumbnails - его видят все
+    процессы. Сохранение только этого поля сбрасывает карточку и
+    страницы поста (сигналы), но не трогает updated_at.
+    Возвращает число подготовленных превью.
+    '''
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image or _stored(post):
+        return 0
+    sizes = {}
+    for size, (geometry, options) in settings.POST_THUMBNAIL_SIZES.items():
+        thumbnail = get_thumbnail(post.image, geometry, **options)
+        sizes[size] = {
+            'url': thumbnail.url,
+            'width': thumbnail.width,
+            'height': thumbnail.height,
+        }
+    post.thumbnails = json.dumps({'image': post.image.name, 'sizes': sizes})
+    post.save(update_fields=['thumbnails'])
+    return len(sizes)
+
+
+def schedule_thumbnails(post):
+    '''
+    Ставит подготовку превью поста в фоновую очередь (core.tasks):
+    запрос, загрузивший картинку, не ждёт её обработки. Вызывается один
+    раз на картинку - при её загрузке; ключ задачи не даёт поставить
+    её дважды.
+    '''
+    if post.image:
+        enqueue('posts.thumbnails', {'post_id': post.pk},
+                key=f'thumbnails:{post.pk}:{post.image.name}')
+
+
+def thumbnails_for(posts, size):
+    '''
+    Готовые превью размера size для постов с картинками: {pk: превью}.
+    Берутся из уже загруженных постов, без запросов к БД, кешу и
+    хранилищу sorl. Пока превью не готово, поста в словаре нет и
+    шаблон показывает саму картинку.
+    '''
+    found = {}
+    for post in posts:
+        thumbnail = _stored(post).get(size)
+        if thumbnail is not None:
+            found[post.pk] = thumbnail
+    return found
@@ -0,0 +1,130 @@
+from contextlib import contextmanager, nullcontext
+from types import MethodType
+
+from django.contrib import admin
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import (setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from django.urls import reverse
+
+from core.benchmark import measure, save_report
+from posts.models import Group, Post, User
+from posts.seed import seed
+
+# интервал между постами при раскладке по датам: 1M постов - около 6 лет
+POST_INTERVAL_MINUTES = 3
+# что замеряется как "legacy" (пишется в отчёт)
+LEGACY_ADMIN = ('PostAdmin без оптимизаций списка и без поиска FTS5: '
+                'COUNT(*), Select групп в строках, LIKE-поиск')
+
+
+@contextmanager
+def legacy_admin():
+    '''
+    Возвращает PostAdmin исходные настройки (LEGACY_ADMIN): точный
+    COUNT(*) дважды, обычный выпадающий список групп в каждой строке,
+    который перечитывает группы для каждой строки, фильтр по дате
+    вместо date_hierarchy и поиск через LIKE '%...%' вместо FTS5.
+    '''
+    model_admin = admin.site._registry[Post]
+    attributes = {
+        'list_filter': ('pub_date',),
+        'list_select_related': False,
+        'date_hierarchy': None,
+        'show_full_result_count': True,
+        'raw_id_fields': (),
+        'autocomplete_fields': (),
+        'get_paginator': MethodType(admin.ModelAdmin.get_paginator,
+                                    model_admin),
+        'get_changelist_formset': MethodType(
+            admin.ModelAdmin.get_changelist_formset, model_admin),
+        'get_search_results': MethodType(
+            admin.ModelAdmin.get_search_results, model_admin),
+    }
+    for name, value in attributes.items():
+        setattr(model_admin, name, value)
+    try:
+        yield
+    finally:
+        for name in attributes:
+            delattr(model_admin, name)
+
+
+def spread_dates():
+    '''
+    После seed() у всех постов одна дата. Раскладывает их назад от
+    текущего момента с шагом POST_INTERVAL_MINUTES одним UPDATE.
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE posts_post SET pub_date = "
+            "datetime('now', '-' || (id * %s) || ' minutes')",
+            [POST_INTERVAL_MINUTES])
+
+
+class Command(BaseCommand):
+    help = ('Замеряет список постов в админке на большой таблице: '
+            'текущий PostAdmin против прежних настроек.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', default='bench_admin.json')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.stdout.write(f'Создаю {options["posts"]} постов...')
+            seed(users=1000, groups=20, posts=options['posts'],
+                 batch_size=20000)
+            spread_dates()
+            results = []
+            with override_settings(QUERY_INSPECTOR_ENABLED=False,
+                                   SLOW_REQUEST_THRESHOLD_MS=float('inf')):
+                for variant in ('legacy', 'current'):
+                    results.extend(self.measure(variant, options['repeat']))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+        for row in results:
+            self.stdout.write(
+                f'{row["variant"]:<8} {row["scenario"]:<14} '
+                f'p50 {row["p50_ms"]:>9} мс, p95 {row["p95_ms"]:>9} мс, '
+                f'запросов {row["queries"]}')
+        save_report(options['output'], results, posts=options['posts'],
+                    legacy=LEGACY_ADMIN)
+        self.stdout.write(self.style.SUCCESS(
+            f'Отчёт сохранён в {options["output"]}'))
+
+    def scenarios(self):
+        '''
+        Страницы списка постов: {имя: параметры запроса}.
+        '''
+        group = Group.objects.order_by('pk').first()
+        total = Post.objects.count()
+        middle = Post.objects.order_by('pub_date')[total // 2].pub_date
+        return {
+            'first_page': {},
+            'deep_page': {'p': total // 100 // 2},
+            'group': {'group__id__exact': group.pk},
+            'year': {'pub_date__year': middle.year},
+            'month': {'pub_date__year': middle.year,
+                      'pub_date__month': middle.month},
+            'search': {'q': 'яндекс практикум'},
+        }
+
+    def measure(self, variant, repeat):
+        client = Client()
+        client.force_login(User.objects.create_superuser(
+            username=f'bench_admin_{variant}', email='admin@example.com',
+            password='pass'))
+        url = reverse('admin:posts_post_changelist')
+        results = []
+        with legacy_admin() if variant == 'legacy' else nullcontext():
+            for name, params in self.scenarios().items():
+                row = measure(lambda: client.get(url, params), repeat)
+                results.append({'variant': variant, 'scenario': name, **row})
+        return results
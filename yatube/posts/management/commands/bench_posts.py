@@ -0,0 +1,144 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.test.utils import (setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from django.urls import reverse
+
+from core.benchmark import compare_reports, measure, save_report
+from posts.models import Group, Post, User
+from posts.seed import seed
+from posts.views import NUMBER_OF_POSTS
+
+BENCH_USERNAME = 'bench_author'
+# JSON-ручки api и HTML-страницы, с которыми их сравниваем.
+API_PAIRS = {
+    'api_post_list': 'index',
+    'api_group_posts': 'group_posts',
+    'api_profile_posts': 'profile',
+    'api_post_detail': 'post_detail',
+}
+
+
+def build_scenarios(size, cold):
+    '''
+    Сценарии нагрузки: словарь {имя: функция, делающая один запрос}.
+    '''
+    author, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+    group = Group.objects.order_by('pk').first()
+    post = Post.objects.filter(author=author).first() or Post.objects.create(
+        author=author, group=group, text='Пост для замеров')
+    guest = Client()
+    writer = Client()
+    writer.force_login(author)
+    deep_page = max(size // NUMBER_OF_POSTS // 2, 1)
+    urls = {
+        'index': reverse('posts:index'),
+        'index_deep_page': reverse('posts:index') + f'?page={deep_page}',
+        'group_posts': reverse('posts:group_list', args=[group.slug]),
+        'profile': reverse('posts:profile', args=[author.username]),
+        'post_detail': reverse('posts:post_detail', args=[post.pk]),
+        'api_post_list': reverse('api:post_list'),
+        'api_group_posts': reverse('api:group_posts', args=[group.slug]),
+        'api_profile_posts': reverse('api:profile_posts',
+                                     args=[author.username]),
+        'api_post_detail': reverse('api:post_detail', args=[post.pk]),
+    }
+
+    def reader(url):
+        def call():
+            if cold:
+                cache.clear()
+            return guest.get(url)
+        return call
+
+    scenarios = {name: reader(url) for name, url in urls.items()}
+    scenarios['post_create'] = lambda: writer.post(
+        reverse('posts:post_create'),
+        {'text': 'Новый пост для замеров', 'group': group.pk})
+    scenarios['post_edit'] = lambda: writer.post(
+        reverse('posts:post_edit', args=[post.pk]),
+        {'text': 'Изменённый пост для замеров', 'group': group.pk})
+    return scenarios
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержки, число запросов и память представлений '
+            'posts на нескольких объёмах данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+',
+                            default=[1000, 10000, 100000],
+                            help='Число постов в БД для каждого прогона.')
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Запросов на один сценарий.')
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кеш перед каждым запросом.')
+        parser.add_argument('--output', default='bench_posts.json')
+        parser.add_argument('--compare', metavar='REPORT',
+                            help='Сравнить с прошлым отчётом по p95.')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Не удалять тестовую БД после прогона.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False,
+                                     keepdb=options['keepdb'])
+        try:
+            # замеряем представления, а не детектор лишних запросов
+            with override_settings(QUERY_INSPECTOR_ENABLED=False):
+                results = self.run(options)
+        finally:
+            teardown_databases(old_config, verbosity=0,
+                               keepdb=options['keepdb'])
+            teardown_test_environment()
+        save_report(options['output'], results,
+                    requests=options['requests'], cold=options['cold'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Отчёт сохранён в {options["output"]}'))
+        if options['compare']:
+            for key, before, after, change in compare_reports(
+                    options['compare'], results):
+                self.stdout.write(
+                    f'{key}: p95 {before} -> {after} мс ({change:+}%)')
+
+    def run(self, options):
+        seed(users=options['users'], groups=options['groups'])
+        results = []
+        for size in sorted(options['sizes']):
+            missing = size - Post.objects.count()
+            if missing > 0:
+                seed(posts=missing)
+            scenarios = build_scenarios(size, options['cold'])
+            for name, call in scenarios.items():
+                result = measure(call, options['requests'])
+                result.update(size=size, scenario=name)
+                results.append(result)
+                self.stdout.write(
+                    f'{size:>9} {name:<16} p50={result["p50_ms"]:.2f} '
+                    f'p95={result["p95_ms"]:.2f} p99={result["p99_ms"]:.2f} '
+                    f'мс, запросов={result["queries"]}, '
+                    f'память={result["peak_memory_kb"]} КБ, '
+                    f'ответ={result.get("response_bytes", "-")} Б')
+            self.compare_api(size, results)
+        return results
+
+    def compare_api(self, size, results):
+        '''
+        Печатает, во сколько раз JSON-ручки быстрее и легче HTML-страниц.
+        '''
+        by_name = {result['scenario']: result for result in results
+                   if result['size'] == size}
+        for api_name, html_name in API_PAIRS.items():
+            api, html = by_name[api_name], by_name[html_name]
+            speedup = api['throughput_rps'] / (html['throughput_rps'] or 1)
+            shrink = (html.get('response_bytes', 0)
+                      / (api.get('response_bytes') or 1))
+            self.stdout.write(
+                f'{size:>9} {api_name} vs {html_name}: '
+                f'{api["throughput_rps"]} / {html["throughput_rps"]} rps '
+                f'(x{speedup:.1f}), '
+                f'{api.get("response_bytes")} / '
+                f'{html.get("response_bytes")} Б (в {shrink:.1f} раза меньше)')
@@ -0,0 +1,178 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.test import Client, override_settings
+from django.test.utils import (setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from django.urls import reverse
+
+from core.benchmark import percentile, save_report
+from posts.models import Group, User
+from posts.seed import seed
+
+MODES = (
+    ('default', False),
+    ('production', True),
+)
+
+
+class Worker(threading.Thread):
+    '''
+    Поток нагрузки: до истечения срока раз за разом вызывает call().
+    Считает задержки и ошибки "database is locked".
+    '''
+    def __init__(self, call, barrier, deadline):
+        super().__init__(daemon=True)
+        self.call = call
+        self.barrier = barrier
+        self.deadline = deadline
+        self.latencies = []
+        self.errors = 0
+
+    def run(self):
+        self.barrier.wait()
+        try:
+            while time.perf_counter() < self.deadline[0]:
+                start = time.perf_counter()
+                try:
+                    self.call()
+                except OperationalError:
+                    self.errors += 1
+                    continue
+                self.latencies.append((time.perf_counter() - start) * 1000)
+        finally:
+            connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность SQLite в обычном и боевом '
+            'режиме (SQLITE_PRODUCTION): N читателей и M писателей '
+            'одновременно ходят в ленты и в post_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5.0,
+                            help='Секунд нагрузки на каждый режим.')
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--output', default='bench_sqlite.json')
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        database = connections.databases[DEFAULT_DB_ALIAS]
+        old_test_name = database['TEST'].get('NAME')
+        # Нужна настоящая файловая БД: в памяти нет ни блокировок, ни WAL.
+        database['TEST']['NAME'] = os.path.join(directory, 'bench.sqlite3')
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            seed(users=50, groups=5, posts=options['posts'])
+            results = [self.run_mode(name, production, options)
+                       for name, production in MODES]
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            database['TEST']['NAME'] = old_test_name
+            shutil.rmtree(directory, ignore_errors=True)
+        save_report(options['output'], results, readers=options['readers'],
+                    writers=options['writers'], duration=options['duration'])
+        baseline, tuned = results
+        gain = {key: tuned[key] / (baseline[key] or 1)
+                for key in ('requests_per_s', 'reads_per_s', 'writes_per_s')}
+        self.stdout.write(self.style.SUCCESS(
+            f'Всего: x{gain["requests_per_s"]:.2f}, '
+            f'чтения: x{gain["reads_per_s"]:.2f}, '
+            f'записи: x{gain["writes_per_s"]:.2f}. '
+            f'Отчёт сохранён в {options["output"]}'))
+
+    def run_mode(self, name, production, options):
+        database = connections.databases[DEFAULT_DB_ALIAS]
+        database['CONN_MAX_AGE'] = (settings.SQLITE_CONN_MAX_AGE
+                                    if production else 0)
+        connections.close_all()
+        with override_settings(SQLITE_PRODUCTION=production,
+                               QUERY_INSPECTOR_ENABLED=False,
+                               SLOW_REQUEST_THRESHOLD_MS=float('inf')):
+            connection = connections[DEFAULT_DB_ALIAS]
+            connection.ensure_connection()
+            if not production:
+                connection.connection.execute('PRAGMA journal_mode = DELETE')
+            author = User.objects.order_by('pk').first()
+            group = Group.objects.order_by('pk').first()
+            urls = [
+                reverse('posts:index'),
+                reverse('posts:group_list', args=[group.slug]),
+                reverse('posts:profile', args=[author.username]),
+            ]
+            writers = []
+            for _ in range(options['writers']):
+                client = Client()
+                client.force_login(author)
+                writers.append(client)
+            connections.close_all()
+
+            barrier = threading.Barrier(
+                options['readers'] + options['writers'] + 1)
+            deadline = [0.0]
+            readers = [
+                Worker(self.reader(Client(), urls), barrier, deadline)
+                for _ in range(options['readers'])
+            ]
+            writer_threads = [
+                Worker(self.writer(client, group), barrier, deadline)
+                for client in writers
+            ]
+            threads = readers + writer_threads
+            for thread in threads:
+                thread.start()
+            deadline[0] = time.perf_counter() + options['duration']
+            barrier.wait()
+            for thread in threads:
+                thread.join()
+        return self.summary(name, readers, writer_threads,
+                            options['duration'])
+
+    def reader(self, client, urls):
+        position = [0]
+
+        def call():
+            position[0] = (position[0] + 1) % len(urls)
+            client.get(urls[position[0]])
+        return call
+
+    def writer(self, client, group):
+        url = reverse('posts:post_create')
+
+        def call():
+            client.post(url, {'text': 'Пост под нагрузкой',
+                              'group': group.pk})
+        return call
+
+    def summary(self, name, readers, writers, duration):
+        reads = [value for thread in readers for value in thread.latencies]
+        writes = [value for thread in writers for value in thread.latencies]
+        result = {
+            'mode': name,
+            'reads': len(reads),
+            'writes': len(writes),
+            'errors': sum(thread.errors for thread in readers + writers),
+            'reads_per_s': round(len(reads) / duration, 1),
+            'writes_per_s': round(len(writes) / duration, 1),
+            'requests_per_s': round((len(reads) + len(writes)) / duration, 1),
+            'read_p95_ms': round(percentile(reads, 0.95), 3),
+            'write_p95_ms': round(percentile(writes, 0.95), 3),
+        }
+        self.stdout.write(
+            f'{name:<11} запросов/с={result["requests_per_s"]} '
+            f'чтений/с={result["reads_per_s"]} '
+            f'записей/с={result["writes_per_s"]} '
+            f'ошибок={result["errors"]} '
+            f'p95 чтения={result["read_p95_ms"]} мс, '
+            f'p95 записи={result["write_p95_ms"]} мс')
+        return result
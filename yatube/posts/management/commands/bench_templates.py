@@ -0,0 +1,101 @@
+import copy
+import gzip
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.test.utils import (setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from django.urls import reverse
+
+from core.benchmark import save_report
+from posts.models import Follow, Group, Post, User
+from posts.seed import seed
+
+
+def _templates(minify):
+    templates = copy.deepcopy(settings.TEMPLATES)
+    templates[0]['APP_DIRS'] = False
+    templates[0]['OPTIONS']['loaders'] = (
+        settings.MINIFIED_TEMPLATE_LOADERS if minify
+        else [('django.template.loaders.cached.Loader',
+               settings.BASE_TEMPLATE_LOADERS)])
+    return templates
+
+
+class Command(BaseCommand):
+    help = ('Показывает, сколько байт экономит сжатие пробелов в шаблонах '
+            '(TEMPLATE_MINIFY) на настоящих страницах: размер ответа '
+            'без сжатия и после gzip.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=200)
+        parser.add_argument('--output', default='bench_templates.json')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            seed(users=10, groups=3, posts=options['posts'])
+            pages = self.pages()
+            with override_settings(PAGE_CACHE_ENABLED=False,
+                                   QUERY_INSPECTOR_ENABLED=False):
+                plain = self.measure(pages, minify=False)
+                minified = self.measure(pages, minify=True)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+        results = []
+        for name in pages:
+            (raw, packed), (raw_min, packed_min) = plain[name], minified[name]
+            results.append({
+                'page': name,
+                'bytes': raw,
+                'bytes_minified': raw_min,
+                'saved_percent': round(100 * (raw - raw_min) / raw, 1),
+                'gzip_bytes': packed,
+                'gzip_bytes_minified': packed_min,
+                'gzip_saved_percent': round(
+                    100 * (packed - packed_min) / packed, 1),
+            })
+            self.stdout.write(
+                f'{name:<12} {raw:>7} -> {raw_min:>7} байт '
+                f'(-{results[-1]["saved_percent"]}%), gzip {packed:>6} -> '
+                f'{packed_min:>6} (-{results[-1]["gzip_saved_percent"]}%)')
+        save_report(options['output'], results, posts=options['posts'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Отчёт сохранён в {options["output"]}'))
+
+    def pages(self):
+        '''
+        Страницы для замера: {имя: (клиент, адрес)}.
+        '''
+        author = User.objects.order_by('pk').first()
+        reader = User.objects.order_by('pk').last()
+        Follow.objects.get_or_create(user=reader, author=author)
+        group = Group.objects.order_by('pk').first()
+        post = Post.objects.order_by('pk').first()
+        guest = Client()
+        member = Client()
+        member.force_login(reader)
+        return {
+            'index': (guest, reverse('posts:index')),
+            'group_list': (guest, reverse('posts:group_list',
+                                          args=[group.slug])),
+            'profile': (guest, reverse('posts:profile',
+                                       args=[author.username])),
+            'post_detail': (guest, reverse('posts:post_detail',
+                                           args=[post.pk])),
+            'follow': (member, reverse('posts:follow_index')),
+            'post_create': (member, reverse('posts:post_create')),
+        }
+
+    def measure(self, pages, minify):
+        sizes = {}
+        with override_settings(TEMPLATES=_templates(minify)):
+            for name, (client, url) in pages.items():
+                cache.clear()
+                content = client.get(url).content
+                sizes[name] = (len(content), len(gzip.compress(content)))
+        return sizes
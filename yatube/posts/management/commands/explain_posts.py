@@ -0,0 +1,157 @@
+import re
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from posts.seed import seed
+
+EXPLAIN_USERNAME = 'explain_author'
+# Таблицы, которые читаются целиком намеренно: служебные таблицы Django
+# и список групп для выпадающего списка в форме поста.
+DEFAULT_ALLOWED_SCANS = ('django_content_type', 'django_migrations',
+                         'posts_group')
+SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(?P<table>\w+)(?P<rest>.*)$')
+
+
+def capture_queries(call):
+    '''
+    Выполняет call() и возвращает список (sql, params) всех запросов.
+    '''
+    queries = []
+
+    def wrapper(execute, sql, params, many, context):
+        if not many:
+            queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        call()
+    return queries
+
+
+def explain(sql, params):
+    '''
+    Возвращает строки плана EXPLAIN QUERY PLAN для запроса.
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan, allowed_scans):
+    '''
+    Находит в плане полный просмотр таблицы и сортировку во временном
+    B-дереве.
+    '''
+    problems = []
+    for line in plan:
+        match = SCAN_RE.match(line)
+        if match and 'INDEX' not in match['rest']:
+            if match['table'] not in allowed_scans:
+                problems.append(line)
+        elif 'USE TEMP B-TREE' in line:
+            problems.append(line)
+    return problems
+
+
+def build_requests():
+    '''
+    Запросы к представлениям posts: {имя: функция, делающая запрос}.
+    '''
+    author, _ = User.objects.get_or_create(username=EXPLAIN_USERNAME)
+    group = Group.objects.order_by('pk').first()
+    post = Post.objects.create(author=author, group=group,
+                               text='Пост для разбора планов')
+    guest = Client()
+    writer = Client()
+    writer.force_login(author)
+    urls = {
+        'index': reverse('posts:index'),
+        'index_page': reverse('posts:index') + '?page=3',
+        'index_cursor': reverse('posts:index') + '?after=',
+        'group_posts': reverse('posts:group_list', args=[group.slug]),
+        'group_posts_cursor': (reverse('posts:group_list', args=[group.slug])
+                               + '?after='),
+        'profile': reverse('posts:profile', args=[author.username]),
+        'profile_cursor': (reverse('posts:profile', args=[author.username])
+                           + '?after='),
+        'post_detail': reverse('posts:post_detail', args=[post.pk]),
+        'search': reverse('posts:search') + '?q=пост',
+    }
+    requests = {name: (guest, url) for name, url in urls.items()}
+    requests['follow_index'] = (writer, reverse('posts:follow_index'))
+    requests['post_create'] = (writer, reverse('posts:post_create'))
+    requests['post_edit'] = (writer, reverse('posts:post_edit',
+                                             args=[post.pk]))
+    return requests
+
+
+def collect_plans(allowed_scans=DEFAULT_ALLOWED_SCANS):
+    '''
+    Прогоняет представления posts и разбирает план каждого их запроса.
+    Возвращает список словарей: view, sql, plan, problems.
+    '''
+    report = []
+    for name, (client, url) in build_requests().items():
+        cache.clear()
+        queries = capture_queries(lambda: client.get(url))
+        seen = set()
+        for sql, params in queries:
+            if sql in seen or not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            seen.add(sql)
+            plan = explain(sql, params)
+            report.append({
+                'view': name,
+                'sql': sql,
+                'plan': plan,
+                'problems': plan_problems(plan, allowed_scans),
+            })
+    return report
+
+
+class Command(BaseCommand):
+    help = ('Снимает EXPLAIN QUERY PLAN со всех запросов представлений '
+            'posts и ищет полные просмотры таблиц и временные сортировки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--strict', action='store_true',
+                            help='Завершиться с ошибкой при проблемах.')
+        parser.add_argument('--allow-scan', nargs='*', default=[],
+                            metavar='TABLE',
+                            help='Таблицы, которым разрешён полный просмотр.')
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Печатать планы всех запросов.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда разбирает планы только для SQLite')
+        allowed = DEFAULT_ALLOWED_SCANS + tuple(options['allow_scan'])
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            seed(users=10, groups=3, posts=200)
+            report = collect_plans(allowed)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        problems = [entry for entry in report if entry['problems']]
+        for entry in report:
+            if entry['problems'] or options['verbose_plans']:
+                self.stdout.write(f'[{entry["view"]}] {entry["sql"]}')
+                for line in entry['plan']:
+                    mark = '!!' if line in entry['problems'] else '  '
+                    self.stdout.write(f'  {mark} {line}')
+        summary = (f'Запросов разобрано: {len(report)}, '
+                   f'с проблемами: {len(problems)}')
+        if problems and options['strict']:
+            raise CommandError(summary)
+        style = self.style.WARNING if problems else self.style.SUCCESS
+        self.stdout.write(style(summary))
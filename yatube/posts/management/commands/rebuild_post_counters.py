@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import PostCounter
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов (сайт, авторы, группы).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить счётчики с данными, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        mismatches = PostCounter.objects.verify()
+        for kind, object_id, stored, actual in mismatches:
+            self.stdout.write(
+                f'{kind}:{object_id}: сохранено {stored}, на деле {actual}')
+        if options['check']:
+            if mismatches:
+                raise CommandError(
+                    f'Расходится счётчиков: {len(mismatches)}')
+            self.stdout.write(self.style.SUCCESS('Счётчики верны'))
+            return
+        total = PostCounter.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано счётчиков: {total}, исправлено: {len(mismatches)}'))
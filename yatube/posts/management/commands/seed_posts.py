@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.seed import seed
+
+
+class Command(BaseCommand):
+    help = ('Массово создаёт пользователей, группы и посты '
+            'для нагрузочных тестов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно генератора случайных чисел.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        created = seed(options['users'], options['groups'],
+                       options['posts'], options['batch_size'],
+                       options['seed'])
+        elapsed = time.perf_counter() - start
+        rate = created['posts'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {created}, за {elapsed:.1f} с '
+            f'({rate:.0f} постов/с)'))
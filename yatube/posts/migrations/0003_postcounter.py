@@ -0,0 +1,83 @@
+# Generated by Django 2.2.16 on 2026-10-18 01:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_post_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    PostCounter = apps.get_model('posts', 'PostCounter')
+    counters = [PostCounter(kind='site', object_id=0,
+                            value=Post.objects.count())]
+    by_author = (Post.objects.order_by().values('author_id')
+                 .annotate(total=models.Count('pk')))
+    counters += [PostCounter(kind='author', object_id=row['author_id'],
+                             value=row['total']) for row in by_author]
+    by_group = (Post.objects.order_by().filter(group__isnull=False)
+                .values('group_id').annotate(total=models.Count('pk')))
+    counters += [PostCounter(kind='group', object_id=row['group_id'],
+                             value=row['total']) for row in by_group]
+    PostCounter.objects.bulk_create(counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_auto_20221102_1341'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='post',
+            options={'ordering': ['-pub_date']},
+        ),
+        migrations.AlterField(
+            model_name='group',
+            name='description',
+            field=models.TextField(verbose_name='Описание'),
+        ),
+        migrations.AlterField(
+            model_name='group',
+            name='slug',
+            field=models.SlugField(unique=True, verbose_name='Слаг'),
+        ),
+        migrations.AlterField(
+            model_name='group',
+            name='title',
+            field=models.CharField(max_length=200, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='posts', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posts', to='posts.Group', verbose_name='Группа'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='pub_date',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='text',
+            field=models.TextField(verbose_name='Текст'),
+        ),
+        migrations.CreateModel(
+            name='PostCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('site', 'Весь сайт'), ('author', 'Автор'), ('group', 'Группа')], max_length=10, verbose_name='Тип счётчика')),
+                ('object_id', models.PositiveIntegerField(default=0, verbose_name='ID объекта')),
+                ('value', models.IntegerField(default=0, verbose_name='Число постов')),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(fill_post_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0008_post_thumbnails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorUpdate',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='page_update', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения')),
+            ],
+        ),
+    ]
@@ -1,8 +1,13 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Q
 
 from django.contrib.auth import get_user_model
 
+from .links import fast_reverse
+
 NUMBER_OF_CHAR = 15
+# поля автора, которые выводятся на страницах постов
+AUTHOR_PAGE_FIELDS = ('username', 'first_name', 'last_name')
 
 User = get_user_model()
 
@@ -12,24 +17,32 @@ class Group(models.Model):
     Модель для создания таблицы "Group".
     Таблица используется для хранения групп, в которые
     объединяются выкладываемые посты.
-    Поля таблицы: "title", "slug", "description".
+    Поля таблицы: "title", "slug", "description", "updated_at".
     '''
     title = models.CharField(max_length=200, verbose_name="Название")
     slug = models.SlugField(unique=True, verbose_name="Слаг")
     description = models.TextField(verbose_name="Описание")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True,
+                                      verbose_name="Дата изменения")
 
     def __str__(self):
         return self.title
 
+    def get_absolute_url(self):
+        return fast_reverse('posts:group_list', [self.slug])
+
 
 class Post(models.Model):
     '''
     Модель для создания таблицы "Post".
     В данной таблице хранятся тексты, их авторы и даты публикации.
-    Поля таблицы: "text", "pub_date", "author".
+    Поля таблицы: "text", "pub_date", "updated_at", "author", "group",
+    "image", "thumbnails".
     '''
     text = models.TextField(verbose_name="Текст")
     pub_date = models.DateTimeField(auto_now_add=True, verbose_name="Дата")
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name="Дата изменения")
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -44,9 +57,266 @@ class Post(models.Model):
         related_name='posts',
         verbose_name="Группа"
     )
+    image = models.ImageField(
+        upload_to='posts/',
+        blank=True,
+        verbose_name="Картинка"
+    )
+    # готовые превью картинки (posts.images), JSON
+    thumbnails = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name="Превью"
+    )
 
     class Meta:
         ordering = ['-pub_date']
+        # Индексы под реальные выборки лент: общая лента, лента автора
+        # и лента группы, все в порядке (pub_date, id) от новых к старым.
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            # Последнее изменение в ленте - для ETag/Last-Modified.
+            models.Index(fields=['-updated_at'],
+                         name='post_updated_at_idx'),
+            models.Index(fields=['author', '-updated_at'],
+                         name='post_author_updated_at_idx'),
+            models.Index(fields=['group', '-updated_at'],
+                         name='post_group_updated_at_idx'),
+        ]
 
     def __str__(self):
         return self.text[:NUMBER_OF_CHAR]
+
+    def get_absolute_url(self):
+        return fast_reverse('posts:post_detail', [self.pk])
+
+    def save(self, *args, **kwargs):
+        '''
+        Сохраняет пост одной транзакцией вместе с работой сигналов
+        post_save: счётчики и задачи очереди (core.tasks) записываются,
+        только если записан сам пост, и наоборот.
+        '''
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def get_edit_url(self):
+        return fast_reverse('posts:post_edit', [self.pk])
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded_state()
+        return instance
+
+    def remember_loaded_state(self):
+        '''
+        Запоминает автора и группу, с которыми пост лежит в БД.
+        По ним сигналы понимают, какие счётчики поменялись при сохранении.
+        '''
+        self._loaded_author_id = self.__dict__.get('author_id')
+        self._loaded_group_id = self.__dict__.get('group_id')
+
+
+class PostCounterManager(models.Manager):
+    '''
+    Менеджер счётчиков постов: чтение, изменение и полный пересчёт.
+    '''
+    def get_value(self, kind, object_id=0):
+        '''
+        Возвращает значение счётчика одним запросом по уникальному индексу.
+        '''
+        value = (self.filter(kind=kind, object_id=object_id)
+                 .values_list('value', flat=True).first())
+        return value or 0
+
+    def change(self, kind, object_id=0, delta=1):
+        '''
+        Атомарно прибавляет delta к счётчику, создавая его при необходимости.
+        '''
+        if not delta:
+            return
+        counters = self.filter(kind=kind, object_id=object_id)
+        if counters.update(value=F('value') + delta):
+            return
+        try:
+            with transaction.atomic():
+                self.create(kind=kind, object_id=object_id,
+                            value=max(delta, 0))
+        except IntegrityError:
+            counters.update(value=F('value') + delta)
+
+    def actual_values(self):
+        '''
+        Считает настоящие значения всех счётчиков агрегатными запросами.
+        Возвращает словарь {(kind, object_id): value}.
+        '''
+        values = {(self.model.SITE, 0): Post.objects.count()}
+        by_author = (Post.objects.order_by().values('author_id')
+                     .annotate(total=Count('pk')))
+        for row in by_author:
+            values[(self.model.AUTHOR, row['author_id'])] = row['total']
+        by_group = (Post.objects.order_by().filter(group__isnull=False)
+                    .values('group_id').annotate(total=Count('pk')))
+        for row in by_group:
+            values[(self.model.GROUP, row['group_id'])] = row['total']
+        by_followed = (Follow.objects.order_by().values('author_id')
+                       .annotate(total=Count('pk')))
+        for row in by_followed:
+            values[(self.model.FOLLOWERS, row['author_id'])] = row['total']
+        return values
+
+    def verify(self):
+        '''
+        Сравнивает сохранённые счётчики с настоящими.
+        Возвращает список расхождений (kind, object_id, stored, actual).
+        '''
+        actual = self.actual_values()
+        stored = {(counter.kind, counter.object_id): counter.value
+                  for counter in self.all()}
+        mismatches = []
+        for key in sorted(set(actual) | set(stored)):
+            if actual.get(key, 0) != stored.get(key, 0):
+                mismatches.append(
+                    (*key, stored.get(key, 0), actual.get(key, 0)))
+        return mismatches
+
+    @transaction.atomic
+    def rebuild(self):
+        '''
+        Пересобирает все счётчики с нуля. Возвращает число счётчиков.
+        '''
+        actual = self.actual_values()
+        self.all().delete()
+        self.bulk_create(
+            self.model(kind=kind, object_id=object_id, value=value)
+            for (kind, object_id), value in actual.items()
+        )
+        return len(actual)
+
+
+class PostCounter(models.Model):
+    '''
+    Модель для создания таблицы "PostCounter".
+    Хранит заранее посчитанное число постов: на всём сайте,
+    у конкретного автора и в конкретной группе, а также число
+    подписчиков автора.
+    Поля таблицы: "kind", "object_id", "value".
+    '''
+    SITE = 'site'
+    AUTHOR = 'author'
+    GROUP = 'group'
+    FOLLOWERS = 'followers'
+    KIND_CHOICES = (
+        (SITE, 'Весь сайт'),
+        (AUTHOR, 'Автор'),
+        (GROUP, 'Группа'),
+        (FOLLOWERS, 'Подписчики автора'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES,
+                            verbose_name="Тип счётчика")
+    object_id = models.PositiveIntegerField(default=0,
+                                            verbose_name="ID объекта")
+    value = models.IntegerField(default=0, verbose_name="Число постов")
+
+    objects = PostCounterManager()
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+    def __str__(self):
+        return f'{self.kind}:{self.object_id}={self.value}'
+
+
+class Follow(models.Model):
+    '''
+    Модель для создания таблицы "Follow".
+    Хранит подписки пользователей на авторов.
+    Поля таблицы: "user", "author".
+    '''
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follower',
+        verbose_name="Подписчик"
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following',
+        verbose_name="Автор"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+            models.CheckConstraint(check=~Q(user=F('author')),
+                                   name='no_self_follow'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.author_id}'
+
+
+class AuthorUpdate(models.Model):
+    '''
+    Модель для создания таблицы "AuthorUpdate".
+    Время последнего изменения данных автора, которые видны на
+    страницах постов (AUTHOR_PAGE_FIELDS): у auth.User своего
+    updated_at нет. Входит в ETag и Last-Modified страниц
+    (posts.conditional), чтобы после переименования автора они не
+    отвечали 304 со старым именем. Строка появляется при первом
+    изменении.
+    Поля таблицы: "author", "updated_at".
+    '''
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='page_update',
+        verbose_name="Автор"
+    )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True,
+                                      verbose_name="Дата изменения")
+
+    def __str__(self):
+        return f'{self.author_id}: {self.updated_at}'
+
+
+class TimelineEntry(models.Model):
+    '''
+    Модель для создания таблицы "TimelineEntry".
+    Личная лента пользователя: по записи на каждый пост автора,
+    на которого он подписан. Заполняется при публикации поста
+    (fan-out on write), поэтому лента читается одним проходом по индексу.
+    Поля таблицы: "user", "post", "pub_date" (копия даты поста).
+    '''
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name="Читатель"
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name="Пост"
+    )
+    pub_date = models.DateTimeField(verbose_name="Дата")
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
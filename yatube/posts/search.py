@@ -0,0 +1,157 @@
+import re
+
+from django.db import connection
+
+from .models import Post
+
+SEARCH_TABLE = 'posts_post_fts'
+# Сколько результатов поиска максимум ранжируется и показывается.
+SEARCH_MAX_RESULTS = 1000
+TERM_RE = re.compile(r'\w+')
+
+INSTALL_SQL = (
+    f'''CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        text, content='posts_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )''',
+    f'''CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert
+        AFTER INSERT ON posts_post BEGIN
+            INSERT INTO {SEARCH_TABLE}(rowid, text)
+            VALUES (new.id, new.text);
+        END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete
+        AFTER DELETE ON posts_post BEGIN
+            INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update
+        AFTER UPDATE OF text ON posts_post BEGIN
+            INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO {SEARCH_TABLE}(rowid, text)
+            VALUES (new.id, new.text);
+        END''',
+)
+
+
+def is_available():
+    '''
+    Полнотекстовый поиск FTS5 есть только в SQLite.
+    '''
+    return connection.vendor == 'sqlite'
+
+
+def _table_exists(cursor):
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+        [SEARCH_TABLE])
+    return cursor.fetchone() is not None
+
+
+def install():
+    '''
+    Создаёт таблицу FTS5 и триггеры синхронизации с posts_post,
+    если их ещё нет. Триггеры пересоздаются и после миграций,
+    которые пересобирают таблицу posts_post. Если таблица
+    создаётся впервые, индекс заполняется существующими постами.
+    '''
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        created = not _table_exists(cursor)
+        for sql in INSTALL_SQL:
+            cursor.execute(sql)
+    if created:
+        rebuild()
+
+
+def rebuild():
+    '''
+    Перестраивает поисковый индекс по текущему содержимому posts_post.
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+
+def match_expression(query):
+    '''
+    Превращает пользовательский запрос в выражение MATCH для FTS5.
+    Каждое слово берётся в кавычки (чтобы спецсимволы не ломали синтаксис)
+    и ищется по префиксу; все слова должны встретиться в тексте.
+    '''
+    terms = TERM_RE.findall(query or '')
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def filter_matching(queryset, query):
+    '''
+    Оставляет в кверисете постов только подходящие под запрос.
+    '''
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        where=[f'"{table}"."id" IN (SELECT rowid FROM {SEARCH_TABLE} '
+               f'WHERE {SEARCH_TABLE} MATCH %s)'],
+        params=[match_expression(query)],
+    )
+
+
+class SearchResults:
+    '''
+    Результаты поиска, упорядоченные по релевантности (bm25).
+    Поддерживает count() и срезы, поэтому подходит для Paginator:
+    каждая страница - один запрос к FTS5 за id и один за сами посты.
+    '''
+    def __init__(self, query, queryset=None):
+        self.match = match_expression(query)
+        if queryset is None:
+            queryset = Post.objects.select_related('author', 'group')
+        self.queryset = queryset
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            if not self.match:
+                self._count = 0
+            else:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'SELECT count(*) FROM (SELECT rowid '
+                        f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+                        f'LIMIT %s)', [self.match, SEARCH_MAX_RESULTS])
+                    self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        stop = min(key.stop or SEARCH_MAX_RESULTS, SEARCH_MAX_RESULTS)
+        if not self.match or stop <= start:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s ORDER BY rank '
+                f'LIMIT %s OFFSET %s', [self.match, stop - start, start])
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = self.queryset.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search_posts(query):
+    '''
+    Ищет посты по тексту: через FTS5 в SQLite, иначе через icontains.
+    '''
+    if is_available():
+        return SearchResults(query)
+    terms = TERM_RE.findall(query or '')
+    queryset = Post.objects.select_related('author', 'group')
+    if not terms:
+        return queryset.none()
+    for term in terms:
+        queryset = queryset.filter(text__icontains=term)
+    return queryset
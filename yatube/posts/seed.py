@@ -0,0 +1,64 @@
+import itertools
+import random
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Group, Post, PostCounter, User
+
+SEED_USER_PREFIX = 'seed_user_'
+SEED_GROUP_PREFIX = 'seed-group-'
+WORDS = (
+    'яндекс', 'практикум', 'джанго', 'пост', 'лента', 'группа', 'автор',
+    'кеш', 'индекс', 'запрос', 'страница', 'шаблон', 'тест', 'данные',
+)
+
+
+def _text(rnd, words=30):
+    return ' '.join(rnd.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def _bulk_create(model, objects, batch_size):
+    while True:
+        batch = list(itertools.islice(objects, batch_size))
+        if not batch:
+            return
+        model.objects.bulk_create(batch)
+
+
+@transaction.atomic
+def seed(users=0, groups=0, posts=0, batch_size=5000, seed_value=0):
+    '''
+    Быстро наполняет БД пользователями, группами и постами через bulk_create.
+    Объекты создаются пачками по batch_size, размер одного INSERT
+    bulk_create подбирает сам с учётом ограничений СУБД.
+    Сигналы при этом не срабатывают, поэтому в конце пересчитываются
+    счётчики постов и очищается кеш. Возвращает словарь с числом
+    созданных объектов.
+    '''
+    rnd = random.Random(seed_value)
+    first_user = User.objects.count()
+    _bulk_create(User, (
+        User(username=f'{SEED_USER_PREFIX}{first_user + i}', password='!',
+             first_name='Имя', last_name=f'Фамилия {first_user + i}')
+        for i in range(users)
+    ), batch_size)
+    first_group = Group.objects.count()
+    _bulk_create(Group, (
+        Group(title=f'Группа {first_group + i}',
+              slug=f'{SEED_GROUP_PREFIX}{first_group + i}',
+              description=_text(rnd, 10))
+        for i in range(groups)
+    ), batch_size)
+    author_ids = list(User.objects.values_list('pk', flat=True))
+    group_ids = list(Group.objects.values_list('pk', flat=True)) + [None]
+    if posts and not author_ids:
+        raise ValueError('Для постов нужен хотя бы один пользователь')
+    _bulk_create(Post, (
+        Post(text=_text(rnd), author_id=rnd.choice(author_ids),
+             group_id=rnd.choice(group_ids))
+        for _ in range(posts)
+    ), batch_size)
+    PostCounter.objects.rebuild()
+    cache.clear()
+    return {'users': users, 'groups': groups, 'posts': posts}
@@ -0,0 +1,212 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.tasks import enqueue
+
+from . import timeline
+from .cache import bump_version, purge_tags
+from .models import (AUTHOR_PAGE_FIELDS, AuthorUpdate, Follow, Group, Post,
+                     PostCounter, User)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    '''
+    Обновляет счётчики после создания поста или смены его автора/группы.
+    '''
+    if raw:
+        return
+    counters = PostCounter.objects
+    if created:
+        counters.change(PostCounter.SITE)
+        counters.change(PostCounter.AUTHOR, instance.author_id)
+        if instance.group_id:
+            counters.change(PostCounter.GROUP, instance.group_id)
+    else:
+        old_author_id = getattr(instance, '_loaded_author_id', None)
+        old_group_id = getattr(instance, '_loaded_group_id', None)
+        if old_author_id is None:
+            # Пост сохранили, не загружая из БД: прежних значений не знаем,
+            # поэтому счётчики не трогаем (их выправит rebuild_post_counters).
+            instance.remember_loaded_state()
+            return
+        if old_author_id != instance.author_id:
+            counters.change(PostCounter.AUTHOR, old_author_id, -1)
+            counters.change(PostCounter.AUTHOR, instance.author_id)
+        if old_group_id != instance.group_id:
+            if old_group_id:
+                counters.change(PostCounter.GROUP, old_group_id, -1)
+            if instance.group_id:
+                counters.change(PostCounter.GROUP, instance.group_id)
+    instance.remember_loaded_state()
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    '''
+    Уменьшает счётчики после удаления поста, в том числе каскадного.
+    '''
+    counters = PostCounter.objects
+    counters.change(PostCounter.SITE, delta=-1)
+    counters.change(PostCounter.AUTHOR, instance.author_id, -1)
+    if instance.group_id:
+        counters.change(PostCounter.GROUP, instance.group_id, -1)
+
+
+@receiver(post_delete, sender=Group)
+def drop_group_counter(sender, instance, **kwargs):
+    '''
+    Посты удалённой группы остаются без группы (SET_NULL без сигналов),
+    поэтому счётчик группы просто удаляется.
+    '''
+    PostCounter.objects.filter(kind=PostCounter.GROUP,
+                               object_id=instance.pk).delete()
+
+
+@receiver(post_delete, sender=User)
+def drop_author_counter(sender, instance, **kwargs):
+    '''
+    Удаляет счётчики автора вместе с самим автором.
+    '''
+    PostCounter.objects.filter(
+        kind__in=(PostCounter.AUTHOR, PostCounter.FOLLOWERS),
+        object_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_cards(sender, instance, **kwargs):
+    '''
+    Сбрасывает закешированную карточку изменённого поста.
+    '''
+    bump_version('post', instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_cards(sender, instance, **kwargs):
+    '''
+    Сбрасывает карточки всех постов изменённой группы.
+    '''
+    bump_version('group', instance.pk)
+
+
+def _post_page_tags(instance):
+    '''
+    Теги страниц, на которых виден пост, с учётом его прежних
+    автора и группы.
+    '''
+    tags = {'feed'}
+    if instance.pk:
+        tags.add(f'post:{instance.pk}')
+    for author_id in (instance.author_id,
+                      getattr(instance, '_loaded_author_id', None)):
+        if author_id:
+            tags.add(f'author:{author_id}')
+    for group_id in (instance.group_id,
+                     getattr(instance, '_loaded_group_id', None)):
+        if group_id:
+            tags.add(f'group:{group_id}')
+    return tags
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_page_tags(sender, instance, raw=False, **kwargs):
+    '''
+    Запоминает теги страниц до сохранения, пока известны прежние
+    автор и группа поста.
+    '''
+    instance._page_tags = _post_page_tags(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def purge_post_pages(sender, instance, **kwargs):
+    '''
+    Сбрасывает закешированные страницы, на которых виден пост:
+    общую ленту, страницу поста, профиль автора и ленты групп.
+    '''
+    tags = _post_page_tags(instance) | getattr(instance, '_page_tags', set())
+    purge_tags(*tags)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def purge_group_pages(sender, instance, **kwargs):
+    '''
+    Сбрасывает страницы группы и все ленты, где выводятся ссылки на группы.
+    '''
+    purge_tags(f'group:{instance.pk}', 'groups')
+
+
+@receiver(pre_save, sender=User)
+def remember_author_page_fields(sender, instance, raw=False, using=None,
+                                update_fields=None, **kwargs):
+    '''
+    До сохранения пользователя выясняет, меняются ли его поля, видные
+    на страницах постов (AUTHOR_PAGE_FIELDS). Для новых пользователей
+    и сохранений без этих полей (вход, смена пароля) БД не читается.
+    '''
+    instance._page_fields_changed = False
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if (update_fields is not None
+            and not set(update_fields) & set(AUTHOR_PAGE_FIELDS)):
+        return
+    stored = (User.objects.using(using).filter(pk=instance.pk)
+              .values_list(*AUTHOR_PAGE_FIELDS).first())
+    current = tuple(getattr(instance, field) for field in AUTHOR_PAGE_FIELDS)
+    instance._page_fields_changed = stored is not None and stored != current
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, **kwargs):
+    '''
+    Видные на страницах данные автора изменились: отмечает это в
+    AuthorUpdate (от отметки зависят ETag и Last-Modified страниц) и
+    сбрасывает карточки его постов, его страницы и ленты, где выводится
+    его имя. Вход, смена пароля и регистрация ничего не сбрасывают.
+    '''
+    if not getattr(instance, '_page_fields_changed', False):
+        return
+    AuthorUpdate.objects.update_or_create(author=instance)
+    bump_version('user', instance.pk)
+    purge_tags(f'author:{instance.pk}', 'authors')
+
+
+@receiver(post_delete, sender=User)
+def purge_author_pages(sender, instance, **kwargs):
+    '''
+    Сбрасывает страницы удалённого автора и ленты с его именем.
+    '''
+    purge_tags(f'author:{instance.pk}', 'authors')
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    '''
+    Ставит в очередь раскладку нового поста по лентам подписчиков
+    автора (задача posts.fan_out): запрос на создание поста не ждёт
+    вставки в ленты всех подписчиков.
+    '''
+    if created and not raw:
+        enqueue('posts.fan_out', {'post_id': instance.pk})
+
+
+@receiver(post_save, sender=Follow)
+def follow_author(sender, instance, created, raw=False, **kwargs):
+    '''
+    Считает подписчика и наполняет его ленту постами автора.
+    '''
+    if not created or raw:
+        return
+    PostCounter.objects.change(PostCounter.FOLLOWERS, instance.author_id)
+    timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_author(sender, instance, **kwargs):
+    '''
+    Уменьшает число подписчиков и убирает посты автора из ленты.
+    '''
+    PostCounter.objects.change(PostCounter.FOLLOWERS, instance.author_id, -1)
+    timeline.forget(instance.user_id, instance.author_id)
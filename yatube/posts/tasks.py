@@ -0,0 +1,30 @@
+from itertools import groupby
+
+from core.tasks import task
+
+from . import images, timeline
+from .models import Post
+
+
+@task('posts.thumbnails')
+def make_thumbnails(post_id):
+    '''
+    Готовит превью картинки поста (см. posts.images).
+    '''
+    images.generate_thumbnails(post_id)
+
+
+@task('posts.fan_out', batch=True)
+def fan_out_posts(payloads):
+    '''
+    Раскладывает новые посты по лентам подписчиков. Посты одного автора
+    из пачки раскладываются за один проход по его подписчикам; повтор
+    задачи безопасен - вставка в ленты игнорирует дубли.
+    '''
+    posts = (Post.objects
+             .filter(pk__in={payload['post_id'] for payload in payloads})
+             .only('pk', 'author_id', 'pub_date')
+             .order_by('author_id', 'pk'))
+    for author_id, author_posts in groupby(posts,
+                                           key=lambda post: post.author_id):
+        timeline.fan_out_many(author_id, list(author_posts))
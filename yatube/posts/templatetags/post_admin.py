@@ -0,0 +1,90 @@
+import copy
+import datetime
+
+from django import template
+from django.conf import settings
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.contrib.admin.templatetags.base import InclusionAdminNode
+from django.utils import timezone
+
+register = template.Library()
+
+
+def _period_end(start, kind):
+    '''
+    Начало следующего периода (года, месяца или дня) после start.
+    '''
+    if kind == 'year':
+        end = start.replace(year=start.year + 1)
+    elif kind == 'month':
+        end = (start + datetime.timedelta(days=32)).replace(day=1)
+    else:
+        end = start + datetime.timedelta(days=1)
+    end = datetime.datetime.combine(end, datetime.time.min)
+    return timezone.make_aware(end) if settings.USE_TZ else end
+
+
+class IndexedDates:
+    '''
+    Подменяет cl.queryset для тега date_hierarchy.
+    Django считает годы, месяцы и дни через QuerySet.dates() - это
+    DISTINCT по всей выборке, то есть проход по всей таблице постов.
+    Здесь каждый следующий период находится отдельным запросом
+    "первая запись не раньше начала периода" - поиском по индексу
+    pub_date; запросов столько, сколько периодов в ответе.
+    '''
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def _first(self, field, since=None, descending=False):
+        queryset = self.queryset
+        if since is not None:
+            queryset = queryset.filter(**{f'{field}__gte': since})
+        ordering = f'-{field}' if descending else field
+        return (queryset.order_by(ordering)
+                .values_list(field, flat=True).first())
+
+    def aggregate(self, **expressions):
+        # тег спрашивает только first=Min(поле) и last=Max(поле)
+        field = expressions['first'].source_expressions[0].name
+        return {'first': self._first(field),
+                'last': self._first(field, descending=True)}
+
+    def dates(self, field, kind):
+        periods = []
+        value = self._first(field)
+        while value is not None:
+            day = (timezone.localtime(value) if settings.USE_TZ
+                   else value).date()
+            if kind == 'year':
+                day = day.replace(month=1, day=1)
+            elif kind == 'month':
+                day = day.replace(day=1)
+            periods.append(day)
+            value = self._first(field, since=_period_end(day, kind))
+        return periods
+
+
+def indexed_date_hierarchy(cl):
+    if cl.query:
+        # с поиском каждый шаг заново выполнял бы MATCH по индексу FTS5:
+        # результаты поиска по датам не разбиваем
+        return {'show': False}
+    indexed = copy.copy(cl)
+    indexed.queryset = IndexedDates(cl.queryset)
+    return date_hierarchy(indexed)
+
+
+@register.tag(name='indexed_date_hierarchy')
+def indexed_date_hierarchy_tag(parser, token):
+    '''
+    Тот же date_hierarchy из админки, но годы, месяцы и дни ищутся
+    по индексу (IndexedDates).
+    Использование: {% indexed_date_hierarchy cl %}
+    '''
+    return InclusionAdminNode(
+        parser, token,
+        func=indexed_date_hierarchy,
+        template_name='date_hierarchy.html',
+        takes_context=False,
+    )
@@ -0,0 +1,60 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from core import metrics
+
+from ..cache import get_versions
+from ..images import thumbnails_for
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/list_post.html'
+
+
+def _card_dependencies(post):
+    '''
+    Объекты, от которых зависит карточка поста: сам пост, автор и группа.
+    '''
+    dependencies = [('post', post.pk), ('user', post.author_id)]
+    if post.group_id:
+        dependencies.append(('group', post.group_id))
+    return dependencies
+
+
+@register.simple_tag
+def post_cards(posts):
+    '''
+    Возвращает список отрисованных карточек постов ленты.
+    Версии и готовые карточки достаются из кеша двумя get_many,
+    шаблон list_post.html рендерится только для промахов, а готовые
+    превью картинок берутся из самих постов (posts.images).
+    Использование: {% post_cards page_obj as cards %}
+    '''
+    posts = list(posts)
+    if not posts:
+        return []
+    versions = get_versions(
+        {obj for post in posts for obj in _card_dependencies(post)})
+    language = get_language()
+    keys = []
+    for post in posts:
+        parts = [str(versions[obj]) for obj in _card_dependencies(post)]
+        keys.append(f'post_card:{language}:{post.pk}:' + ':'.join(parts))
+    cards = cache.get_many(keys)
+    metrics.record_cache('post_card', hits=len(cards),
+                         misses=len(keys) - len(cards))
+    missed = [(key, post) for key, post in zip(keys, posts)
+              if key not in cards]
+    thumbnails = thumbnails_for([post for _, post in missed], 'card')
+    rendered = {}
+    for key, post in missed:
+        cards[key] = rendered[key] = render_to_string(
+            CARD_TEMPLATE, {'post': post,
+                            'thumbnail': thumbnails.get(post.pk)})
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+    return [mark_safe(cards[key]) for key in keys]
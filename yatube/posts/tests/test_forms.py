@@ -1,8 +1,20 @@
+import io
+import tempfile
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from PIL import Image
 
 from django.urls import reverse
 
+from core.models import Task
+from core.tasks import run_pending
+
+from ..images import (generate_thumbnails, schedule_thumbnails,
+                      thumbnails_for)
 from ..models import Group, Post
 
 User = get_user_model()
@@ -80,3 +92,103 @@ class PostFormTests(TestCase):
                 author=PostFormTests.user
             ).exists()
         )
+
+
+def _image(name='image.png', size=(1200, 800)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/png')
+
+
+class PostImageTests(TestCase):
+    '''
+    Превью готовит воркер очереди: здесь его заменяет run_pending().
+    '''
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=media.name,
+                                                   TASKS_EAGER=False)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.client.force_login(self.user)
+
+    def test_create_post_with_image_prepares_thumbnails(self):
+        '''
+        После создания поста с картинкой превью готовы, и ленты
+        показывают их, а не исходную картинку.
+        '''
+        response = self.client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': _image()})
+        self.assertEqual(response.status_code, 302)
+        run_pending()
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertTrue(post.image.name.startswith('posts/'))
+        thumbnails = {size: thumbnails_for([post], size)[post.pk]
+                      for size in ('card', 'detail')}
+        self.assertEqual((thumbnails['card']['width'],
+                          thumbnails['card']['height']), (960, 339))
+        pages = (
+            (reverse('posts:index'), thumbnails['card']['url']),
+            (post.get_absolute_url(), thumbnails['detail']['url']),
+        )
+        for url, thumbnail_url in pages:
+            with self.subTest(url=url):
+                content = self.client.get(url).content.decode()
+                self.assertIn(thumbnail_url, content)
+                self.assertNotIn(post.image.url, content)
+
+    def test_render_does_not_generate_thumbnails(self):
+        '''
+        Пока превью не готово, лента показывает саму картинку: отрисовка
+        не строит превью и не ставит задач. Готовые превью хранятся в
+        посте, поэтому их видит любой процесс, а повторная задача для
+        той же картинки ничего не делает.
+        '''
+        post = Post.objects.create(author=self.user, text='Пост',
+                                   image=_image())
+        schedule_thumbnails(post)
+        guest = Client()
+        for _ in range(2):
+            content = guest.get(reverse('posts:index')).content
+            self.assertIn(post.image.url, content.decode())
+        self.assertEqual(
+            Task.objects.filter(name='posts.thumbnails').count(), 1)
+        run_pending()
+        post.refresh_from_db()
+        updated_at = post.updated_at
+        thumbnail = thumbnails_for([post], 'card')[post.pk]
+        content = guest.get(reverse('posts:index')).content.decode()
+        self.assertIn(thumbnail['url'], content)
+        self.assertEqual(generate_thumbnails(post.pk), 0)
+        post.refresh_from_db()
+        self.assertEqual(post.updated_at, updated_at)
+
+    def test_broken_thumbnails_field_is_ignored(self):
+        '''
+        Испорченное поле thumbnails - превью как будто нет: лента
+        показывает картинку, задача строит превью заново.
+        '''
+        post = Post.objects.create(author=self.user, text='Пост',
+                                   image=_image(), thumbnails='не JSON')
+        self.assertEqual(thumbnails_for([post], 'card'), {})
+        self.assertEqual(generate_thumbnails(post.pk),
+                         len(settings.POST_THUMBNAIL_SIZES))
+        post.refresh_from_db()
+        self.assertIn(post.pk, thumbnails_for([post], 'card'))
+
+    def test_invalid_image_rejected(self):
+        '''
+        Не картинка в поле image - ошибка формы, пост не создаётся.
+        '''
+        response = self.client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост', 'image': SimpleUploadedFile(
+                'image.png', b'not an image', content_type='image/png')})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['image_form'].errors)
+        self.assertFalse(Post.objects.exists())
@@ -1,7 +1,12 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from core.tasks import REGISTRY
 
-from ..models import Group, Post, NUMBER_OF_CHAR
+from ..models import Group, Post, PostCounter, NUMBER_OF_CHAR
 
 User = get_user_model()
 
@@ -48,3 +53,99 @@ class PostModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(post._meta.get_field(value).verbose_name,
                                  expected,)
+
+
+class PostCounterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.second_group = Group.objects.create(
+            title='Вторая группа',
+            slug='second-slug',
+            description='Тестовое описание',
+        )
+
+    def assertCounters(self, site, author, group, second_group):
+        counters = PostCounter.objects
+        self.assertEqual(counters.get_value(PostCounter.SITE), site)
+        self.assertEqual(
+            counters.get_value(PostCounter.AUTHOR, self.user.pk), author)
+        self.assertEqual(
+            counters.get_value(PostCounter.GROUP, self.group.pk), group)
+        self.assertEqual(
+            counters.get_value(PostCounter.GROUP, self.second_group.pk),
+            second_group)
+        self.assertEqual(counters.verify(), [])
+
+    def test_counters_follow_create_edit_delete(self):
+        """Счётчики остаются точными при создании, правке и удалении."""
+        post = Post.objects.create(author=self.user, text='Пост',
+                                   group=self.group)
+        Post.objects.create(author=self.user, text='Пост без группы')
+        self.assertCounters(site=2, author=2, group=1, second_group=0)
+
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.second_group
+        post.save()
+        self.assertCounters(site=2, author=2, group=0, second_group=1)
+
+        post.group = None
+        post.save()
+        self.assertCounters(site=2, author=2, group=0, second_group=0)
+
+        post.delete()
+        self.assertCounters(site=1, author=1, group=0, second_group=0)
+
+    def test_counters_follow_cascades(self):
+        """Каскадное удаление автора и группы не ломает счётчики."""
+        group = Group.objects.create(title='Удаляемая группа',
+                                     slug='doomed-slug',
+                                     description='Тестовое описание')
+        Post.objects.create(author=self.other, text='Чужой пост', group=group)
+        Post.objects.create(author=self.user, text='Пост', group=group)
+        group.delete()
+        self.assertEqual(PostCounter.objects.verify(), [])
+        self.other.delete()
+        self.assertEqual(PostCounter.objects.verify(), [])
+        self.assertEqual(PostCounter.objects.get_value(PostCounter.SITE), 1)
+
+    def test_rebuild_command_repairs_drift(self):
+        """Команда rebuild_post_counters находит и исправляет расхождения."""
+        Post.objects.create(author=self.user, text='Пост', group=self.group)
+        PostCounter.objects.filter(kind=PostCounter.SITE).update(value=42)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_post_counters', '--check',
+                         stdout=StringIO())
+        call_command('rebuild_post_counters', stdout=StringIO())
+        self.assertEqual(PostCounter.objects.verify(), [])
+        self.assertEqual(PostCounter.objects.get_value(PostCounter.SITE), 1)
+
+    @override_settings(TASKS_EAGER=False)
+    def test_post_and_its_tasks_commit_together(self):
+        """Если задачу не удалось поставить, пост тоже не сохранится."""
+        handler = REGISTRY.pop('posts.fan_out')
+        self.addCleanup(REGISTRY.__setitem__, 'posts.fan_out', handler)
+        with self.assertRaises(LookupError):
+            Post.objects.create(author=self.user, text='Без задачи')
+        self.assertFalse(Post.objects.filter(text='Без задачи').exists())
+        self.assertEqual(PostCounter.objects.get_value(PostCounter.SITE),
+                         Post.objects.count())
+
+
+class SeedPostsCommandTest(TestCase):
+    def test_seed_posts_creates_data_and_counters(self):
+        """Команда seed_posts создаёт данные и верные счётчики."""
+        call_command('seed_posts', '--users', '3', '--groups', '2',
+                     '--posts', '25', '--batch-size', '10',
+                     stdout=StringIO())
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(Group.objects.count(), 2)
+        self.assertEqual(Post.objects.count(), 25)
+        self.assertEqual(PostCounter.objects.verify(), [])
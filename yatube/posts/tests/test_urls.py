@@ -2,8 +2,10 @@ from django.contrib.auth import get_user_model
 from django.test import TestCase, Client
 from http import HTTPStatus
 
-from django.urls import reverse
+from django.urls import (NoReverseMatch, clear_script_prefix, reverse,
+                         set_script_prefix)
 
+from ..links import fast_reverse
 from ..models import Group, Post
 
 User = get_user_model()
@@ -107,3 +109,61 @@ class PostURLTests(TestCase):
         '''
         self.assertEqual(self.guest_client.get('/bla-bla-bla/').status_code,
                          HTTPStatus.NOT_FOUND)
+
+
+class FastReverseTests(TestCase):
+    def assertSameAsReverse(self, name, *args):
+        self.assertEqual(fast_reverse(name, args), reverse(name, args=args))
+
+    def test_matches_reverse(self):
+        """fast_reverse строит те же URL, что и reverse."""
+        cases = [
+            ('posts:index',),
+            ('posts:search',),
+            ('posts:post_detail', 1),
+            ('posts:post_detail', 123456789),
+            ('posts:post_edit', '42'),
+            ('posts:group_list', 'test-slug'),
+            ('posts:profile', 'auth'),
+            ('posts:profile', 'user.name+tag@mail'),
+            ('posts:profile', 'Кирилл'),
+            ('posts:profile', 'a%b c'),
+            ('users:signup',),
+        ]
+        for name, *args in cases:
+            with self.subTest(name=name, args=args):
+                self.assertSameAsReverse(name, *args)
+
+    def test_script_prefix(self):
+        """Учитывается префикс приложения (SCRIPT_NAME)."""
+        set_script_prefix('/yatube/')
+        try:
+            self.assertSameAsReverse('posts:profile', 'auth')
+            self.assertTrue(
+                fast_reverse('posts:post_detail', [7]).startswith('/yatube/'))
+        finally:
+            clear_script_prefix()
+        self.assertEqual(fast_reverse('posts:post_detail', [7]), '/posts/7/')
+
+    def test_invalid_arguments_fall_back_to_reverse(self):
+        """Неподходящий аргумент даёт ту же ошибку, что и reverse."""
+        for args in (['-1'], ['abc'], []):
+            with self.subTest(args=args):
+                with self.assertRaises(NoReverseMatch):
+                    fast_reverse('posts:post_detail', args)
+        with self.assertRaises(NoReverseMatch):
+            fast_reverse('posts:group_list', ['bad slug'])
+
+    def test_model_urls(self):
+        """Модели отдают ссылки через get_absolute_url."""
+        user = User.objects.create_user(username='links')
+        group = Group.objects.create(title='Ссылки', slug='links')
+        post = Post.objects.create(author=user, text='Пост', group=group)
+        self.assertEqual(user.get_absolute_url(),
+                         reverse('posts:profile', args=['links']))
+        self.assertEqual(group.get_absolute_url(),
+                         reverse('posts:group_list', args=['links']))
+        self.assertEqual(post.get_absolute_url(),
+                         reverse('posts:post_detail', args=[post.pk]))
+        self.assertEqual(post.get_edit_url(),
+                         reverse('posts:post_edit', args=[post.pk]))
@@ -1,10 +1,22 @@
+from datetime import datetime, timezone
+from xml.dom.minidom import parseString
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (TestCase, Client, RequestFactory,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
 
 from django.urls import reverse
+from ..cache import anonymous_page_cache, purge_tags, tag_response
 from ..forms import PostForm
-from ..models import Group, Post
-from ..utils import paginator
+from ..management.commands.explain_posts import collect_plans
+from ..models import Follow, Group, Post, PostCounter, TimelineEntry
+from ..seed import seed
+from ..utils import FEED_PAGE_LINKS, paginator
 from ..views import NUMBER_OF_POSTS, PAGE_POSTS_OF_USER
 
 User = get_user_model()
@@ -130,6 +142,28 @@ class PaginatorViewsTest(TestCase):
                 value = len(response.context['page_obj'].object_list)
                 self.assertEqual(value, expected)
 
+    def test_feed_navigation_uses_cursors(self):
+        '''
+        "Следующая" и "Предыдущая" в ленте - курсорные ссылки, номера
+        есть только у первых страниц.
+        '''
+        url = reverse('posts:profile',
+                      kwargs={'username': PaginatorViewsTest.user.username})
+        response = self.client.get(url)
+        page_obj = response.context['page_obj']
+        self.assertContains(response, f'href="?after={page_obj.next_cursor}"')
+        self.assertContains(response, f'page={FEED_PAGE_LINKS}"')
+        self.assertNotContains(response, f'page={FEED_PAGE_LINKS + 1}"')
+        self.assertNotContains(response, 'page=7"')
+        response = self.client.get(url, {'after': page_obj.next_cursor})
+        second = response.context['page_obj']
+        self.assertEqual(list(second), PaginatorViewsTest.posts[-3:-5:-1])
+        self.assertContains(response, f'href="?after={second.next_cursor}"')
+        response = self.client.get(url, {'page': 2})
+        self.assertContains(
+            response,
+            f'href="?before={response.context["page_obj"].previous_cursor}"')
+
     def test_pages_contains_post_with_group(self):
         '''На страницах отображается новый созданный пост.'''
         obj = Post.objects.create(
@@ -189,3 +223,706 @@ class PaginatorViewsTest(TestCase):
                              post_list, PAGE_POSTS_OF_USER)
         self.assertEqual(object.object_list, list(page_obj.object_list))
         self.assertIsInstance(object, type(page_obj))
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(0, 13):
+            Post.objects.create(
+                author=cls.user,
+                group=cls.group,
+                text=f'Тестовый пост № {i}',
+            )
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk'))
+
+    def walk(self, url, page_size):
+        '''Проходит ленту по курсорам вперёд, собирая все записи.'''
+        response = self.client.get(url, {'after': ''})
+        page_obj = response.context['page_obj']
+        self.assertTrue(page_obj.is_cursor)
+        self.assertFalse(page_obj.has_previous())
+        collected = list(page_obj.object_list)
+        while page_obj.has_next():
+            self.assertEqual(len(page_obj), page_size)
+            response = self.client.get(url, {'after': page_obj.next_cursor})
+            page_obj = response.context['page_obj']
+            collected.extend(page_obj.object_list)
+        return collected
+
+    def test_cursor_pages_cover_feed_in_order(self):
+        '''Курсорные страницы покрывают всю ленту без повторов и пропусков.'''
+        urls_and_sizes = {
+            reverse('posts:index'): NUMBER_OF_POSTS,
+            reverse('posts:group_list', kwargs={'slug':
+                    CursorPaginatorTest.group.slug}): NUMBER_OF_POSTS,
+            reverse('posts:profile', kwargs={'username':
+                    CursorPaginatorTest.user.username}): PAGE_POSTS_OF_USER,
+        }
+        for url, page_size in urls_and_sizes.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.walk(url, page_size),
+                                 CursorPaginatorTest.expected)
+
+    def test_before_cursor_returns_previous_page(self):
+        '''Ссылка "Предыдущая" возвращает на ту же страницу.'''
+        url = reverse('posts:index')
+        first = self.client.get(url, {'after': ''}).context['page_obj']
+        second = self.client.get(
+            url, {'after': first.next_cursor}).context['page_obj']
+        back = self.client.get(
+            url, {'before': second.previous_cursor}).context['page_obj']
+        self.assertEqual(back.object_list, first.object_list)
+        self.assertFalse(back.has_previous())
+
+    def test_cursor_page_runs_no_count_query(self):
+        '''Курсорная страница не считает записи через COUNT(*).'''
+        url = reverse('posts:index')
+        first = self.client.get(url, {'after': ''}).context['page_obj']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'after': first.next_cursor})
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries))
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        '''Испорченный курсор открывает первую страницу ленты.'''
+        response = self.client.get(reverse('posts:index'),
+                                   {'after': '!!!not-a-cursor'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.object_list,
+                         CursorPaginatorTest.expected[:NUMBER_OF_POSTS])
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Тестовый пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:index')
+
+    def test_second_render_uses_cached_cards(self):
+        """Повторный показ ленты берёт карточки из кеша."""
+        response = self.client.get(self.url)
+        self.assertTemplateUsed(response, 'posts/list_post.html')
+        response = self.client.get(self.url)
+        self.assertTemplateNotUsed(response, 'posts/list_post.html')
+        self.assertContains(response, PostCardCacheTest.post.text)
+
+    def test_cards_invalidated_on_save(self):
+        """Сохранение поста, автора или группы обновляет карточку."""
+        self.client.get(self.url)
+        post = Post.objects.get(pk=PostCardCacheTest.post.pk)
+        post.text = 'Изменённый текст'
+        post.save()
+        self.assertContains(self.client.get(self.url), 'Изменённый текст')
+
+        user = User.objects.get(pk=PostCardCacheTest.user.pk)
+        user.first_name = 'Новое имя'
+        user.save()
+        self.assertContains(self.client.get(self.url), 'Новое имя')
+
+        group = Group.objects.get(pk=PostCardCacheTest.group.pk)
+        group.slug = 'new-slug'
+        group.save()
+        self.assertContains(
+            self.client.get(self.url),
+            reverse('posts:group_list', kwargs={'slug': 'new-slug'}))
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Тестовый пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(AnonymousPageCacheTest.user)
+
+    def test_anonymous_pages_served_from_cache(self):
+        """Повторный анонимный запрос отдаётся из кеша без рендера."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug':
+                    AnonymousPageCacheTest.group.slug}),
+            reverse('posts:profile', kwargs={'username':
+                    AnonymousPageCacheTest.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id':
+                    AnonymousPageCacheTest.post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                second = self.guest_client.get(url)
+                self.assertIsNotNone(first.context)
+                self.assertIsNone(second.context)
+                self.assertEqual(first.content, second.content)
+
+    def test_authorized_pages_not_cached(self):
+        """Страницы для авторизованных пользователей не кешируются."""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        self.assertIsNotNone(self.authorized_client.get(url).context)
+
+    def test_new_post_purges_only_affected_pages(self):
+        """Новый пост сбрасывает ленту и профиль автора, но не чужой."""
+        index_url = reverse('posts:index')
+        author_url = reverse('posts:profile', kwargs={'username':
+                             AnonymousPageCacheTest.user.username})
+        other_url = reverse('posts:profile', kwargs={'username':
+                            AnonymousPageCacheTest.other.username})
+        for url in (index_url, author_url, other_url):
+            self.guest_client.get(url)
+        Post.objects.create(author=AnonymousPageCacheTest.user,
+                            text='Совсем новый пост')
+        for url in (index_url, author_url):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIsNotNone(response.context)
+                self.assertContains(response, 'Совсем новый пост')
+        self.assertIsNone(self.guest_client.get(other_url).context)
+
+    def test_group_change_purges_old_and_new_group(self):
+        """Перенос поста в другую группу сбрасывает обе ленты групп."""
+        new_group = Group.objects.create(
+            title='Новая группа',
+            slug='new-slug',
+            description='Тестовое описание',
+        )
+        old_url = reverse('posts:group_list', kwargs={'slug':
+                          AnonymousPageCacheTest.group.slug})
+        new_url = reverse('posts:group_list', kwargs={'slug':
+                          new_group.slug})
+        self.guest_client.get(old_url)
+        self.guest_client.get(new_url)
+        post = Post.objects.get(pk=AnonymousPageCacheTest.post.pk)
+        post.group = new_group
+        post.save()
+        self.assertNotContains(self.guest_client.get(old_url), post.text)
+        self.assertContains(self.guest_client.get(new_url), post.text)
+
+    def test_page_purged_while_rendering_is_not_stored(self):
+        """Страница, во время рендера которой был сброс, не кешируется."""
+        renders = []
+
+        @anonymous_page_cache
+        def view(request):
+            renders.append(request)
+            if len(renders) == 1:
+                # запись в другом процессе, пока страница строится
+                purge_tags('feed')
+            return tag_response(HttpResponse(f'версия {len(renders)}'),
+                                'feed')
+
+        request = RequestFactory().get('/race/')
+        request.user = AnonymousUser()
+        self.assertEqual(view(request).content.decode(), 'версия 1')
+        self.assertEqual(view(request).content.decode(), 'версия 2')
+        self.assertEqual(view(request).content.decode(), 'версия 2')
+        self.assertEqual(len(renders), 2)
+
+    def test_only_author_name_changes_purge_feeds(self):
+        """
+        Регистрация и смена пароля ленты не сбрасывают, смена имени
+        автора - сбрасывает.
+        """
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        User.objects.create_user(username='newcomer')
+        author = User.objects.get(pk=AnonymousPageCacheTest.user.pk)
+        author.set_password('new-password')
+        author.save()
+        self.assertIsNone(self.guest_client.get(url).context)
+        author.first_name = 'Анна'
+        author.last_name = 'Каренина'
+        author.save()
+        response = self.guest_client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'Анна Каренина')
+
+
+class QueryPlanTest(TestCase):
+    def test_posts_views_use_indexes(self):
+        """Запросы представлений posts не сканируют таблицы целиком."""
+        seed(users=5, groups=2, posts=50)
+        report = collect_plans()
+        self.assertTrue(report)
+        problems = [(entry['view'], entry['problems'])
+                    for entry in report if entry['problems']]
+        self.assertEqual(problems, [])
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.kitten = Post.objects.create(
+            author=cls.user, text='Котёнок играет с клубком')
+        cls.kittens = Post.objects.create(
+            author=cls.user, text='Котёнок и ещё котёнок, котёнок спит')
+        cls.dog = Post.objects.create(
+            author=cls.user, text='Собака охраняет дом')
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'].object_list)
+
+    def test_search_ranks_and_filters(self):
+        """Поиск находит только подходящие посты, самые релевантные выше."""
+        self.assertEqual(self.search('котёнок'),
+                         [SearchTest.kittens, SearchTest.kitten])
+        self.assertEqual(self.search('собак'), [SearchTest.dog])
+        self.assertEqual(self.search('"); DROP TABLE --'), [])
+        self.assertEqual(self.search(''), [])
+
+    def test_index_follows_edit_and_delete(self):
+        """Индекс обновляется при правке и удалении поста."""
+        post = Post.objects.get(pk=SearchTest.dog.pk)
+        post.text = 'Кошка охраняет дом'
+        post.save()
+        self.assertEqual(self.search('собака'), [])
+        self.assertEqual(self.search('кошка'), [post])
+        post.delete()
+        self.assertEqual(self.search('кошка'), [])
+
+    def test_search_paginates_results(self):
+        """Результаты поиска разбиты на страницы с сохранением запроса."""
+        for i in range(NUMBER_OF_POSTS + 1):
+            Post.objects.create(author=SearchTest.user, text=f'Лиса № {i}')
+        response = self.client.get(reverse('posts:search'), {'q': 'лиса'})
+        self.assertEqual(len(response.context['page_obj']), NUMBER_OF_POSTS)
+        self.assertContains(
+            response, 'href="?q=%D0%BB%D0%B8%D1%81%D0%B0&page=2"')
+        response = self.client.get(reverse('posts:search'),
+                                   {'q': 'лиса', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 1)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через FTS5, а не через LIKE."""
+        self.client.force_login(SearchTest.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'котёнок'})
+        self.assertEqual(response.context['cl'].result_count, 2)
+        self.assertFalse(any('LIKE' in query['sql'] for query in queries))
+
+
+class AdminChangeListTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'group-{i}',
+                                 description='Описание')
+            for i in range(2)]
+        for i in range(6):
+            Post.objects.create(author=cls.user, text=f'Пост {i}',
+                                group=cls.groups[i % 2])
+        # посты за два года: 2020 (март и май) и 2021
+        pks = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+        Post.objects.filter(pk__in=pks[:2]).update(
+            pub_date=datetime(2020, 3, 1, tzinfo=timezone.utc))
+        Post.objects.filter(pk__in=pks[2:4]).update(
+            pub_date=datetime(2020, 5, 9, tzinfo=timezone.utc))
+        Post.objects.filter(pk__in=pks[4:]).update(
+            pub_date=datetime(2021, 1, 1, tzinfo=timezone.utc))
+
+    def setUp(self):
+        self.client.force_login(AdminChangeListTest.user)
+
+    def changelist(self, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'), params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries]
+
+    def test_counts_come_from_counters(self):
+        """Число постов в списке берётся из PostCounter, без COUNT(*)."""
+        group = AdminChangeListTest.groups[0]
+        for params, expected in (({}, 6),
+                                 ({'group__id__exact': group.pk}, 3)):
+            response, queries = self.changelist(params)
+            self.assertEqual(response.context['cl'].result_count, expected)
+            self.assertFalse([sql for sql in queries
+                              if 'COUNT(' in sql and 'posts_post' in sql])
+
+    def test_group_choices_loaded_once(self):
+        """Группы для строк списка выбираются из БД один раз."""
+        response, queries = self.changelist()
+        forms = response.context['cl'].formset.forms
+        self.assertEqual(len(forms), 6)
+        for form in forms:
+            html = str(form['group'])
+            self.assertIn(f'name="{form.prefix}-group"', html)
+            self.assertIn(f'id="id_{form.prefix}-group"', html)
+            self.assertIn(f'<option value="{form.instance.group_id}" '
+                          'selected>', html)
+        self.assertLessEqual(
+            len([sql for sql in queries if 'FROM "posts_group"' in sql]), 2)
+
+    def test_group_is_editable_in_list(self):
+        """Группу можно сменить прямо в списке постов."""
+        posts = list(Post.objects.filter(
+            group=AdminChangeListTest.groups[0])[:2])
+        group = AdminChangeListTest.groups[1]
+        data = {'form-TOTAL_FORMS': len(posts),
+                'form-INITIAL_FORMS': len(posts), '_save': 'Сохранить'}
+        for number, post in enumerate(posts):
+            data[f'form-{number}-id'] = post.pk
+            data[f'form-{number}-group'] = group.pk
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'), data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Post.objects.filter(group=group).count(), 5)
+
+    def test_date_hierarchy_without_distinct(self):
+        """Годы и месяцы date_hierarchy ищутся без DISTINCT по таблице."""
+        response, queries = self.changelist()
+        self.assertContains(response, '?pub_date__year=2020')
+        self.assertContains(response, '?pub_date__year=2021')
+        response, queries = self.changelist({'pub_date__year': 2020})
+        self.assertContains(response, 'pub_date__month=3')
+        self.assertContains(response, 'pub_date__month=5')
+        self.assertNotContains(response, 'pub_date__month=4')
+        self.assertFalse([sql for sql in queries if 'DISTINCT' in sql])
+        response, queries = self.changelist({'q': 'пост'})
+        self.assertNotContains(response, '?pub_date__year=2020')
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Классика', slug='classic', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Все счастливые <семьи>')
+        Post.objects.create(author=cls.user, text='Без группы')
+
+    def setUp(self):
+        cache.clear()
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_feeds_stream_posts(self):
+        """Ленты отдаются потоком и содержат нужные посты."""
+        urls = {
+            reverse('posts:site_feed', args=['atom']): 2,
+            reverse('posts:site_feed', args=['rss']): 2,
+            reverse('posts:group_feed', args=['classic', 'atom']): 1,
+            reverse('posts:author_feed', args=['writer', 'rss']): 2,
+        }
+        for url, entries in urls.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.streaming)
+                self.assertIn('ETag', response)
+                self.assertIn('Last-Modified', response)
+                body = self.read(response)
+                parseString(body)
+                self.assertEqual(
+                    body.count('<entry>') + body.count('<item>'), entries)
+                self.assertIn('Все счастливые &lt;семьи&gt;', body)
+                self.assertIn('Лев Толстой', body)
+                self.assertIn(
+                    reverse('posts:post_detail', args=[FeedTest.post.pk]),
+                    body)
+
+    def test_unknown_feed_404(self):
+        """Неизвестные формат, группа и автор дают 404."""
+        for url in ('/feed/json/', '/group/nope/feed/atom/',
+                    '/profile/nobody/feed/rss/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_conditional_get(self):
+        """Повторный опрос без изменений заканчивается 304."""
+        url = reverse('posts:group_feed', args=['classic', 'atom'])
+        response = self.client.get(url)
+        etag = response['ETag']
+        last_modified = response['Last-Modified']
+        self.read(response)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertLessEqual(len(queries), 2)
+
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        Post.objects.create(author=FeedTest.user, group=FeedTest.group,
+                            text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Новый пост', self.read(response))
+
+    def test_etag_follows_database_state(self):
+        """
+        ETag ленты считается по БД: не зависит от кеша процесса и
+        меняется при переименовании автора и удалении поста.
+        """
+        url = reverse('posts:site_feed', args=['rss'])
+        etag = self.client.get(url)['ETag']
+        cache.clear()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        author = User.objects.get(pk=FeedTest.user.pk)
+        author.first_name = 'Лев Николаевич'
+        author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Лев Николаевич Толстой', self.read(response))
+
+        etag = response['ETag']
+        Post.objects.filter(pk=FeedTest.post.pk).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_empty_site_feed(self):
+        """Лента сайта без единого поста отдаётся без ошибок."""
+        Post.objects.all().delete()
+        PostCounter.objects.all().delete()
+        response = self.client.get(reverse('posts:site_feed', args=['atom']))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('<entry>', self.read(response))
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[ConditionalGetTest.group.slug]),
+            reverse('posts:profile', args=[ConditionalGetTest.user.username]),
+            reverse('posts:post_detail', args=[ConditionalGetTest.post.pk]),
+        ]
+
+    def test_validators_and_cache_headers(self):
+        """Страницы отдают ETag, Last-Modified, Cache-Control и Vary."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('ETag', response)
+                self.assertIn('Last-Modified', response)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+
+    def test_not_modified_skips_view(self):
+        """Повтор с тем же ETag - 304 одним запросом к БД, без шаблона."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(len(queries), 1)
+                self.assertEqual(response.templates, [])
+
+    def test_edit_changes_validators(self):
+        """Правка поста или группы меняет ETag."""
+        post_url = self.urls[3]
+        group_url = self.urls[1]
+        post_etag = self.client.get(post_url)['ETag']
+        group_etag = self.client.get(group_url)['ETag']
+
+        post = Post.objects.get(pk=ConditionalGetTest.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        response = self.client.get(post_url, HTTP_IF_NONE_MATCH=post_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Исправленный пост')
+
+        group = Group.objects.get(pk=ConditionalGetTest.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        response = self.client.get(group_url, HTTP_IF_NONE_MATCH=group_etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_author_rename_changes_validators(self):
+        """Смена имени автора меняет ETag страниц, вход - нет."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        author = User.objects.get(pk=ConditionalGetTest.user.pk)
+        author.last_login = datetime.now(timezone.utc)
+        author.save(update_fields=['last_login'])
+        for url, etag in etags.items():
+            with self.subTest(url=url, change='last_login'):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+        author.first_name = 'Лев'
+        author.last_name = 'Толстой'
+        author.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url, change='name'):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+        self.assertContains(self.client.get(self.urls[3]), 'Лев Толстой')
+
+    def test_authorized_user_gets_private_etag(self):
+        """У авторизованного пользователя свой ETag и private-кеш."""
+        url = self.urls[3]
+        guest_etag = self.client.get(url)['ETag']
+        self.client.force_login(ConditionalGetTest.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=guest_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+
+
+class FollowTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.stranger = User.objects.create_user(username='stranger')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(FollowTest.reader)
+
+    def feed(self, **params):
+        response = self.client.get(reverse('posts:follow_index'), params)
+        return response.context['page_obj']
+
+    def test_follow_and_unfollow(self):
+        """Подписка и отписка меняют ленту и счётчик подписчиков."""
+        old_post = Post.objects.create(author=FollowTest.author, text='Старый')
+        self.client.get(reverse('posts:profile_follow', args=['author']))
+        self.client.get(reverse('posts:profile_follow', args=['author']))
+        self.client.get(reverse('posts:profile_follow', args=['reader']))
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(PostCounter.objects.get_value(
+            PostCounter.FOLLOWERS, FollowTest.author.pk), 1)
+        self.assertEqual(list(self.feed()), [old_post])
+
+        self.client.get(reverse('posts:profile_unfollow', args=['author']))
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(PostCounter.objects.get_value(
+            PostCounter.FOLLOWERS, FollowTest.author.pk), 0)
+        self.assertEqual(list(self.feed()), [])
+
+    def test_new_post_reaches_followers_only(self):
+        """Новый пост попадает только в ленты подписчиков."""
+        Follow.objects.create(user=FollowTest.reader,
+                              author=FollowTest.author)
+        post = Post.objects.create(author=FollowTest.author, text='Новый')
+        self.assertEqual(list(self.feed()), [post])
+        self.client.force_login(FollowTest.stranger)
+        self.assertEqual(list(self.feed()), [])
+
+    @override_settings(TIMELINE_BATCH_SIZE=2)
+    def test_fan_out_in_batches(self):
+        """Записи в ленты вставляются пачками."""
+        for i in range(5):
+            follower = User.objects.create_user(username=f'follower{i}')
+            Follow.objects.create(user=follower, author=FollowTest.author)
+        with CaptureQueriesContext(connection) as queries:
+            post = Post.objects.create(author=FollowTest.author, text='Пост')
+        inserts = [query for query in queries.captured_queries
+                   if query['sql'].startswith('INSERT')
+                   and 'INTO "posts_timelineentry"' in query['sql']]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(
+            TimelineEntry.objects.filter(post=post).count(), 5)
+
+    @override_settings(TIMELINE_FAN_OUT_LIMIT=1)
+    def test_celebrity_posts_are_pulled_on_read(self):
+        """Посты популярного автора не раскладываются, а дочитываются."""
+        Follow.objects.create(user=FollowTest.stranger,
+                              author=FollowTest.author)
+        Follow.objects.create(user=FollowTest.reader,
+                              author=FollowTest.author)
+        Follow.objects.create(user=FollowTest.reader,
+                              author=FollowTest.stranger)
+        posts = []
+        for i in range(NUMBER_OF_POSTS + 2):
+            author = FollowTest.author if i % 2 else FollowTest.stranger
+            posts.append(Post.objects.create(author=author, text=f'Пост {i}'))
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__author=FollowTest.author).exists())
+        posts.reverse()
+
+        first = self.feed()
+        self.assertEqual(list(first), posts[:NUMBER_OF_POSTS])
+        self.assertTrue(first.has_next())
+        second = self.feed(after=first.next_cursor)
+        self.assertEqual(list(second), posts[NUMBER_OF_POSTS:])
+        self.assertFalse(second.has_next())
+        back = self.feed(before=second.previous_cursor)
+        self.assertEqual(list(back), posts[:NUMBER_OF_POSTS])
+
+    def test_feed_reads_timeline_index(self):
+        """Лента читается из TimelineEntry, а не перебором подписок."""
+        for i in range(3):
+            author = User.objects.create_user(username=f'writer{i}')
+            Follow.objects.create(user=FollowTest.reader, author=author)
+            Post.objects.create(author=author, text=f'Пост {i}')
+        with CaptureQueriesContext(connection) as queries:
+            page = self.feed()
+        self.assertEqual(len(page), 3)
+        post_queries = [query['sql'] for query in queries.captured_queries
+                        if '"posts_post"' in query['sql']]
+        self.assertEqual(len(post_queries), 1)
+        self.assertIn('FROM "posts_timelineentry"', post_queries[0])
+
+    def test_guest_redirected(self):
+        """Гостя с ленты подписок отправляют на вход."""
+        self.client.logout()
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 302)
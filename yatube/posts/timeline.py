@@ -0,0 +1,121 @@
+from itertools import islice
+
+from django.conf import settings
+
+from .models import Follow, Post, PostCounter, TimelineEntry
+from .utils import CursorPage, cursor_paginator, merge_cursor_pages
+
+
+def is_celebrity(author_id):
+    '''
+    У автора слишком много подписчиков, чтобы раскладывать его посты
+    по лентам при публикации: их ленты дочитывают его посты сами.
+    '''
+    followers = PostCounter.objects.get_value(PostCounter.FOLLOWERS,
+                                              author_id)
+    return followers > settings.TIMELINE_FAN_OUT_LIMIT
+
+
+def _bulk_add(entries):
+    '''
+    Добавляет записи в ленты пачками по TIMELINE_BATCH_SIZE.
+    entries - итератор TimelineEntry. Возвращает число записей.
+    '''
+    entries = iter(entries)
+    total = 0
+    while True:
+        batch = list(islice(entries, settings.TIMELINE_BATCH_SIZE))
+        if not batch:
+            return total
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        total += len(batch)
+
+
+def fan_out(post):
+    '''
+    Раскладывает новый пост по лентам подписчиков автора (fan-out on write).
+    Подписчики читаются итератором и вставляются пачками, так что
+    память не растёт с их числом. Посты популярных авторов не
+    раскладываются (см. is_celebrity). Возвращает число записей.
+    '''
+    return fan_out_many(post.author_id, [post])
+
+
+def fan_out_many(author_id, posts):
+    '''
+    То же для нескольких новых постов одного автора: подписчики
+    читаются один раз на всю пачку постов.
+    '''
+    if not posts or is_celebrity(author_id):
+        return 0
+    followers = (Follow.objects.filter(author_id=author_id)
+                 .values_list('user_id', flat=True).iterator())
+    return _bulk_add(
+        TimelineEntry(user_id=user_id, post_id=post.pk,
+                      pub_date=post.pub_date)
+        for user_id in followers
+        for post in posts)
+
+
+def backfill(user_id, author_id):
+    '''
+    После подписки добавляет в ленту последние посты автора,
+    чтобы лента не была пустой до его следующей публикации.
+    '''
+    if is_celebrity(author_id):
+        return 0
+    posts = (Post.objects.filter(author_id=author_id)
+             .order_by('-pub_date', '-pk')
+             .values_list('pk', 'pub_date')[:settings.TIMELINE_BACKFILL])
+    return _bulk_add(
+        TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts)
+
+
+def forget(user_id, author_id):
+    '''
+    После отписки убирает посты автора из ленты.
+    '''
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 post__author_id=author_id).delete()
+
+
+def followed_celebrities(user):
+    '''
+    Популярные авторы из подписок пользователя - одним запросом
+    по уникальному индексу счётчиков.
+    '''
+    return list(
+        PostCounter.objects
+        .filter(kind=PostCounter.FOLLOWERS,
+                object_id__in=Follow.objects.filter(user=user)
+                .values('author_id'),
+                value__gt=settings.TIMELINE_FAN_OUT_LIMIT)
+        .values_list('object_id', flat=True))
+
+
+def timeline_page(request, user, number_of_notes):
+    '''
+    Страница личной ленты пользователя.
+    Основная часть читается из TimelineEntry одним проходом по индексу
+    (user, pub_date, post). Посты популярных авторов, которые не
+    раскладывались по лентам, дочитываются отдельным запросом
+    (fan-out on read) и сливаются с основной частью по ключу.
+    '''
+    entries = cursor_paginator(
+        request,
+        TimelineEntry.objects.filter(user=user)
+        .select_related('post__author', 'post__group'),
+        number_of_notes, key=('pub_date', 'post_id'))
+    page = CursorPage([entry.post for entry in entries],
+                      has_next=entries.has_next(),
+                      has_previous=entries.has_previous())
+    celebrities = followed_celebrities(user)
+    if not celebrities:
+        return page
+    pulled = cursor_paginator(
+        request,
+        Post.objects.filter(author_id__in=celebrities)
+        .select_related('author', 'group'),
+        number_of_notes)
+    return merge_cursor_pages(request, [page, pulled], number_of_notes)
@@ -1,6 +1,9 @@
-from django.urls import path
+from django.urls import path, register_converter
 
 from . import views
+from .feeds import FeedFormatConverter
+
+register_converter(FeedFormatConverter, 'feed')
 
 app_name = 'posts'
 
@@ -11,4 +14,15 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
+    path('search/', views.search, name='search'),
+    path('follow/', views.follow_index, name='follow_index'),
+    path('profile/<str:username>/follow/', views.profile_follow,
+         name='profile_follow'),
+    path('profile/<str:username>/unfollow/', views.profile_unfollow,
+         name='profile_unfollow'),
+    path('feed/<feed:feed_format>/', views.site_feed, name='site_feed'),
+    path('group/<slug:slug>/feed/<feed:feed_format>/', views.group_feed,
+         name='group_feed'),
+    path('profile/<str:username>/feed/<feed:feed_format>/',
+         views.author_feed, name='author_feed'),
 ]
@@ -1,7 +1,17 @@
+import base64
+import binascii
+
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_SEPARATOR = '|'
+# Сколько первых страниц ленты показывать номерами: дальше по ленте
+# ведут только курсорные ссылки, без OFFSET.
+FEED_PAGE_LINKS = 5
 
 
-def paginator(request, queryset, number_of_notes):
+def paginator(request, queryset, number_of_notes, count=None):
     '''
     Ф-ия использует Paginator из Django для разбиения информации на страницы.
     Здесь мы разбиваем кверисет записей из таблицы из БД на страницы, на каждой
@@ -10,9 +20,181 @@ def paginator(request, queryset, number_of_notes):
     request - запрос
     queryset - множество записей из таблицы из БД
     number_of_notes - число записей из таблицы из БД на одной странице
+    count - заранее известное число записей (например, из PostCounter);
+    если передано, Paginator не выполняет COUNT(*)
     Выходные аргументы:
     Одна страница (из кучи страниц) с определённым числом записей на ней.
     '''
     paginator = Paginator(queryset, number_of_notes)
+    if count is not None:
+        paginator.count = count
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
+
+
+def encode_cursor(pub_date, pk):
+    '''
+    Упаковывает ключ записи (pub_date, id) в строку для URL.
+    '''
+    raw = f'{pub_date.isoformat()}{CURSOR_SEPARATOR}{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    '''
+    Распаковывает курсор обратно в пару (pub_date, id).
+    Для испорченного или подделанного курсора возвращает None.
+    '''
+    if not cursor:
+        return None
+    padding = '=' * (-len(cursor) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(cursor + padding).decode()
+        pub_date, pk = raw.rsplit(CURSOR_SEPARATOR, 1)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+def _item_key(item):
+    '''
+    Достаёт ключ (pub_date, id) из объекта модели или из словаря .values().
+    '''
+    if isinstance(item, dict):
+        return item['pub_date'], item.get('id', item.get('pk'))
+    return item.pub_date, item.pk
+
+
+class CursorPage:
+    '''
+    Страница курсорной (keyset) пагинации.
+    Повторяет ту часть интерфейса Page, которой пользуются шаблоны,
+    но не знает ни номера страницы, ни общего числа записей.
+    '''
+    is_cursor = True
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not (self._has_next and self.object_list):
+            return None
+        return encode_cursor(*_item_key(self.object_list[-1]))
+
+    @property
+    def previous_cursor(self):
+        if not (self._has_previous and self.object_list):
+            return None
+        return encode_cursor(*_item_key(self.object_list[0]))
+
+
+def cursor_paginator(request, queryset, number_of_notes,
+                     key=('pub_date', 'pk')):
+    '''
+    Курсорная пагинация по ключу (pub_date, id), от новых записей к старым.
+    Вместо OFFSET страница выбирается условием на ключ, поэтому запрос
+    стоит одинаково на любой глубине и не требует COUNT(*).
+    Входные аргументы:
+    request - запрос с необязательным ?after=<cursor> или ?before=<cursor>
+    queryset - множество записей из таблицы из БД
+    number_of_notes - число записей на одной странице
+    key - имена полей даты и id, по которым идёт ключ (например,
+    ('pub_date', 'post_id') для ленты подписок)
+    Выходные аргументы:
+    Страница CursorPage.
+    '''
+    date_field, id_field = key
+    after = decode_cursor(request.GET.get('after'))
+    before = decode_cursor(request.GET.get('before'))
+    if before is not None:
+        pub_date, pk = before
+        rows = list(
+            queryset
+            .filter(Q(**{f'{date_field}__gt': pub_date})
+                    | Q(**{date_field: pub_date, f'{id_field}__gt': pk}))
+            .order_by(date_field, id_field)[:number_of_notes + 1]
+        )
+        has_previous = len(rows) > number_of_notes
+        rows = rows[:number_of_notes]
+        rows.reverse()
+        return CursorPage(rows, has_next=True, has_previous=has_previous)
+
+    queryset = queryset.order_by(f'-{date_field}', f'-{id_field}')
+    if after is not None:
+        pub_date, pk = after
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__lt': pub_date})
+            | Q(**{date_field: pub_date, f'{id_field}__lt': pk}))
+    rows = list(queryset[:number_of_notes + 1])
+    has_next = len(rows) > number_of_notes
+    return CursorPage(rows[:number_of_notes], has_next=has_next,
+                      has_previous=after is not None)
+
+
+def merge_cursor_pages(request, pages, number_of_notes):
+    '''
+    Сливает несколько курсорных страниц, снятых с одним и тем же курсором,
+    в одну: убирает повторы, сортирует по ключу (pub_date, id) и
+    оставляет number_of_notes записей, ближайших к курсору.
+    '''
+    items = {}
+    for page in pages:
+        for item in page:
+            items.setdefault(_item_key(item)[1], item)
+    rows = sorted(items.values(), key=_item_key, reverse=True)
+    dropped = len(rows) > number_of_notes
+    if decode_cursor(request.GET.get('before')) is not None:
+        return CursorPage(
+            rows[-number_of_notes:], has_next=True,
+            has_previous=dropped or any(p.has_previous() for p in pages))
+    return CursorPage(
+        rows[:number_of_notes],
+        has_next=dropped or any(p.has_next() for p in pages),
+        has_previous=any(p.has_previous() for p in pages))
+
+
+def feed_paginator(request, queryset, number_of_notes, count=None):
+    '''
+    Выбирает режим пагинации для ленты постов: курсорный, если в запросе
+    есть ?after= или ?before=, иначе обычный постраничный.
+    У обычной страницы тоже есть next_cursor и previous_cursor: ссылки
+    "Следующая" и "Предыдущая" сразу уводят в курсорный режим, а номера
+    (page_links) есть только у первых FEED_PAGE_LINKS страниц - OFFSET
+    из навигации остаётся неглубоким.
+    '''
+    if 'after' in request.GET or 'before' in request.GET:
+        return cursor_paginator(request, queryset, number_of_notes)
+    page = paginator(request, queryset, number_of_notes, count)
+    items = list(page)
+    page.next_cursor = (encode_cursor(*_item_key(items[-1]))
+                        if page.has_next() and items else None)
+    page.previous_cursor = (encode_cursor(*_item_key(items[0]))
+                            if page.has_previous() and items else None)
+    page.page_links = range(
+        1, min(page.paginator.num_pages, FEED_PAGE_LINKS) + 1)
+    return page
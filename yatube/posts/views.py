@@ -1,14 +1,31 @@
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
 
-from .forms import PostForm
-from .models import Group, Post, User
-from .utils import paginator
+from .cache import anonymous_page_cache, tag_response
+from .conditional import (conditional_page, group_state, index_state,
+                          post_state, profile_state)
+from .feeds import CONTENT_TYPES, WRITERS, FeedSource
+from .links import fast_reverse
+from .forms import PostForm, PostImageForm
+from .images import schedule_thumbnails, thumbnails_for
+from .models import Follow, Group, Post, PostCounter, User
+from .search import search_posts
+from .timeline import timeline_page
+from .utils import feed_paginator, paginator
 from django.contrib.auth.decorators import login_required
 
 NUMBER_OF_POSTS = 10
 PAGE_POSTS_OF_USER = 2
+SEARCH_QUERY_MAX_LENGTH = 200
 
 
+@conditional_page(index_state)
+@anonymous_page_cache
 def index(request):
     '''
     Позволяет перенести в HTML-код главной страницы сайта записи из
@@ -17,16 +34,20 @@ def index(request):
     Записей взято - первые 10 штук.
     '''
     post_list = Post.objects.select_related('author', 'group').all()
-    page_obj = paginator(request, post_list, NUMBER_OF_POSTS)
+    page_obj = feed_paginator(request, post_list, NUMBER_OF_POSTS,
+                              PostCounter.objects.get_value(PostCounter.SITE))
     template = 'posts/index.html'
     title = 'Последние обновления на сайте'
     context = {
         'page_obj': page_obj,
         'title': title,
     }
-    return render(request, template, context)
+    return tag_response(render(request, template, context),
+                        'feed', 'authors', 'groups')
 
 
+@conditional_page(group_state)
+@anonymous_page_cache
 def group_posts(request, slug):
     '''
     Позволяет перенести в HTML-код страницы данной группы постов записи из
@@ -36,47 +57,188 @@ def group_posts(request, slug):
     Записей взято - первые 10 штук.
     '''
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = paginator(request, posts, NUMBER_OF_POSTS)
+    posts = group.posts.select_related('author')
+    number_of_posts = PostCounter.objects.get_value(PostCounter.GROUP,
+                                                    group.pk)
+    page_obj = feed_paginator(request, posts, NUMBER_OF_POSTS,
+                              number_of_posts)
     context = {
         'group': group,
         'page_obj': page_obj,
     }
-    return render(request, 'posts/group_list.html', context)
+    return tag_response(render(request, 'posts/group_list.html', context),
+                        f'group:{group.pk}', 'authors', 'groups')
 
 
+@conditional_page(profile_state)
+@anonymous_page_cache
 def profile(request, username):
     '''
     Переводит на страницу с постами конкретного пользователя.
     '''
     user = User.objects.get(username=username)
-    post_list = user.posts.all()
-    number_post_of_user = post_list.count()
-    page_obj = paginator(request, post_list, PAGE_POSTS_OF_USER)
+    post_list = user.posts.select_related('group')
+    number_post_of_user = PostCounter.objects.get_value(PostCounter.AUTHOR,
+                                                        user.pk)
+    page_obj = feed_paginator(request, post_list, PAGE_POSTS_OF_USER,
+                              number_post_of_user)
+    following = (request.user.is_authenticated
+                 and Follow.objects.filter(user=request.user,
+                                           author=user).exists())
     templates = 'posts/profile.html'
     context = {
         'number_post_of_user': number_post_of_user,
         'username': user,
         'page_obj': page_obj,
+        'following': following,
     }
-    return render(request, templates, context)
+    return tag_response(render(request, templates, context),
+                        f'author:{user.pk}', 'groups')
 
 
+@anonymous_page_cache
+def search(request):
+    '''
+    Переводит на страницу поиска по текстам постов.
+    Результаты упорядочены по релевантности и разбиты на страницы.
+    '''
+    query = request.GET.get('q', '').strip()[:SEARCH_QUERY_MAX_LENGTH]
+    page_obj = paginator(request, search_posts(query), NUMBER_OF_POSTS)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return tag_response(render(request, 'posts/search.html', context),
+                        'feed', 'authors', 'groups')
+
+
+@conditional_page(post_state)
+@anonymous_page_cache
 def post_detail(request, post_id):
     '''
     Переводит на страницу с информацией конкретного поста.
     Если вы являетесь автором данного поста, то вам будет
     доступна кнопка "редактировать запись".
     '''
-    post = Post.objects.get(pk=post_id)
-    number_post_of_user = Post.objects.filter(author=post.author).count()
+    post = Post.objects.select_related('author', 'group').get(pk=post_id)
+    number_post_of_user = PostCounter.objects.get_value(PostCounter.AUTHOR,
+                                                        post.author_id)
 
     templates = 'posts/post_detail.html'
     context = {
         'number_post_of_user': number_post_of_user,
         'post': post,
+        'thumbnail': thumbnails_for([post], 'detail').get(post.pk),
     }
-    return render(request, templates, context)
+    response = tag_response(render(request, templates, context),
+                            f'post:{post.pk}', f'author:{post.author_id}')
+    if post.group_id:
+        tag_response(response, f'group:{post.group_id}')
+    return response
+
+
+def _feed_response(request, feed_format, source):
+    '''
+    Отдаёт ленту потоком. Если у клиента уже есть актуальная версия
+    (If-None-Match / If-Modified-Since), отвечает 304 без построения ленты.
+    '''
+    etag = quote_etag(source.etag(feed_format))
+    updated = source.last_modified()
+    last_modified = int(updated.timestamp()) if updated else None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        base_url = f'{request.scheme}://{request.get_host()}'
+        response = StreamingHttpResponse(
+            WRITERS[feed_format](source, base_url,
+                                 request.build_absolute_uri(),
+                                 updated or timezone.now()),
+            content_type=CONTENT_TYPES[feed_format],
+        )
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+@require_safe
+def site_feed(request, feed_format):
+    '''
+    Лента Atom/RSS со всеми последними постами сайта.
+    '''
+    source = FeedSource(
+        'Последние обновления на сайте',
+        fast_reverse('posts:index'),
+        Post.objects.all(),
+        index_state(request),
+    )
+    return _feed_response(request, feed_format, source)
+
+
+@require_safe
+def group_feed(request, slug, feed_format):
+    '''
+    Лента Atom/RSS с последними постами группы.
+    '''
+    group = get_object_or_404(Group, slug=slug)
+    source = FeedSource(
+        f'Записи сообщества {group.title}',
+        group.get_absolute_url(),
+        group.posts.all(),
+        group_state(request, slug),
+    )
+    return _feed_response(request, feed_format, source)
+
+
+@require_safe
+def author_feed(request, username, feed_format):
+    '''
+    Лента Atom/RSS с последними постами автора.
+    '''
+    user = get_object_or_404(User, username=username)
+    source = FeedSource(
+        f'Посты пользователя {user.get_full_name() or user.username}',
+        user.get_absolute_url(),
+        user.posts.all(),
+        profile_state(request, username),
+    )
+    return _feed_response(request, feed_format, source)
+
+
+@login_required
+def follow_index(request):
+    '''
+    Переводит на страницу с постами авторов, на которых подписан
+    пользователь. Лента читается из заранее разложенных записей
+    (см. posts.timeline), поэтому число подписок на скорость не влияет.
+    '''
+    page_obj = timeline_page(request, request.user, NUMBER_OF_POSTS)
+    context = {
+        'page_obj': page_obj,
+        'title': 'Избранные авторы',
+    }
+    return render(request, 'posts/follow.html', context)
+
+
+@login_required
+def profile_follow(request, username):
+    '''
+    Подписывает пользователя на автора и возвращает в профиль автора.
+    '''
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        Follow.objects.get_or_create(user=request.user, author=author)
+    return redirect('posts:profile', username)
+
+
+@login_required
+def profile_unfollow(request, username):
+    '''
+    Отписывает пользователя от автора и возвращает в профиль автора.
+    '''
+    author = get_object_or_404(User, username=username)
+    Follow.objects.filter(user=request.user, author=author).delete()
+    return redirect('posts:profile', username)
 
 
 @login_required
@@ -86,20 +248,25 @@ def post_create(request):
     '''
     groups = Group.objects.all()
     if request.method == 'POST':
-        form = PostForm(request.POST)
+        post = Post(author=request.user)
+        form = PostForm(request.POST, instance=post)
+        image_form = PostImageForm(request.POST, request.FILES,
+                                   instance=post)
 
-        if form.is_valid():
-            post = form.save(commit=False)
-            post.author = request.user
-            post.save()
+        if form.is_valid() and image_form.is_valid():
+            with transaction.atomic():
+                post.save()
+                schedule_thumbnails(post)
             return redirect('posts:profile', request.user.username)
 
         return render(request, 'posts/create_or_up_post.html',
-                      {'form': form, 'groups': groups, })
+                      {'form': form, 'image_form': image_form,
+                       'groups': groups, })
 
     form = PostForm()
     return render(request, 'posts/create_or_up_post.html',
-                  {'form': form, 'groups': groups, })
+                  {'form': form, 'image_form': PostImageForm(),
+                   'groups': groups, })
 
 
 @login_required
@@ -114,18 +281,24 @@ def post_edit(request, post_id):
     if id_author == request.user:
         if request.method == 'POST':
             form = PostForm(request.POST, instance=post)
+            image_form = PostImageForm(request.POST, request.FILES,
+                                       instance=post)
 
-            if form.is_valid():
-                form.save()
+            if form.is_valid() and image_form.is_valid():
+                with transaction.atomic():
+                    post.save()
+                    if 'image' in image_form.changed_data:
+                        schedule_thumbnails(post)
                 return redirect('posts:post_detail', post_id)
 
             return render(request, 'posts/create_or_up_post.html',
-                          {'form': form, 'post': post,
-                           'is_edit': is_edit, 'groups': groups, })
+                          {'form': form, 'image_form': image_form,
+                           'post': post, 'is_edit': is_edit,
+                           'groups': groups, })
 
         form = PostForm()
         return render(request, 'posts/create_or_up_post.html',
-                      {'form': form, 'post': post,
-                       'is_edit': is_edit, 'groups': groups, })
+                      {'form': form, 'image_form': PostImageForm(),
+                       'post': post, 'is_edit': is_edit, 'groups': groups, })
 
     return redirect('posts:post_detail', post_id)
@@ -42,13 +42,19 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'sorl.thumbnail',
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.static.StaticFilesMiddleware',
+    'core.middleware.timing.TimingMiddleware',
+    'core.middleware.queries.QueryInspectorMiddleware',
+    'core.middleware.replicas.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,6 +62,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.timing.ViewTimingMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -77,18 +84,195 @@ TEMPLATES = [
     },
 ]
 
+# Сжатие пробелов в шаблонах (core.template_loaders): исходник шаблона
+# очищается от отступов и комментариев один раз при компиляции, а
+# cached.Loader хранит готовый шаблон. Включается вне DEBUG или
+# переменной YATUBE_TEMPLATE_MINIFY=1.
+TEMPLATE_MINIFY = bool(int(os.environ.get('YATUBE_TEMPLATE_MINIFY',
+                                          not DEBUG)))
+BASE_TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+MINIFIED_TEMPLATE_LOADERS = [
+    ('django.template.loaders.cached.Loader', [
+        'core.template_loaders.FilesystemLoader',
+        'core.template_loaders.AppDirectoriesLoader',
+    ]),
+]
+if TEMPLATE_MINIFY:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = MINIFIED_TEMPLATE_LOADERS
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Боевой режим SQLite (core.sqlite): PRAGMA на каждом новом соединении
+# и переиспользование соединений между запросами. Включается вне DEBUG
+# или переменной YATUBE_SQLITE_PRODUCTION=1.
+SQLITE_PRODUCTION = bool(int(os.environ.get('YATUBE_SQLITE_PRODUCTION',
+                                            not DEBUG)))
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # в КБ: 64 МБ
+    'busy_timeout': 5000,  # мс
+}
+SQLITE_CONN_MAX_AGE = 600
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': SQLITE_CONN_MAX_AGE if SQLITE_PRODUCTION else 0,
+    }
+}
+
+# Реплики для чтения (core.db_router). Локально это копии db.sqlite3,
+# которые обновляет manage.py sync_replicas; YATUBE_DB_REPLICAS=2
+# заводит replica1 и replica2. В тестах реплики смотрят в основную БД.
+# Соединения с репликами не переиспользуются: sync_replicas подменяет
+# файл, а открытое соединение читало бы старый файл до CONN_MAX_AGE.
+REPLICA_DATABASES = []
+for number in range(1, int(os.environ.get('YATUBE_DB_REPLICAS', 0)) + 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'CONN_MAX_AGE': 0,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# Сколько секунд после записи клиент читает только из основной БД.
+REPLICA_PIN_SECONDS = int(os.environ.get('YATUBE_REPLICA_PIN_SECONDS', 10))
+REPLICA_PIN_COOKIE = 'yatube_primary'
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+# Кеш должен быть общим для всех процессов: версии карточек и страниц,
+# сессии и пользователи сбрасываются в одном воркере, а читаются во
+# всех. Вне DEBUG по умолчанию - файловый кеш (воркеры одной машины);
+# для нескольких машин - memcached: YATUBE_CACHE_BACKEND и
+# YATUBE_CACHE_LOCATION. LocMemCache живёт внутри одного процесса и
+# годится только для runserver и тестов.
+CACHE_BACKEND = os.environ.get(
+    'YATUBE_CACHE_BACKEND',
+    'django.core.cache.backends.locmem.LocMemCache' if DEBUG
+    else 'django.core.cache.backends.filebased.FileBasedCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'django_cache')
+            if CACHE_BACKEND.endswith('FileBasedCache') else 'yatube'),
+        # по умолчанию 300: для файлового кеша карточек и страниц мало
+        'OPTIONS': {'MAX_ENTRIES': 100000},
     }
 }
+# Виден ли кеш всем процессам. Без общего кеша то, что держится на
+# сбросе ключей (сессии и пользователь из кеша, кеш страниц), выключено.
+CACHE_SHARED = not CACHE_BACKEND.endswith('LocMemCache')
+
+# сколько секунд хранится отрисованная карточка поста
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+# кеш целых страниц для анонимных читателей: вне DEBUG и только с общим
+# кешем - иначе сброс страницы в одном процессе не виден остальным
+PAGE_CACHE_ENABLED = not DEBUG and CACHE_SHARED
+PAGE_CACHE_TIMEOUT = 60 * 5
+
+# Личные ленты (posts.timeline): посты раскладываются по лентам
+# подписчиков пачками по TIMELINE_BATCH_SIZE; у авторов, у которых
+# подписчиков больше TIMELINE_FAN_OUT_LIMIT, ленты дочитывают посты сами.
+TIMELINE_FAN_OUT_LIMIT = 10000
+TIMELINE_BATCH_SIZE = 1000
+TIMELINE_BACKFILL = 50
+
+# Заголовки кеширования публичных страниц постов (posts.conditional).
+# По умолчанию браузер и прокси хранят страницу, но перепроверяют её
+# при каждом показе: благодаря ETag это обычно короткий ответ 304.
+PUBLIC_CACHE_CONTROL = {
+    'public': True,
+    'max_age': int(os.environ.get('YATUBE_PUBLIC_MAX_AGE', 0)),
+    'must_revalidate': True,
+}
+PRIVATE_CACHE_CONTROL = {
+    'private': True,
+    'max_age': 0,
+    'must_revalidate': True,
+}
+PAGE_VARY_HEADERS = ('Cookie', 'Accept-Language')
+
+
+# Запросы дольше порога (в миллисекундах) попадают в журнал
+# yatube.slow_requests вместе с самыми медленными SQL-запросами
+SLOW_REQUEST_THRESHOLD_MS = int(
+    os.environ.get('YATUBE_SLOW_REQUEST_THRESHOLD_MS', 500))
+
+# Метрики для Prometheus. При нескольких воркерах каждый процесс
+# сбрасывает свои метрики в файл в METRICS_DIR, а /metrics их сводит.
+METRICS_DIR = os.environ.get('YATUBE_METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Поиск N+1 и контроль числа запросов на представление.
+# В строгом режиме (включается при запуске тестов) нарушение - ошибка.
+QUERY_INSPECTOR_ENABLED = DEBUG
+QUERY_INSPECTOR_STRICT = False
+QUERY_INSPECTOR_THRESHOLD = 3
+QUERY_BUDGET_DEFAULT = 30
+QUERY_BUDGETS = {
+    'posts:index': 5,
+    'posts:group_list': 6,
+    'posts:profile': 7,
+    'posts:post_detail': 5,
+    'posts:search': 7,
+    'posts:follow_index': 6,
+    'api:post_list': 2,
+    'api:post_detail': 3,
+    'api:group_detail': 3,
+    'api:group_posts': 3,
+    'api:profile': 3,
+    'api:profile_posts': 3,
+}
+
+TEST_RUNNER = 'core.testing.StrictQueriesTestRunner'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json_line': {
+            'format': '%(message)s',
+        },
+    },
+    'handlers': {
+        'slow_requests': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json_line',
+        },
+    },
+    'loggers': {
+        'yatube.queries': {
+            'handlers': ['slow_requests'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'yatube.slow_requests': {
+            'handlers': ['slow_requests'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
 
 
 # Password validation
@@ -131,11 +315,103 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+STATIC_ROOT = os.environ.get('YATUBE_STATIC_ROOT',
+                             os.path.join(BASE_DIR, 'collected_static'))
+
+# Конвейер статики (core.staticfiles): collectstatic добавляет хеш
+# содержимого к именам файлов и кладёт рядом сжатые .gz и .br, а
+# core.middleware.static отдаёт их с Cache-Control immutable.
+# Включается вне DEBUG или переменной YATUBE_STATIC_PIPELINE=1;
+# перед запуском нужен manage.py collectstatic.
+STATIC_PIPELINE = bool(int(os.environ.get('YATUBE_STATIC_PIPELINE',
+                                          not DEBUG)))
+if STATIC_PIPELINE:
+    STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
+STATIC_SERVE = STATIC_PIPELINE
+# кеш для файлов без хеша в имени (их адрес не меняется при правке)
+STATIC_MAX_AGE = 60
+
+# Фоновая очередь задач в БД (core.tasks), воркер - manage.py run_tasks.
+# В DEBUG (и в тестах) задачи выполняются сразу при постановке,
+# без воркера; YATUBE_TASKS_EAGER=0 включает настоящую очередь.
+TASKS_EAGER = bool(int(os.environ.get('YATUBE_TASKS_EAGER', DEBUG)))
+TASK_WORKERS = int(os.environ.get('YATUBE_TASK_WORKERS', 4))
+TASK_BATCH_SIZE = 100
+# сколько секунд задача принадлежит воркеру, прежде чем её заберёт другой
+TASK_LEASE_SECONDS = 300
+TASK_MAX_ATTEMPTS = 5
+# задержка перед повтором, удваивается с каждой попыткой
+TASK_RETRY_DELAY = 10
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.environ.get('YATUBE_MEDIA_ROOT',
+                            os.path.join(BASE_DIR, 'media'))
+
+# Превью картинок постов (posts.images) готовятся заранее, после
+# сохранения поста, фоновой задачей (core.tasks), а не при первом
+# показе страницы, и хранятся в поле Post.thumbnails. Размеры - в
+# синтаксисе sorl-thumbnail.
+POST_THUMBNAIL_SIZES = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+    'detail': ('960', {'upscale': False}),
+}
+# Хранилище sorl-thumbnail: ключи превью в кеше с копией в БД, так что
+# проверка готового превью не обращается к файлам.
+THUMBNAIL_KVSTORE = 'sorl.thumbnail.kvstores.cached_db_kvstore.KVStore'
+THUMBNAIL_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def _profile_url(user):
+    from posts.links import profile_url
+    return profile_url(user)
+
+
+# ссылка на профиль автора: user.get_absolute_url в шаблонах
+ABSOLUTE_URL_OVERRIDES = {
+    'auth.user': _profile_url,
+}
+
+# Сессии и пользователь сессии читаются из кеша (core.sessions,
+# core.auth): просмотр страницы вошедшим пользователем не стоит
+# запросов к django_session и auth_user. Выход, смена пароля и
+# is_active=False сбрасывают ключи кеша, поэтому это включается только
+# при общем кеше (CACHE_SHARED); иначе - обычные сессии в БД и
+# ModelBackend.
+SESSION_ENGINE = ('core.sessions' if CACHE_SHARED
+                  else 'django.contrib.sessions.backends.db')
+AUTHENTICATION_BACKENDS = [
+    'core.auth.CachedModelBackend' if CACHE_SHARED
+    else 'django.contrib.auth.backends.ModelBackend']
+# Отложенная запись сессий в БД раз в N секунд - только по явному
+# YATUBE_SESSION_WRITE_BEHIND_SECONDS. None - сразу, как в cached_db.
+SESSION_WRITE_BEHIND_SECONDS = os.environ.get(
+    'YATUBE_SESSION_WRITE_BEHIND_SECONDS')
+if SESSION_WRITE_BEHIND_SECONDS is not None:
+    SESSION_WRITE_BEHIND_SECONDS = float(SESSION_WRITE_BEHIND_SECONDS)
+USER_CACHE_TIMEOUT = 60 * 60
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
-#  подключаем движок filebased.EmailBackend
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма (core.mail) не отправляются в запросе: QueuedEmailBackend
+# кладёт их в фоновую очередь, а воркер отправляет пачками через одно
+# соединение MAIL_DELIVERY_BACKEND с ограничением скорости и повторами.
+EMAIL_BACKEND = os.environ.get('YATUBE_EMAIL_BACKEND',
+                               'core.mail.QueuedEmailBackend')
+# по умолчанию письма складываются файлами в EMAIL_FILE_PATH;
+# для настоящей отправки - django.core.mail.backends.smtp.EmailBackend
+MAIL_DELIVERY_BACKEND = os.environ.get(
+    'YATUBE_MAIL_DELIVERY_BACKEND',
+    'django.core.mail.backends.filebased.EmailBackend')
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+EMAIL_HOST = os.environ.get('YATUBE_EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('YATUBE_EMAIL_PORT', 25))
+EMAIL_TIMEOUT = 10
+# писем в секунду с одного воркера (лимит почтового сервера); 0 - без лимита
+MAIL_RATE_LIMIT = float(os.environ.get('YATUBE_MAIL_RATE_LIMIT', 20))
+# повторы временной ошибки сразу, в той же пачке; потом письмо
+# возвращается в очередь (TASK_RETRY_DELAY)
+MAIL_SEND_RETRIES = 2
+MAIL_RETRY_DELAY = 0.5